@@ -1,20 +1,117 @@
 import sys, argparse
 
-from .lox import Lox
+from .lox import Lox, ENGINES
+from .cache import ProgramCache
+from .profiler import SamplingProfiler
+from .output import UnbufferedOutput
 
 def get_args():
     parser = argparse.ArgumentParser(description='loxPy')
     parser.add_argument('script', type=str, nargs='?', help='Script filename')
-    return parser.parse_args()
+    parser.add_argument('--engine', type=str, default='tree', choices=ENGINES.keys(),
+        help='Execution engine: tree-walking interpreter, bytecode VM, closure compiler, Python transpiler or explicit-stack tree-walker. '
+            'Tail calls take no stack on tree, closure and stack; python only eliminates self tail calls outside of loops, vm none')
+    parser.add_argument('--no-cache', action='store_true',
+        help='Do not read or write the __loxcache__ of parsed scripts')
+    parser.add_argument('--refresh-cache', action='store_true',
+        help='Ignore cached parses and write fresh ones')
+    parser.add_argument('--stream', action='store_true',
+        help='Run each top level declaration as soon as it is parsed')
+    parser.add_argument('--no-optimize', action='store_true',
+        help='Skip constant folding and the other AST optimizations')
+    parser.add_argument('--ic-stats', action='store_true',
+        help='Print inline cache hit and miss counts after the run (tree and closure engines)')
+    parser.add_argument('--max-stack', type=int, default=None,
+        help='Continuation stack budget of the stack engine, in suspended evaluations (default 1000000)')
+    parser.add_argument('--memo-size', type=int, default=None,
+        help='Results memoized per pure function, 0 disables memoization (default 1024; tree, closure and stack engines)')
+    parser.add_argument('--memo', type=str, action='append', default=[], metavar='NAME',
+        help='Memoize function NAME even if it is not proven pure (repeatable)')
+    parser.add_argument('--no-memo', type=str, action='append', default=[], metavar='NAME',
+        help='Never memoize function NAME (repeatable)')
+    parser.add_argument('--memo-stats', action='store_true',
+        help='Print the memoization hits, misses and evictions of each function after the run')
+    parser.add_argument('--profile', type=str, default=None, choices=['sample'],
+        help='Profile the Lox program by sampling its call stack (tree engine)')
+    parser.add_argument('--profile-interval', type=float, default=1.0,
+        help='Milliseconds between profiler samples (default 1)')
+    parser.add_argument('--profile-output', type=str, default=None,
+        help='File to write the collapsed stacks to, for flame graph tools (default: script.folded)')
+    parser.add_argument('--unbuffered', action='store_true',
+        help='Write the output of every print right away instead of in blocks')
+    parser.add_argument('--stats', action='store_true',
+        help='Print counts of executed nodes, calls, frames and control flow exceptions after the run (tree engine)')
+    args = parser.parse_args()
+    if args.profile != None and args.engine != 'tree':
+        parser.error("--profile needs the tree engine")
+    if args.stats and args.engine != 'tree':
+        parser.error("--stats needs the tree engine")
+    if args.stats and args.profile != None:
+        parser.error("--stats and --profile can't be combined")
+    return args
+
+def get_compile_args():
+    parser = argparse.ArgumentParser(prog='loxpy compile', description='Transpile a Lox script to Python')
+    parser.add_argument('script', type=str, help='Script filename')
+    parser.add_argument('-o', '--output', type=str, default=None, help='Output filename (default: script.py)')
+    return parser.parse_args(sys.argv[2:])
+
+def write_profile(profiler:SamplingProfiler, output:str):
+    sys.stderr.write(profiler.profile.report() + "\n")
+    try:
+        with open(output, 'w') as fh:
+            fh.write(profiler.profile.collapsed())
+        sys.stderr.write(f"collapsed stacks written to {output}\n")
+    except OSError as error:
+        sys.stderr.write(f"could not write {output}: {error}\n")
 
 def main():
+    if sys.argv[1:2] == ['compile']:
+        args = get_compile_args()
+        Lox().compile_file(args.script, args.output)
+        return 0
+
     args = get_args()
 
-    lox = Lox()
-    if args.script:
-        lox.run_file(args.script)
-    else:
-        lox.run_prompt()
+    cache = None
+    if not args.no_cache:
+        cache = ProgramCache(refresh=args.refresh_cache)
+
+    profiler = None
+    if args.profile != None:
+        profiler = SamplingProfiler(args.profile_interval / 1000)
+
+    output = None
+    if args.unbuffered:
+        output = UnbufferedOutput()
+
+    lox = Lox(args.engine, cache, args.stream, not args.no_optimize, profiler, args.stats, output)
+    if args.max_stack != None:
+        lox.interpreter.max_stack = args.max_stack
+    memoizer = getattr(lox.interpreter, "memoizer", None)
+    if memoizer != None:
+        if args.memo_size != None:
+            memoizer.size = args.memo_size
+        memoizer.include.update(args.memo)
+        memoizer.exclude.update(args.no_memo)
+    try:
+        if profiler != None:
+            profiler.start()
+        if args.script:
+            lox.run_file(args.script)
+        else:
+            lox.run_prompt()
+    finally:
+        lox.output.flush()
+        if profiler != None:
+            profiler.stop()
+            write_profile(profiler, args.profile_output or (args.script or "lox") + ".folded")
+        if args.ic_stats:
+            lox.report_inline_caches()
+        if args.memo_stats:
+            lox.report_memoization()
+        if args.stats:
+            lox.report_stats()
     
     return lox.error_code()
 
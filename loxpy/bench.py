@@ -0,0 +1,196 @@
+'''
+Runtime benchmark runner for the Lox programs in benchmarks/.
+
+    python -m loxpy.bench [name ...] [--engines tree,closure] [--baseline DIR]
+
+Every benchmark is run as `python -m loxpy` in a fresh process, first
+`--warmup` times (which also fills the parse cache) and then `--repeat`
+times, and the wall time of each timed run is recorded. Results are
+written as JSON with the mean, median and standard deviation of each
+(benchmark, engine, version). With `--baseline`, the loxpy found in
+another checkout (a directory holding the `loxpy` package) is run the
+same way and each current median is compared with the baseline's.
+
+The output of every engine and version is checked against the output of
+the current version on the first engine, so one printing a different
+result is reported next to its timings.
+'''
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+import subprocess
+from argparse import ArgumentParser
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+
+
+def get_args():
+    parser = ArgumentParser(prog='python -m loxpy.bench', description='Run the Lox runtime benchmarks')
+    parser.add_argument('names', type=str, nargs='*',
+        help='Benchmarks to run, by file name without .lxp (default: all)')
+    parser.add_argument('--dir', type=str, default=BENCHMARKS,
+        help='Directory of the benchmark scripts')
+    parser.add_argument('--engines', type=str, default='tree',
+        help='Comma separated engines to run every benchmark on (default: tree)')
+    parser.add_argument('--baseline', type=str, default=None, metavar='DIR',
+        help='Checkout of another loxpy version to compare against')
+    parser.add_argument('--warmup', type=int, default=1,
+        help='Untimed runs before the timed ones (default 1)')
+    parser.add_argument('--repeat', type=int, default=5,
+        help='Timed runs (default 5)')
+    parser.add_argument('--timeout', type=float, default=300,
+        help='Seconds after which a run is abandoned (default 300)')
+    parser.add_argument('--lox-args', type=str, default='',
+        help='Extra arguments for every run, e.g. --lox-args="--memo-size 0"')
+    parser.add_argument('-o', '--output', type=str, default=None,
+        help='File to write the JSON results to (default: stdout)')
+    return parser.parse_args()
+
+
+def find_benchmarks(directory:str, names:list):
+    available = sorted(
+        os.path.splitext(name)[0] for name in os.listdir(directory) if name.endswith(".lxp")
+    )
+    if len(names) == 0:
+        return available
+
+    unknown = [name for name in names if name not in available]
+    if len(unknown) != 0:
+        sys.exit(f"unknown benchmarks: {', '.join(unknown)} (available: {', '.join(available)})")
+    return names
+
+
+def run_once(root:str, script:str, engine:str, lox_args:list, timeout:float):
+    '''
+    Runs `script` with the loxpy of `root`. Returns the wall time in
+    seconds and the output, or None and the error.
+    '''
+    command = [sys.executable, "-m", "loxpy"]
+    if engine != "tree":
+        # Versions before the engines existed only take the script
+        command += ["--engine", engine]
+    command += lox_args + [script]
+
+    environment = dict(os.environ, PYTHONPATH=root)
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(
+            command, cwd=root, env=environment, timeout=timeout,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+    except subprocess.TimeoutExpired:
+        return None, f"timed out after {timeout}s"
+    elapsed = time.perf_counter() - start
+
+    if process.returncode != 0:
+        return None, f"exit code {process.returncode}: {process.stderr.strip()}"
+    return elapsed, process.stdout
+
+
+def measure(root:str, script:str, engine:str, args):
+    '''
+    Timings of one benchmark on one engine and version.
+    '''
+    lox_args = args.lox_args.split()
+    output = None
+    for _ in range(args.warmup):
+        _, output = run_once(root, script, engine, lox_args, args.timeout)
+
+    times = []
+    error = None
+    for _ in range(args.repeat):
+        elapsed, result = run_once(root, script, engine, lox_args, args.timeout)
+        if elapsed == None:
+            error = result
+            break
+        times.append(elapsed)
+        output = result
+
+    result = {"times": times, "output": output}
+    if error != None:
+        result["error"] = error
+        return result
+
+    result["mean"] = statistics.mean(times)
+    result["median"] = statistics.median(times)
+    result["stdev"] = statistics.stdev(times) if len(times) > 1 else 0.0
+    result["min"] = min(times)
+    return result
+
+
+def main():
+    args = get_args()
+    names = find_benchmarks(args.dir, args.names)
+    engines = [engine for engine in args.engines.split(",") if engine != ""]
+
+    current = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    versions = [("current", current)]
+    if args.baseline != None:
+        versions.append(("baseline", os.path.abspath(args.baseline)))
+
+    results = []
+    for name in names:
+        script = os.path.abspath(os.path.join(args.dir, name + ".lxp"))
+        expected = None
+        for engine in engines:
+            for version, root in versions:
+                sys.stderr.write(f"{name:<20} {engine:<8} {version:<8} ")
+                sys.stderr.flush()
+                result = measure(root, script, engine, args)
+
+                output = result.pop("output")
+                if "error" not in result:
+                    if expected == None:
+                        expected = output
+                    result["output_matches"] = output == expected
+                    sys.stderr.write(f"median {result['median']:.3f}s  stdev {result['stdev']:.3f}s"
+                        + ("" if result["output_matches"] else "  OUTPUT DIFFERS") + "\n")
+                else:
+                    sys.stderr.write(result["error"] + "\n")
+
+                results.append(dict(benchmark=name, engine=engine, version=version, **result))
+
+    comparisons = []
+    if args.baseline != None:
+        medians = {
+            (result["benchmark"], result["engine"], result["version"]): result["median"]
+            for result in results if "median" in result
+        }
+        for name in names:
+            for engine in engines:
+                now = medians.get((name, engine, "current"))
+                before = medians.get((name, engine, "baseline"))
+                if now != None and before != None:
+                    comparisons.append({
+                        "benchmark": name,
+                        "engine": engine,
+                        "baseline_median": before,
+                        "current_median": now,
+                        # Below 1 means the current version is faster
+                        "ratio": now / before,
+                    })
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "warmup": args.warmup,
+        "repeat": args.repeat,
+        "lox_args": args.lox_args,
+        "results": results,
+        "comparisons": comparisons,
+    }
+    text = json.dumps(report, indent=2) + "\n"
+    if args.output != None:
+        with open(args.output, "w") as fh:
+            fh.write(text)
+    else:
+        sys.stdout.write(text)
+
+    failed = any("error" in result or not result["output_matches"] for result in results)
+    return 1 if failed else 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+'''
+On-disk cache of parsed programs.
+
+After a script has been scanned, parsed and resolved, its AST is pickled
+into a `__loxcache__` directory next to the script. Later runs of the
+same source skip the front end and load the AST directly. Entries are
+keyed by the script's content hash, the loxpy version and the cache
+format, so editing the script or upgrading loxpy invalidates them.
+'''
+import os
+import pickle
+import hashlib
+
+from loxpy import __VERSION__
+
+CACHE_DIRECTORY = "__loxcache__"
+MAGIC = b"LOXC"
+# Bump whenever the layout of AST nodes or their annotations changes
+CACHE_FORMAT = 5
+
+
+class ProgramCache:
+    def __init__(self, directory:str=None, refresh:bool=False):
+        # Defaults to a __loxcache__ directory next to each script
+        self.directory = directory
+        # Ignore existing entries, but still write fresh ones
+        self.refresh = refresh
+
+    def path_for(self, script:str, variant:str=""):
+        '''
+        File of the entry of `script`. Every variant has its own, and the
+        digest of the script's path keeps scripts with the same name apart
+        in a shared `--cache-dir`.
+        '''
+        script = os.path.abspath(script)
+        directory = self.directory
+        if directory == None:
+            directory = os.path.join(os.path.dirname(script), CACHE_DIRECTORY)
+        name = os.path.basename(script)
+        digest = hashlib.sha256(script.encode("utf-8")).hexdigest()[:12]
+        if variant != "":
+            name = f"{name}.{variant}"
+        return os.path.join(directory, f"{name}.{digest}.loxpy-{__VERSION__}.ast")
+
+    @staticmethod
+    def key(source:str, variant:str=""):
+        key = hashlib.sha256(source.encode("utf-8"))
+        key.update(f"\0{__VERSION__}\0{CACHE_FORMAT}\0{variant}".encode("utf-8"))
+        return key.digest()
+
+    def load(self, script:str, source:str, variant:str=""):
+        '''
+        Cached statements for `source`, or None on a miss.
+        '''
+        if self.refresh:
+            return None
+
+        try:
+            with open(self.path_for(script, variant), "rb") as fh:
+                data = fh.read()
+        except OSError:
+            return None
+
+        header = MAGIC + self.key(source, variant)
+        if not data.startswith(header):
+            return None
+
+        try:
+            return pickle.loads(data[len(header):])
+        except Exception:
+            # Stale or corrupt entry, it gets rewritten after parsing
+            return None
+
+    def store(self, script:str, source:str, statements:list, variant:str=""):
+        path = self.path_for(script, variant)
+        try:
+            payload = pickle.dumps(statements, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, RecursionError):
+            return
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so concurrent runs never see half an entry
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as fh:
+                fh.write(MAGIC + self.key(source, variant) + payload)
+            os.replace(temporary, path)
+        except OSError:
+            # The cache is an optimisation only, e.g. read-only directories
+            pass
@@ -0,0 +1,608 @@
+'''
+Closure compiling engine for loxpy.
+
+Every AST node is translated once into a specialized Python closure that
+takes the current frame and returns its value (expressions) or its
+completion signal (statements). Node type and operator dispatch happen
+while compiling, so running the program is just calling closures.
+
+Uses the depth/slot annotations of the Resolver and the same runtime
+objects as the tree-walking Interpreter.
+'''
+from loxpy.parser import expressions
+from loxpy.parser import statements
+from loxpy.token import Token
+from loxpy.token.token_types import TokenType
+
+from loxpy.environment import Environment, Frame
+
+from loxpy.evaluator import Interpreter
+from loxpy.evaluator.lox_class import LoxClass
+from loxpy.evaluator.lox_callable import LoxCallable
+from loxpy.evaluator.lox_instance import LoxInstance
+from loxpy.evaluator.inline_cache import InlineCaches
+from loxpy.evaluator.memoization import Memoizer, MISSING
+from loxpy.evaluator.completion import BREAK, RETURN, TAIL_CALL
+from loxpy.evaluator.native_functions import NativeObject, native_globals
+from loxpy.evaluator.runtime_error import (
+    LoxPyRuntimeError,
+    LoxPyDivisionByZeroError,
+    LoxBreakException,
+    LoxNativeError,
+)
+
+from loxpy.closure_compiler.compiled_function import (
+    CompiledFunction,
+    MemoizedCompiledFunction,
+)
+
+
+class ClosureCompiler(
+    expressions.ExprVisitor,
+    statements.StmtVisitor
+):
+    def __init__(self, lox_main):
+        self.lox = lox_main
+        # Sink of print statements, see loxpy/output
+        self.output = lox_main.output
+        self.global_env = Environment()
+        self.return_value = None
+        # Inline caches of the compiled property access sites
+        self.inline_caches = InlineCaches()
+        # Result caches of pure functions, see compile_function
+        self.memoizer = Memoizer()
+
+        for name, value in native_globals().items():
+            self.global_env.define(name, value)
+
+    def interpret(self, statements):
+        program = [self.compile_stmt(statement) for statement in statements]
+        env = self.global_env
+        try:
+            for statement in program:
+                # A stray top-level break just ends its statement, as does
+                # one of a function called outside of any loop
+                try:
+                    statement(env)
+                except LoxBreakException:
+                    pass
+        except LoxPyRuntimeError as error:
+            self.lox.runtime_error(error)
+
+    def compile_stmt(self, statement:statements.Stmt):
+        return statement.accept(self)
+
+    def compile_expr(self, expr:expressions.Expr):
+        return expr.accept(self)
+
+    def compile_sequence(self, body:list):
+        compiled = tuple(self.compile_stmt(statement) for statement in body)
+
+        if len(compiled) == 1:
+            return compiled[0]
+
+        def sequence(env):
+            for statement in compiled:
+                status = statement(env)
+                if status is not None:
+                    return status
+        return sequence
+
+    # Variables
+
+    def compile_get(self, name:Token, depth:int, slot:int):
+        if depth == None:
+            values = self.global_env.env_values
+            lexeme = name.lexeme
+            def get_global(env):
+                if lexeme in values:
+                    return values[lexeme]
+                raise LoxPyRuntimeError(name, "Undefined variable " + lexeme + ".")
+            return get_global
+
+        if depth == 0:
+            return lambda env: env.values[slot]
+        if depth == 1:
+            return lambda env: env.enclosing.values[slot]
+        return lambda env: env.ancestor(depth).values[slot]
+
+    def compile_set(self, name:Token, depth:int, slot:int, value):
+        if depth == None:
+            values = self.global_env.env_values
+            lexeme = name.lexeme
+            def set_global(env):
+                result = value(env)
+                if lexeme not in values:
+                    raise LoxPyRuntimeError(name, "Undefined variable " + lexeme + ".")
+                values[lexeme] = result
+                return result
+            return set_global
+
+        if depth == 0:
+            def set_local(env):
+                result = env.values[slot] = value(env)
+                return result
+            return set_local
+
+        def set_enclosing(env):
+            result = value(env)
+            env.ancestor(depth).values[slot] = result
+            return result
+        return set_enclosing
+
+    def compile_define(self, name:Token, slot:int, value):
+        if slot == None:
+            values = self.global_env.env_values
+            lexeme = name.lexeme
+            def define_global(env):
+                values[lexeme] = value(env)
+            return define_global
+
+        def define_local(env):
+            env.values[slot] = value(env)
+        return define_local
+
+    def compile_function(self, declaration:statements.Function, is_initializer:bool, memoize:bool=False):
+        '''
+        Returns a factory creating the runtime function for a closure frame,
+        memoized ones when `memoize` is set.
+        '''
+        name = declaration.name
+        arity = len(declaration.params)
+        size = declaration.size
+        body = self.compile_sequence(declaration.body)
+
+        if memoize:
+            memoizer = self.memoizer
+            def make_memoized_function(env):
+                return MemoizedCompiledFunction(name, arity, size, body, env, memoizer.table(declaration))
+            return make_memoized_function
+
+        def make_function(env):
+            return CompiledFunction(name, arity, size, body, env, is_initializer)
+        return make_function
+
+    # Statements
+
+    def visit_block_stmt(self, stmt: statements.Block):
+        body = self.compile_sequence(stmt.statements)
+        size = stmt.size
+        if size == 0:
+            return body
+        return lambda env: body(Frame([None] * size, env))
+
+    def visit_class_stmt(self, stmt: statements.Class):
+        name = stmt.name.lexeme
+        superclass_expr = stmt.superclass
+        get_superclass = None
+        if superclass_expr != None:
+            get_superclass = self.compile_expr(superclass_expr)
+
+        methods = [
+            (method.name.lexeme, self.compile_function(method, method.name.lexeme == "init"))
+            for method in stmt.methods
+        ]
+
+        def make_class(env):
+            superclass = None
+            if get_superclass != None:
+                superclass = get_superclass(env)
+                if not isinstance(superclass, LoxClass):
+                    raise LoxPyRuntimeError(superclass_expr.name, "Superclass must be a class.")
+                env = Frame([superclass], env)
+
+            return LoxClass(name, superclass, {
+                method_name: make_function(env) for method_name, make_function in methods
+            })
+
+        return self.compile_define(stmt.name, stmt.slot, make_class)
+
+    def visit_break_stmt(self, stmt: statements.Break):
+        return lambda env: BREAK
+
+    def visit_expression_stmt(self, stmt: statements.Expression):
+        expression = self.compile_expr(stmt.expression)
+        def expression_stmt(env):
+            expression(env)
+        return expression_stmt
+
+    def visit_function_stmt(self, stmt: statements.Function):
+        return self.compile_define(stmt.name, stmt.slot, self.compile_function(stmt, False, self.memoizer.memoizes(stmt)))
+
+    def visit_if_stmt(self, stmt: statements.If):
+        condition = self.compile_expr(stmt.condition)
+        then_branch = self.compile_stmt(stmt.thenBranch)
+
+        if stmt.elseBranch == None:
+            def if_stmt(env):
+                if condition(env):
+                    return then_branch(env)
+            return if_stmt
+
+        else_branch = self.compile_stmt(stmt.elseBranch)
+        def if_else_stmt(env):
+            if condition(env):
+                return then_branch(env)
+            return else_branch(env)
+        return if_else_stmt
+
+    def visit_print_stmt(self, stmt: statements.Print):
+        expression = self.compile_expr(stmt.expression)
+        stringify = Interpreter.stringify
+        write = self.output.write
+        def print_stmt(env):
+            write(stringify(expression(env)) + "\n")
+        return print_stmt
+
+    def visit_return_stmt(self, stmt: statements.Return):
+        if type(stmt.value) is expressions.Call:
+            return self.compile_call(stmt.value, True)
+
+        engine = self
+        if stmt.value == None:
+            def return_none(env):
+                engine.return_value = None
+                return RETURN
+            return return_none
+
+        value = self.compile_expr(stmt.value)
+        def return_stmt(env):
+            engine.return_value = value(env)
+            return RETURN
+        return return_stmt
+
+    def visit_var_stmt(self, stmt: statements.Var):
+        initializer = lambda env: None
+        if stmt.initializer != None:
+            initializer = self.compile_expr(stmt.initializer)
+        return self.compile_define(stmt.name, stmt.slot, initializer)
+
+    def visit_while_stmt(self, stmt: statements.While):
+        condition = self.compile_expr(stmt.condition)
+        body = self.compile_stmt(stmt.body)
+
+        def while_stmt(env):
+            while condition(env):
+                try:
+                    status = body(env)
+                except LoxBreakException:
+                    # Break of a function called from the body, see CompiledFunction.call
+                    return None
+                if status is not None:
+                    if status is BREAK:
+                        return None
+                    return status
+        return while_stmt
+
+    # Expressions
+
+    def visit_assign_expr(self, expr: expressions.Assign):
+        return self.compile_set(expr.name, expr.depth, expr.slot, self.compile_expr(expr.value))
+
+    def visit_binary_expr(self, expr: expressions.Binary):
+        left = self.compile_expr(expr.left)
+        right = self.compile_expr(expr.right)
+        operator = expr.operator
+        operator_type = operator.type
+
+        if operator_type == TokenType.PLUS:
+            def add(env):
+                a = left(env)
+                b = right(env)
+                if (type(a) is float and type(b) is float) or (type(a) is str and type(b) is str):
+                    return a + b
+                raise LoxPyRuntimeError(operator, "Operands must be either number or string type but not both.")
+            return add
+
+        if operator_type == TokenType.EQUAL_EQUAL:
+            return lambda env: left(env) == right(env)
+        if operator_type == TokenType.NOT_EQUAL:
+            return lambda env: not (left(env) == right(env))
+
+        if operator_type == TokenType.DIVIDE:
+            def divide(env):
+                a = left(env)
+                b = right(env)
+                if type(a) is not float or type(b) is not float:
+                    raise LoxPyRuntimeError(operator, "Operand must be a numbers.")
+                if b == 0:
+                    raise LoxPyDivisionByZeroError(operator)
+                return a / b
+            return divide
+
+        return self.compile_number_operator(operator, left, right)
+
+    def compile_number_operator(self, operator:Token, left, right):
+        operator_type = operator.type
+        message = "Operand must be a numbers."
+
+        if operator_type == TokenType.MINUS:
+            def subtract(env):
+                a = left(env)
+                b = right(env)
+                if type(a) is float and type(b) is float:
+                    return a - b
+                raise LoxPyRuntimeError(operator, message)
+            return subtract
+
+        if operator_type == TokenType.MULTIPLY:
+            def multiply(env):
+                a = left(env)
+                b = right(env)
+                if type(a) is float and type(b) is float:
+                    return a * b
+                raise LoxPyRuntimeError(operator, message)
+            return multiply
+
+        if operator_type == TokenType.GREATER:
+            def greater(env):
+                a = left(env)
+                b = right(env)
+                if type(a) is float and type(b) is float:
+                    return a > b
+                raise LoxPyRuntimeError(operator, message)
+            return greater
+
+        if operator_type == TokenType.GREATER_EQUAL:
+            def greater_equal(env):
+                a = left(env)
+                b = right(env)
+                if type(a) is float and type(b) is float:
+                    return a >= b
+                raise LoxPyRuntimeError(operator, message)
+            return greater_equal
+
+        if operator_type == TokenType.LESSER:
+            def lesser(env):
+                a = left(env)
+                b = right(env)
+                if type(a) is float and type(b) is float:
+                    return a < b
+                raise LoxPyRuntimeError(operator, message)
+            return lesser
+
+        if operator_type == TokenType.LESSER_EQUAL:
+            def lesser_equal(env):
+                a = left(env)
+                b = right(env)
+                if type(a) is float and type(b) is float:
+                    return a <= b
+                raise LoxPyRuntimeError(operator, message)
+            return lesser_equal
+
+        return lambda env: None
+
+    def visit_call_expr(self, expr: expressions.Call):
+        return self.compile_call(expr, False)
+
+    def compile_call(self, expr: expressions.Call, tail:bool):
+        '''
+        Compiles a call. A call in `return f(...)` position (`tail`) is
+        compiled as the return statement: it completes with the status of
+        tail_call instead of returning the value.
+        '''
+        if type(expr.callee) is expressions.Dot:
+            return self.compile_invoke(expr, tail)
+
+        callee = self.compile_expr(expr.callee)
+        arguments = tuple(self.compile_expr(argument) for argument in expr.arguments)
+        paren = expr.paren
+        engine = self
+
+        def call(env):
+            function = callee(env)
+            if not isinstance(function, LoxCallable):
+                raise LoxPyRuntimeError(paren, "Can only call function and classes.")
+
+            values = [argument(env) for argument in arguments]
+            if len(values) != function.arity():
+                raise LoxPyRuntimeError(paren, "Expected " +
+                    str(function.arity()) + " arguments but got " +
+                    str(len(values)) + "."
+                )
+
+            try:
+                if tail:
+                    return engine.tail_call(function, None, values)
+                return function.call(engine, values)
+            except RecursionError:
+                raise LoxPyRuntimeError(paren, "Stack overflow.") from None
+            except LoxNativeError as error:
+                raise LoxPyRuntimeError(paren, str(error)) from None
+        return call
+
+    def tail_call(self, function:LoxCallable, instance:LoxInstance, values:list):
+        '''
+        Call of a return statement. Compiled functions are not called here:
+        the function and its frame are left in return_value for
+        CompiledFunction.run_tail_calls, which runs them in place of the
+        returning function, so tail calls take no Python stack.
+        '''
+        if type(function) is CompiledFunction and not function.is_initializer:
+            self.return_value = (function, function.frame(instance, values))
+            return TAIL_CALL
+
+        if type(function) is MemoizedCompiledFunction:
+            value = function.cached(values)
+            if value is MISSING:
+                self.return_value = (function, function.frame(instance, values))
+                return TAIL_CALL
+            self.return_value = value
+            return RETURN
+
+        if instance == None:
+            self.return_value = function.call(self, values)
+        else:
+            self.return_value = function.call_method(self, instance, values)
+        return RETURN
+
+    def compile_invoke(self, expr: expressions.Call, tail:bool):
+        '''
+        Method call `obj.name(...)`: the method comes from the site's inline
+        cache and is called without creating a bound method.
+        '''
+        obj = self.compile_expr(expr.callee.object)
+        arguments = tuple(self.compile_expr(argument) for argument in expr.arguments)
+        name = expr.callee.name
+        lexeme = name.lexeme
+        paren = expr.paren
+        cache = self.inline_caches.property_cache(name)
+        engine = self
+
+        def invoke(env):
+            instance = obj(env)
+            if not isinstance(instance, LoxInstance):
+                if not isinstance(instance, NativeObject):
+                    raise LoxPyRuntimeError(name, "Only instances have properties.")
+                offset, function = None, instance.methods.get(lexeme)
+            elif instance.shape is cache.shape:
+                # Monomorphic hits are handled here, without calling lookup
+                cache.hits += 1
+                offset = cache.offset
+                function = cache.target
+            else:
+                offset, function = cache.lookup(instance.shape)
+            if offset != None:
+                function = instance.values[offset]
+                if not isinstance(function, LoxCallable):
+                    raise LoxPyRuntimeError(paren, "Can only call function and classes.")
+            elif function == None:
+                raise LoxPyRuntimeError(name, "Undefined property '" + lexeme + "'.")
+
+            values = [argument(env) for argument in arguments]
+            if len(values) != function.arity():
+                raise LoxPyRuntimeError(paren, "Expected " +
+                    str(function.arity()) + " arguments but got " +
+                    str(len(values)) + "."
+                )
+
+            if offset != None:
+                instance = None
+            try:
+                if tail:
+                    return engine.tail_call(function, instance, values)
+                if instance == None:
+                    return function.call(engine, values)
+                return function.call_method(engine, instance, values)
+            except RecursionError:
+                raise LoxPyRuntimeError(paren, "Stack overflow.") from None
+            except LoxNativeError as error:
+                raise LoxPyRuntimeError(paren, str(error)) from None
+        return invoke
+
+    def visit_dot_expr(self, expr: expressions.Dot):
+        obj = self.compile_expr(expr.object)
+        name = expr.name
+        lexeme = name.lexeme
+        cache = self.inline_caches.property_cache(name)
+
+        def get_property(env):
+            instance = obj(env)
+            if not isinstance(instance, LoxInstance):
+                if not isinstance(instance, NativeObject):
+                    raise LoxPyRuntimeError(name, "Only instances have properties.")
+                method = instance.methods.get(lexeme)
+                if method == None:
+                    raise LoxPyRuntimeError(name, "Undefined property '" + lexeme + "'.")
+                return method.bind(instance)
+
+            shape = instance.shape
+            if shape is cache.shape:
+                cache.hits += 1
+                offset = cache.offset
+                method = cache.target
+            else:
+                offset, method = cache.lookup(shape)
+            if offset != None:
+                return instance.values[offset]
+            if method == None:
+                raise LoxPyRuntimeError(name, "Undefined property '" + lexeme + "'.")
+            return method.bind(instance)
+        return get_property
+
+    def visit_dotset_expr(self, expr: expressions.DotSet):
+        obj = self.compile_expr(expr.object)
+        value = self.compile_expr(expr.value)
+        name = expr.name
+        cache = self.inline_caches.store_cache(name)
+
+        def set_property(env):
+            instance = obj(env)
+            if not isinstance(instance, LoxInstance):
+                raise LoxPyRuntimeError(name, "Only instances have fields.")
+            result = value(env)
+
+            shape = instance.shape
+            if shape is cache.shape:
+                cache.hits += 1
+                offset = cache.offset
+                instance.shape = cache.target
+            else:
+                offset, instance.shape = cache.lookup(shape)
+            values = instance.values
+            if offset == len(values):
+                values.append(result)
+            else:
+                values[offset] = result
+            return result
+        return set_property
+
+    def visit_grouping_expr(self, expr: expressions.Grouping):
+        return self.compile_expr(expr.expression)
+
+    def visit_literal_expr(self, expr: expressions.Literal):
+        value = expr.value
+        return lambda env: value
+
+    def visit_logical_expr(self, expr: expressions.Logical):
+        left = self.compile_expr(expr.left)
+        right = self.compile_expr(expr.right)
+
+        if expr.operator.type == TokenType.OR:
+            def logical_or(env):
+                value = left(env)
+                if value:
+                    return value
+                return right(env)
+            return logical_or
+
+        def logical_and(env):
+            value = left(env)
+            if not value:
+                return value
+            return right(env)
+        return logical_and
+
+    def visit_super_expr(self, expr: expressions.Super):
+        distance = expr.depth
+        method_name = expr.method
+
+        def get_super(env):
+            superclass = env.ancestor(distance).values[0]
+            # "this" is always bound one scope inside of "super"
+            instance = env.ancestor(distance - 1).values[0]
+            method = superclass.find_method(method_name.lexeme)
+            if method == None:
+                raise LoxPyRuntimeError(method_name, "Undefined property '" + method_name.lexeme + "'.")
+            return method.bind(instance)
+        return get_super
+
+    def visit_this_expr(self, expr: expressions.This):
+        return self.compile_get(expr.keyword, expr.depth, expr.slot)
+
+    def visit_unary_expr(self, expr: expressions.Unary):
+        right = self.compile_expr(expr.right)
+        operator = expr.operator
+
+        if operator.type == TokenType.NOT:
+            return lambda env: not right(env)
+
+        def negate(env):
+            value = right(env)
+            if type(value) is not float:
+                raise LoxPyRuntimeError(operator, "Operand must be a number.")
+            return -value
+        return negate
+
+    def visit_variable_expr(self, expr: expressions.Variable):
+        return self.compile_get(expr.name, expr.depth, expr.slot)
@@ -0,0 +1,137 @@
+from loxpy.evaluator.lox_callable import LoxCallable
+from loxpy.environment import Frame
+from loxpy.token import Token
+from loxpy.evaluator.completion import BREAK, RETURN, TAIL_CALL
+from loxpy.evaluator.runtime_error import LoxBreakException
+from loxpy.evaluator.memoization import MemoTable, memo_key, MISSING
+
+
+class CompiledFunction(LoxCallable):
+    '''
+    Function whose body has been compiled into a Python closure by the
+    ClosureCompiler. Plays the same role as LoxFunction, so LoxClass and
+    LoxInstance work with it unchanged.
+    '''
+    def __init__(self,
+        name:Token,
+        arity:int,
+        size:int,
+        body,
+        closure:Frame,
+        is_initializer=False
+    ):
+        super().__init__()
+        self.token = name
+        self.name = name.lexeme
+        self.param_count = arity
+        self.size = size
+        self.body = body
+        self.closure = closure
+        self.is_initializer = is_initializer
+        # Frame slots past the parameters hold the body's locals
+        self.locals_padding = [None] * (size - arity)
+
+    def call(self, interpreter, arguments:list):
+        status = self.body(Frame(arguments + self.locals_padding, self.closure))
+        if status is TAIL_CALL:
+            return self.run_tail_calls(interpreter)
+
+        if status is BREAK:
+            # A break outside of any loop in the body ends the caller's loop
+            raise LoxBreakException(self.token)
+
+        if self.is_initializer:
+            return self.closure.values[0]
+
+        if status is RETURN:
+            return interpreter.return_value
+        return None
+
+    def call_method(self, interpreter, instance, arguments:list):
+        '''
+        Same as `bind(instance).call(...)` without creating the bound
+        function.
+        '''
+        status = self.body(Frame(arguments + self.locals_padding, Frame([instance], self.closure)))
+        if status is TAIL_CALL:
+            return self.run_tail_calls(interpreter)
+
+        if status is BREAK:
+            raise LoxBreakException(self.token)
+
+        if self.is_initializer:
+            return instance
+
+        if status is RETURN:
+            return interpreter.return_value
+        return None
+
+    def frame(self, instance, arguments:list):
+        '''
+        Frame of a call with `arguments`, as a method of `instance` unless
+        it is None.
+        '''
+        closure = self.closure
+        if instance != None:
+            closure = Frame([instance], closure)
+        return Frame(arguments + self.locals_padding, closure)
+
+    @staticmethod
+    def run_tail_calls(interpreter):
+        '''
+        Runs the tail calls left in return_value by a body that completed
+        with TAIL_CALL, and returns the value of the last one. Initializers
+        never return a value, so none of them is an initializer.
+        '''
+        status = TAIL_CALL
+        while status is TAIL_CALL:
+            function, env = interpreter.return_value
+            status = function.body(env)
+
+        if status is BREAK:
+            raise LoxBreakException(function.token)
+
+        if status is RETURN:
+            return interpreter.return_value
+        return None
+
+    def arity(self):
+        return self.param_count
+
+    def __str__(self):
+        return f"<fn {self.name}>"
+
+    def bind(self, instance):
+        return CompiledFunction(
+            self.token, self.param_count, self.size, self.body,
+            Frame([instance], self.closure), self.is_initializer
+        )
+
+
+class MemoizedCompiledFunction(CompiledFunction):
+    '''
+    Same as MemoizedFunction for the ClosureCompiler.
+    '''
+    def __init__(self, name:Token, arity:int, size:int, body, closure:Frame, memo:MemoTable):
+        super().__init__(name, arity, size, body, closure)
+        self.memo = memo
+
+    def call(self, interpreter, arguments:list):
+        key = memo_key(arguments)
+        if key == None:
+            return CompiledFunction.call(self, interpreter, arguments)
+
+        value = self.memo.lookup(key)
+        if value is MISSING:
+            value = CompiledFunction.call(self, interpreter, arguments)
+            self.memo.store(key, value)
+        return value
+
+    def cached(self, arguments:list):
+        '''
+        Same as MemoizedFunction.cached.
+        '''
+        key = memo_key(arguments)
+        if key == None:
+            return MISSING
+        return self.memo.lookup(key)
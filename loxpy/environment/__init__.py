@@ -32,3 +32,28 @@ class Environment:
         raise LoxPyRuntimeError(
             name, "Undefined variable " + name.lexeme + "."
         )
+
+
+
+class Frame:
+    '''
+    Activation frame for a local scope. Locals live in a fixed-size list
+    and are addressed by the slot numbers assigned by the Resolver.
+    '''
+    __slots__ = ('values', 'enclosing')
+
+    def __init__(self, values:list, enclosing=None):
+        self.values = values
+        self.enclosing = enclosing
+
+    def ancestor(self, distance:int):
+        frame = self
+        for _ in range(distance):
+            frame = frame.enclosing
+        return frame
+
+    def get_at(self, distance:int, slot:int):
+        return self.ancestor(distance).values[slot]
+
+    def assign_at(self, distance:int, slot:int, value:object):
+        self.ancestor(distance).values[slot] = value
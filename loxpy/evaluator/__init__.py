@@ -3,39 +3,95 @@ from loxpy.parser import statements
 from loxpy.token import Token
 from loxpy.token.token_types import TokenType
 
-from loxpy.environment import Environment
+from loxpy.environment import Environment, Frame
 
 from loxpy.evaluator.lox_class import LoxClass
 from loxpy.evaluator.lox_callable import LoxCallable
-from loxpy.evaluator.lox_function import LoxFunction
+from loxpy.evaluator.lox_function import LoxFunction, MemoizedFunction
 from loxpy.evaluator.lox_instance import LoxInstance
-
-from copy import deepcopy
+from loxpy.evaluator.inline_cache import InlineCaches
+from loxpy.evaluator.memoization import Memoizer, MISSING
+from loxpy.evaluator.completion import BREAK, RETURN, TAIL_CALL
+from loxpy.evaluator import quickening
 
 from loxpy.evaluator.runtime_error import (
     LoxPyRuntimeError, 
     LoxPyDivisionByZeroError, 
     LoxBreakException,
-    LoxReturn
+    LoxNativeError
 )
 
 
 from loxpy.evaluator.native_functions import (
-    Clock
+    NativeObject,
+    native_globals
 )
 
 class Interpreter(
     expressions.ExprVisitor,
     statements.StmtVisitor
 ):
+    # Whether call runs the enter_call and exit_call hooks
+    tracing = False
+
     def __init__(self, lox_main):
         self.lox = lox_main
+        # Sink of print statements, see loxpy/output
+        self.output = lox_main.output
         self.global_env = Environment()
         self.env = self.global_env
 
-        self.global_env.define(
-            "clock", Clock()
-        )
+        for name, value in native_globals().items():
+            self.global_env.define(name, value)
+
+        # Value of the last executed return statement, see completion.py
+        self.return_value = None
+
+        # Inline caches of the property access sites, see visit_dot_expr
+        self.inline_caches = InlineCaches()
+
+        # Result caches of pure functions, see visit_function_stmt
+        self.memoizer = Memoizer()
+
+        # Visit methods keyed by node class
+        self.expr_table = self.expr_dispatch_table()
+        self.stmt_table = self.stmt_dispatch_table()
+        self.expr_table.update({
+            quickening.GenericBinary: self.visit_generic_binary,
+            quickening.AddNumbers: self.visit_add_numbers,
+            quickening.AddStrings: self.visit_add_strings,
+            quickening.SubtractNumbers: self.visit_subtract_numbers,
+            quickening.MultiplyNumbers: self.visit_multiply_numbers,
+            quickening.DivideNumbers: self.visit_divide_numbers,
+            quickening.GreaterNumbers: self.visit_greater_numbers,
+            quickening.GreaterEqualNumbers: self.visit_greater_equal_numbers,
+            quickening.LesserNumbers: self.visit_lesser_numbers,
+            quickening.LesserEqualNumbers: self.visit_lesser_equal_numbers,
+            quickening.Equal: self.visit_equal,
+            quickening.NotEqual: self.visit_not_equal,
+        })
+
+        # Operator implementations keyed by operator type
+        self.binary_operators = {
+            TokenType.PLUS: self.add,
+            TokenType.MINUS: self.subtract,
+            TokenType.MULTIPLY: self.multiply,
+            TokenType.DIVIDE: self.divide,
+            TokenType.GREATER: self.greater,
+            TokenType.GREATER_EQUAL: self.greater_equal,
+            TokenType.LESSER: self.lesser,
+            TokenType.LESSER_EQUAL: self.lesser_equal,
+            TokenType.EQUAL_EQUAL: self.equal,
+            TokenType.NOT_EQUAL: self.not_equal,
+        }
+        self.unary_operators = {
+            TokenType.MINUS: self.negate,
+            TokenType.NOT: self.logical_not,
+        }
+        self.logical_operators = {
+            TokenType.OR: self.logical_or,
+            TokenType.AND: self.logical_and,
+        }
 
     def interpret(self, statements):
         try:
@@ -48,9 +104,10 @@ class Interpreter(
             self.lox.runtime_error(error)
 
     def execute(self, statement:statements.Stmt):
-        statement.accept(self)
+        return self.stmt_table[type(statement)](statement)
 
-    def stringify(self, value):
+    @staticmethod
+    def stringify(value):
         if value == None:
             return "null"
         
@@ -68,26 +125,14 @@ class Interpreter(
         return str(value)
 
     def evaluate(self, expr:expressions.Expr):
-        return expr.accept(self)
+        return self.expr_table[type(expr)](expr)
 
     def is_truthy(self, object:object):
-        
-        if object == None:
-            return False
-        if type(object) == bool:
-            return object
-
-        try:
-            object = self.evaluate(object)
-        except:
-            pass
-        
-        if type(object) == bool:
-            return object
-        elif type(object) == list or type(object)==str:
-            return len(object) != 0
-                
-        return object
+        '''
+        null, false, 0 and empty strings are falsey, like Python's truth
+        test of the same values.
+        '''
+        return bool(object)
     
     def is_equal(self, left, right):
         if left == None and right == None:
@@ -97,46 +142,173 @@ class Interpreter(
         return left == right
     
     def visit_binary_expr(self, expr:expressions.Binary):
+        table = self.expr_table
+        left = table[type(expr.left)](expr.left)
+        right = table[type(expr.right)](expr.right)
+        value = self.binary(expr, left, right)
+
+        # From now on the node is evaluated by its specialized visit method
+        expr.__class__ = quickening.specialize(expr.operator.type, left, right)
+        return value
+
+    def binary(self, expr:expressions.Binary, left:object, right:object):
+        return self.binary_operators[expr.operator.type](expr.operator, left, right)
+
+    # Operator implementations, see the tables built in __init__
+
+    def add(self, operator:Token, left:object, right:object):
+        if type(left) == type(right) and type(left) == str:
+            return left + right
+        elif type(left) == type(right) and type(left) == float:
+            return left + right
+        raise LoxPyRuntimeError(operator, "Operands must be either number or string type but not both.")
+
+    def subtract(self, operator:Token, left:object, right:object):
+        self.check_number_operands(operator, left, right)
+        return left - right
+
+    def multiply(self, operator:Token, left:object, right:object):
+        self.check_number_operands(operator, left, right)
+        return left * right
+
+    def divide(self, operator:Token, left:object, right:object):
+        self.check_number_operands(operator, left, right)
+        self.check_divisor_zero(operator, right)
+        return left / right
+
+    def greater(self, operator:Token, left:object, right:object):
+        self.check_number_operands(operator, left, right)
+        return left > right
+
+    def greater_equal(self, operator:Token, left:object, right:object):
+        self.check_number_operands(operator, left, right)
+        return left >= right
+
+    def lesser(self, operator:Token, left:object, right:object):
+        self.check_number_operands(operator, left, right)
+        return left < right
+
+    def lesser_equal(self, operator:Token, left:object, right:object):
+        self.check_number_operands(operator, left, right)
+        return left <= right
+
+    def equal(self, operator:Token, left:object, right:object):
+        return self.is_equal(left, right)
+
+    def not_equal(self, operator:Token, left:object, right:object):
+        return not self.is_equal(left, right)
+
+    def negate(self, operator:Token, right:object):
+        self.check_number_operand(operator, right)
+        return -float(right)
+
+    def logical_not(self, operator:Token, right:object):
+        return not self.is_truthy(right)
+
+    def logical_or(self, expr: expressions.Logical):
         left = self.evaluate(expr.left)
-        right = self.evaluate(expr.right)
+        if self.is_truthy(left):
+            return left
+        return self.evaluate(expr.right)
 
-        if expr.operator.type == TokenType.MINUS:
-            self.check_number_operands(expr.operator, left, right)
+    def logical_and(self, expr: expressions.Logical):
+        left = self.evaluate(expr.left)
+        if not self.is_truthy(left):
+            return left
+        return self.evaluate(expr.right)
+
+    # Quickened binary nodes, see quickening.py
+
+    def deoptimize(self, expr:expressions.Binary, left:object, right:object):
+        expr.__class__ = quickening.GenericBinary
+        return self.binary(expr, left, right)
+
+    def visit_generic_binary(self, expr:expressions.Binary):
+        table = self.expr_table
+        left = table[type(expr.left)](expr.left)
+        right = table[type(expr.right)](expr.right)
+        return self.binary(expr, left, right)
+
+    def visit_add_numbers(self, expr:expressions.Binary):
+        table = self.expr_table
+        left = table[type(expr.left)](expr.left)
+        right = table[type(expr.right)](expr.right)
+        if type(left) is float and type(right) is float:
+            return left + right
+        return self.deoptimize(expr, left, right)
+
+    def visit_add_strings(self, expr:expressions.Binary):
+        table = self.expr_table
+        left = table[type(expr.left)](expr.left)
+        right = table[type(expr.right)](expr.right)
+        if type(left) is str and type(right) is str:
+            return left + right
+        return self.deoptimize(expr, left, right)
+
+    def visit_subtract_numbers(self, expr:expressions.Binary):
+        table = self.expr_table
+        left = table[type(expr.left)](expr.left)
+        right = table[type(expr.right)](expr.right)
+        if type(left) is float and type(right) is float:
             return left - right
-        elif expr.operator.type == TokenType.MULTIPLY:
-            self.check_number_operands(expr.operator, left, right)
+        return self.deoptimize(expr, left, right)
+
+    def visit_multiply_numbers(self, expr:expressions.Binary):
+        table = self.expr_table
+        left = table[type(expr.left)](expr.left)
+        right = table[type(expr.right)](expr.right)
+        if type(left) is float and type(right) is float:
             return left * right
-        elif expr.operator.type == TokenType.DIVIDE:
-            self.check_number_operands(expr.operator, left, right)
-            self.check_divisor_zero(expr.operator, right)
+        return self.deoptimize(expr, left, right)
+
+    def visit_divide_numbers(self, expr:expressions.Binary):
+        table = self.expr_table
+        left = table[type(expr.left)](expr.left)
+        right = table[type(expr.right)](expr.right)
+        if type(left) is float and type(right) is float and right != 0:
             return left / right
-        elif expr.operator.type == TokenType.PLUS:
-            if type(left) == type(right) and type(left) == str:
-                return left + right
-            elif type(left) == type(right) and type(left) == float:
-                return left + right
-            else:
-                raise LoxPyRuntimeError(expr.operator, "Operands must be either number or string type but not both.")
-        
-        elif expr.operator.type == TokenType.GREATER:
-            self.check_number_operands(expr.operator, left, right)
+        # Division by zero is reported by the generic path
+        return self.deoptimize(expr, left, right)
+
+    def visit_greater_numbers(self, expr:expressions.Binary):
+        table = self.expr_table
+        left = table[type(expr.left)](expr.left)
+        right = table[type(expr.right)](expr.right)
+        if type(left) is float and type(right) is float:
             return left > right
-        elif expr.operator.type == TokenType.GREATER_EQUAL:
-            self.check_number_operands(expr.operator, left, right)
+        return self.deoptimize(expr, left, right)
+
+    def visit_greater_equal_numbers(self, expr:expressions.Binary):
+        table = self.expr_table
+        left = table[type(expr.left)](expr.left)
+        right = table[type(expr.right)](expr.right)
+        if type(left) is float and type(right) is float:
             return left >= right
-        elif expr.operator.type == TokenType.LESSER:
-            self.check_number_operands(expr.operator, left, right)
+        return self.deoptimize(expr, left, right)
+
+    def visit_lesser_numbers(self, expr:expressions.Binary):
+        table = self.expr_table
+        left = table[type(expr.left)](expr.left)
+        right = table[type(expr.right)](expr.right)
+        if type(left) is float and type(right) is float:
             return left < right
-        elif expr.operator.type == TokenType.LESSER_EQUAL:
-            self.check_number_operands(expr.operator, left, right)
+        return self.deoptimize(expr, left, right)
+
+    def visit_lesser_equal_numbers(self, expr:expressions.Binary):
+        table = self.expr_table
+        left = table[type(expr.left)](expr.left)
+        right = table[type(expr.right)](expr.right)
+        if type(left) is float and type(right) is float:
             return left <= right
-        
-        elif expr.operator.type == TokenType.NOT_EQUAL:
-            return not self.is_equal(left, right)
-        elif expr.operator.type == TokenType.EQUAL_EQUAL:
-            return self.is_equal(left, right)
-        
-        return None
+        return self.deoptimize(expr, left, right)
+
+    def visit_equal(self, expr:expressions.Binary):
+        table = self.expr_table
+        return table[type(expr.left)](expr.left) == table[type(expr.right)](expr.right)
+
+    def visit_not_equal(self, expr:expressions.Binary):
+        table = self.expr_table
+        return not (table[type(expr.left)](expr.left) == table[type(expr.right)](expr.right))
 
     
     def visit_grouping_expr(self, expr:expressions.Grouping):
@@ -147,23 +319,24 @@ class Interpreter(
     
     def visit_unary_expr(self, expr:expressions.Unary):
         right = self.evaluate(expr.right)
-
-        if expr.operator.type == TokenType.NOT:
-            return not self.is_truthy(right)
-        if expr.operator.type == TokenType.MINUS:
-            self.check_number_operand(expr.operator, right)
-            return -float(right)
-        
-        return None
+        return self.unary_operators[expr.operator.type](expr.operator, right)
     
     def visit_if_stmt(self, expr: statements.If):
-        if self.is_truthy(expr.condition):
-            self.execute(expr.thenBranch)
+        # Truthiness is Python's, see is_truthy
+        if self.evaluate(expr.condition):
+            return self.execute(expr.thenBranch)
         elif expr.elseBranch != None:
-            self.execute(expr.elseBranch)
+            return self.execute(expr.elseBranch)
 
     def visit_block_stmt(self, expr: statements.Block):
-        self.execute_block(expr.statements, Environment(self.env))
+        if expr.size == 0:
+            table = self.stmt_table
+            for statement in expr.statements:
+                status = table[type(statement)](statement)
+                if status != None:
+                    return status
+            return None
+        return self.execute_block(expr.statements, Frame([None] * expr.size, self.env))
 
     def visit_expression_stmt(self, expr: statements.Expression):
         self.evaluate(expr.expression)
@@ -171,31 +344,27 @@ class Interpreter(
     
     def visit_print_stmt(self, expr: statements.Print):
         value = self.evaluate(expr.expression)
-        print(self.stringify(value))
+        self.output.write(self.stringify(value) + "\n")
         return None
 
     def visit_class_stmt(self, expr: statements.Class):
         superclass = None
         if expr.superclass != None:
             superclass = self.evaluate(expr.superclass)
-            if not isinstance(superclass, LoxClass):
-                raise LoxPyRuntimeError(expr.superclass.name, "Superclass must be a class.")
-
-        self.env.define(
-            expr.name.lexeme, None
-        )
+        self.define_class(expr, superclass)
 
+    def define_class(self, expr: statements.Class, superclass:object):
         if expr.superclass != None:
-            self.env = Environment(self.env)
-            self.env.define("super", superclass)
+            if not isinstance(superclass, LoxClass):
+                raise LoxPyRuntimeError(expr.superclass.name, "Superclass must be a class.")
+            self.env = Frame([superclass], self.env)
 
         methods = {}
         for method in expr.methods:
             funct = LoxFunction(
                 method,
                 self.env,
-                True,
-                method.name == "init"
+                method.name.lexeme == "init"
             )
             methods[method.name.lexeme] = funct
 
@@ -204,13 +373,13 @@ class Interpreter(
         if superclass != None:
             self.env = self.env.enclosing
 
-        self.env.assign(
-            expr.name, loxklass
-        ) 
+        self.define(expr.slot, expr.name, loxklass)
 
     def visit_super_expr(self, expr: expressions.Super):
-        superclass = self.env.get(Token(None, "super", "super", -1))
-        currentclass = self.env.get(Token(None, "this", "this", -1))
+        distance = expr.depth
+        superclass = self.env.get_at(distance, 0)
+        # "this" is always bound one scope inside of "super"
+        currentclass = self.env.get_at(distance - 1, 0)
         method = superclass.find_method(expr.method.lexeme)
 
         if method == None:
@@ -222,61 +391,204 @@ class Interpreter(
         value = None
         if stmt.initializer != None:
             value = self.evaluate(stmt.initializer)
-        self.env.define(stmt.name.lexeme, value)
+        self.define(stmt.slot, stmt.name, value)
     
     def visit_variable_expr(self, expr: expressions.Variable):
-        return self.env.get(expr.name)
+        return self.look_up_variable(expr.name, expr)
 
     def visit_assign_expr(self, expr: expressions.Assign):
-        value = self.evaluate(expr.value)
-        self.env.assign(expr.name, value)
+        return self.assign(expr, self.evaluate(expr.value))
+
+    def assign(self, expr: expressions.Assign, value:object):
+        distance = expr.depth
+        if distance != None:
+            self.env.assign_at(distance, expr.slot, value)
+        else:
+            self.global_env.assign(expr.name, value)
         return value
 
+    def look_up_variable(self, name:Token, expr:expressions.Expr):
+        distance = expr.depth
+        if distance == 0:
+            return self.env.values[expr.slot]
+        if distance != None:
+            return self.env.get_at(distance, expr.slot)
+        return self.global_env.get(name)
+
+    def define(self, slot:int, name:Token, value:object):
+        if slot != None:
+            self.env.values[slot] = value
+        else:
+            self.global_env.define(name.lexeme, value)
+
     def visit_while_stmt(self, expr: statements.While):
-        while self.is_truthy(
-            self.evaluate(expr.condition)
-        ):
+        while self.evaluate(expr.condition):
             try:
-                self.execute(expr.body)
+                status = self.execute(expr.body)
             except LoxBreakException:
-                return
+                # Break of a function called from the body, see LoxFunction.run
+                return None
+
+            if status != None:
+                if status is BREAK:
+                    return None
+                return status
     
     def visit_break_stmt(self, expr: statements.Break):
-        raise LoxBreakException(expr.token)
+        return BREAK
 
     def visit_logical_expr(self, expr: expressions.Logical):
-        left = self.evaluate(expr.left)
-        if expr.operator.type == TokenType.OR:
-            if self.is_truthy(left):
-                return left
-        elif expr.operator.type == TokenType.AND:
-            if not self.is_truthy(left):
-                return left
-        return self.evaluate(expr.right)
+        return self.logical_operators[expr.operator.type](expr)
 
     def visit_call_expr(self, expr: expressions.Call):
-        callee = self.evaluate(expr.callee)
+        if type(expr.callee) is expressions.Dot:
+            return self.invoke(expr)
+        return self.call(expr, self.evaluate(expr.callee))
+
+    def call(self, expr: expressions.Call, callee:object, instance:LoxInstance=None):
+        '''
+        Calls `callee`, as a method of `instance` when it is not None.
+        '''
+        # Same as self.arguments, inlined as every call goes through here
         if not isinstance(callee, LoxCallable):
             raise LoxPyRuntimeError(expr.paren, "Can only call function and classes.")
-        
-        arguments = []
-        
-        for argument in expr.arguments:
-            arguments.append(self.evaluate(argument))
+
+        table = self.expr_table
+        arguments = [table[type(argument)](argument) for argument in expr.arguments]
 
         if len(arguments) != callee.arity():
             raise LoxPyRuntimeError(expr.paren, "Expected " +
                 str(callee.arity()) + " arguments but got " +
                 str(len(arguments)) + "."
             )
+        if self.tracing:
+            self.enter_call(expr, callee, instance)
+        try:
+            if instance == None:
+                return callee.call(self, arguments)
+            return callee.call_method(self, instance, arguments)
+        except RecursionError:
+            # Out of Python stack: report it at the innermost call that
+            # still has room to raise
+            raise LoxPyRuntimeError(expr.paren, "Stack overflow.") from None
+        except LoxNativeError as error:
+            raise LoxPyRuntimeError(expr.paren, str(error)) from None
+        finally:
+            if self.tracing:
+                self.exit_call()
+
+    def enter_call(self, expr: expressions.Call, callee:LoxCallable, instance:LoxInstance):
+        '''
+        Hook run by call once the arguments have been evaluated, when
+        `tracing` is set.
+        '''
+
+    def exit_call(self):
+        '''
+        Hook run by call when the callee has returned or raised, when
+        `tracing` is set.
+        '''
+
+    def arguments(self, expr: expressions.Call, callee:object):
+        '''
+        Evaluated arguments of a call of `callee`, checked against its arity.
+        '''
+        if not isinstance(callee, LoxCallable):
+            raise LoxPyRuntimeError(expr.paren, "Can only call function and classes.")
         
-        return callee.call(self, arguments)
+        table = self.expr_table
+        arguments = [table[type(argument)](argument) for argument in expr.arguments]
+
+        if len(arguments) != callee.arity():
+            raise LoxPyRuntimeError(expr.paren, "Expected " +
+                str(callee.arity()) + " arguments but got " +
+                str(len(arguments)) + "."
+            )
+        return arguments
     
+    def invoke(self, expr: expressions.Call):
+        '''
+        Method call `obj.name(...)`: the method comes from the site's inline
+        cache and is called without creating a bound method.
+        '''
+        callee, instance = self.method_of(expr.callee, self.evaluate(expr.callee.object))
+        return self.call(expr, callee, instance)
+
+    def method_of(self, dot: expressions.Dot, obj:object):
+        '''
+        Callee of `obj.name(...)` and the instance to call it on, which is
+        None when the callee is a field.
+        '''
+        if not isinstance(obj, LoxInstance):
+            return self.native_method(dot, obj), obj
+
+        offset, method = self.property_cache(dot).lookup(obj.shape)
+        if offset != None:
+            return obj.values[offset], None
+        if method == None:
+            raise LoxPyRuntimeError(dot.name, "Undefined property '" + dot.name.lexeme + "'.")
+        return method, obj
+
+    def tail_call(self, expr: expressions.Call):
+        '''
+        Call in `return f(...)` position. Lox functions are not called here:
+        the function and its frame are left in return_value for
+        LoxFunction.run, which runs them in place of the returning function,
+        so tail calls take no Python stack.
+        '''
+        if type(expr.callee) is expressions.Dot:
+            callee, instance = self.method_of(expr.callee, self.evaluate(expr.callee.object))
+        else:
+            callee, instance = self.evaluate(expr.callee), None
+
+        if type(callee) is LoxFunction and not callee.is_initializer:
+            arguments = self.arguments(expr, callee)
+            self.return_value = (callee, callee.frame(instance, arguments))
+            return TAIL_CALL
+
+        if type(callee) is MemoizedFunction:
+            arguments = self.arguments(expr, callee)
+            value = callee.cached(arguments)
+            if value is MISSING:
+                self.return_value = (callee, callee.frame(instance, arguments))
+                return TAIL_CALL
+            self.return_value = value
+            return RETURN
+
+        self.return_value = self.call(expr, callee, instance)
+        return RETURN
+
+    def property_cache(self, expr: expressions.Dot):
+        cache = expr.cache
+        if cache == None:
+            cache = expr.cache = self.inline_caches.property_cache(expr.name)
+        return cache
+
     def visit_dot_expr(self, expr: expressions.Dot):
-        obj = self.evaluate(expr.object)
-        if isinstance(obj, LoxInstance):
-            return obj.get(expr.name)
-        raise LoxPyRuntimeError(expr.name, "Only instances have properties.")
+        return self.get_property(expr, self.evaluate(expr.object))
+
+    def get_property(self, expr: expressions.Dot, obj:object):
+        if not isinstance(obj, LoxInstance):
+            return self.native_method(expr, obj).bind(obj)
+
+        offset, method = self.property_cache(expr).lookup(obj.shape)
+        if offset != None:
+            return obj.values[offset]
+        if method == None:
+            raise LoxPyRuntimeError(expr.name, "Undefined property '" + expr.name.lexeme + "'.")
+        return method.bind(obj)
+
+    def native_method(self, expr: expressions.Dot, obj:object):
+        '''
+        Method `name` of a native object such as a List.
+        '''
+        if not isinstance(obj, NativeObject):
+            raise LoxPyRuntimeError(expr.name, "Only instances have properties.")
+
+        method = obj.methods.get(expr.name.lexeme)
+        if method == None:
+            raise LoxPyRuntimeError(expr.name, "Undefined property '" + expr.name.lexeme + "'.")
+        return method
     
     def visit_dotset_expr(self, expr: expressions.DotSet):
         obj = self.evaluate(expr.object)
@@ -284,24 +596,41 @@ class Interpreter(
         if not isinstance(obj, LoxInstance):
             raise LoxPyRuntimeError(expr.name, "Only instances have fields.")
         
-        value = self.evaluate(expr.value)
-        obj.set(expr.name, value)
+        return self.store_field(expr, obj, self.evaluate(expr.value))
+
+    def store_field(self, expr: expressions.DotSet, obj:LoxInstance, value:object):
+        cache = expr.cache
+        if cache == None:
+            cache = expr.cache = self.inline_caches.store_cache(expr.name)
+
+        # Evaluating the value may have added fields, so the shape is read now
+        offset, obj.shape = cache.lookup(obj.shape)
+        values = obj.values
+        if offset == len(values):
+            values.append(value)
+        else:
+            values[offset] = value
         return value
 
     def visit_this_expr(self, expr: expressions.This):
-        return self.env.get(expr.keyword)
+        return self.look_up_variable(expr.keyword, expr)
     
     def visit_function_stmt(self, stmt: statements.Function):
-        fn = LoxFunction(stmt, self.env)
-        self.env.define(
-            stmt.name.lexeme, fn
-        )
+        if self.memoizer.memoizes(stmt):
+            fn = MemoizedFunction(stmt, self.env, self.memoizer.table(stmt))
+        else:
+            fn = LoxFunction(stmt, self.env)
+        self.define(stmt.slot, stmt.name, fn)
     
     def visit_return_stmt(self, expr: statements.Return):
+        if type(expr.value) is expressions.Call:
+            return self.tail_call(expr.value)
+
         value = None
         if expr.value != None:
             value = self.evaluate(expr.value)
-        raise LoxReturn(value)
+        self.return_value = value
+        return RETURN
 
     def check_number_operand(self, operator:Token, operand:object):
         if type(operand) == float:
@@ -317,12 +646,16 @@ class Interpreter(
         if divisor == 0:
             raise LoxPyDivisionByZeroError(operator)
 
-    def execute_block(self, statements, environment:Environment):
+    def execute_block(self, statements, environment:Frame):
         previous = self.env
         try:
             self.env = environment
+            table = self.stmt_table
             for statement in statements:
-                self.execute(statement)
+                status = table[type(statement)](statement)
+                if status != None:
+                    return status
+            return None
         finally:
             self.env = previous
 
@@ -0,0 +1,15 @@
+'''
+Completion signals of statements.
+
+Executing a statement returns None when it completes normally, BREAK when
+a `break` is leaving the enclosing loop and RETURN when a `return` is
+leaving the enclosing function. The engine keeps the returned value in
+its `return_value` attribute, so no exception is needed for either.
+
+TAIL_CALL is a return whose value is a call still to be made: the engine
+leaves the function to call and its frame in `return_value`, and the
+function returning runs them in its own place.
+'''
+BREAK = "break"
+RETURN = "return"
+TAIL_CALL = "tail call"
@@ -0,0 +1,151 @@
+'''
+Inline caches for property access, method call and field store sites.
+
+Shapes and classes never change once they are created, so what a name
+resolves to for a given receiver shape never changes either: the offset
+of a field in the instance values, or the method of the shape's class.
+Each site remembers the shapes it has seen and what the name resolved to
+for each, which saves looking it up again on every access.
+'''
+from abc import ABC, abstractmethod
+from loxpy.token import Token
+
+
+class InlineCache(ABC):
+    '''
+    Cache of one site. Monomorphic while it has seen a single receiver
+    shape, polymorphic up to MAX_SHAPES and megamorphic (lookups are no
+    longer cached) after that.
+
+    The monomorphic entry is kept unpacked in `offset` and `target`, so
+    that sites can check `shape` and use it without calling `lookup`.
+    '''
+    __slots__ = ('name', 'shape', 'offset', 'target', 'entries', 'megamorphic', 'hits', 'misses')
+
+    MAX_SHAPES = 4
+
+    def __init__(self, name:Token):
+        self.name = name
+        # Monomorphic entry
+        self.shape = None
+        self.offset = None
+        self.target = None
+        # Further shapes, once the site is polymorphic
+        self.entries = None
+        self.megamorphic = False
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, shape):
+        '''
+        Entry of `shape`, see `resolve`.
+        '''
+        if shape is self.shape:
+            self.hits += 1
+            return (self.offset, self.target)
+
+        entries = self.entries
+        if entries != None and shape in entries:
+            self.hits += 1
+            return entries[shape]
+
+        self.misses += 1
+        entry = self.resolve(shape)
+
+        if self.shape == None:
+            self.shape = shape
+            self.offset, self.target = entry
+        elif entries == None:
+            self.entries = {shape: entry}
+        elif len(entries) < self.MAX_SHAPES - 1:
+            entries[shape] = entry
+        else:
+            self.megamorphic = True
+        return entry
+
+    @abstractmethod
+    def resolve(self, shape):
+        '''
+        Entry of `shape`, found without the cache.
+        '''
+        pass
+
+    @property
+    def state(self):
+        if self.shape == None:
+            return "uninitialized"
+        if self.megamorphic:
+            return "megamorphic"
+        if self.entries == None:
+            return "monomorphic"
+        return "polymorphic"
+
+
+class PropertyCache(InlineCache):
+    '''
+    Cache of an `obj.name` or `obj.name(...)` site. Entries are
+    (offset, method) pairs: the offset of field `name` in the instance
+    values, or None and the method named `name` (None if there is none).
+    Fields shadow methods, so they are looked for first.
+    '''
+    __slots__ = ()
+
+    def resolve(self, shape):
+        lexeme = self.name.lexeme
+        offset = shape.offsets.get(lexeme)
+        if offset != None:
+            return (offset, None)
+        return (None, shape.klass.find_method(lexeme))
+
+
+class StoreCache(InlineCache):
+    '''
+    Cache of an `obj.name = value` site. Entries are (offset, shape)
+    pairs: the offset to store the value at and the shape of the instance
+    afterwards. The offset is the length of the values when the store adds
+    the field.
+    '''
+    __slots__ = ()
+
+    def resolve(self, shape):
+        lexeme = self.name.lexeme
+        offset = shape.offsets.get(lexeme)
+        if offset != None:
+            return (offset, shape)
+        shape = shape.add_field(lexeme)
+        return (shape.offsets[lexeme], shape)
+
+
+class InlineCaches:
+    '''
+    Every inline cache an engine has created, for reporting.
+    '''
+    def __init__(self):
+        self.caches = []
+
+    def property_cache(self, name:Token):
+        cache = PropertyCache(name)
+        self.caches.append(cache)
+        return cache
+
+    def store_cache(self, name:Token):
+        cache = StoreCache(name)
+        self.caches.append(cache)
+        return cache
+
+    def report(self):
+        hits = sum(cache.hits for cache in self.caches)
+        misses = sum(cache.misses for cache in self.caches)
+        lookups = hits + misses
+
+        lines = [f"inline caches: {len(self.caches)} sites, {lookups} lookups"]
+        if lookups != 0:
+            lines.append(f"  hits   {hits:>12} ({100 * hits / lookups:.1f}%)")
+            lines.append(f"  misses {misses:>12} ({100 * misses / lookups:.1f}%)")
+
+        states = {}
+        for cache in self.caches:
+            states[cache.state] = states.get(cache.state, 0) + 1
+        for state, count in sorted(states.items()):
+            lines.append(f"  {state:<14} {count} sites")
+        return "\n".join(lines)
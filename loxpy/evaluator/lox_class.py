@@ -1,14 +1,26 @@
 from loxpy.evaluator.lox_instance import LoxInstance
 from loxpy.evaluator.lox_callable import LoxCallable
+from loxpy.evaluator.shape import Shape
 
 
 class LoxClass(LoxCallable, LoxInstance):
 
-    def __init__(self, name, superclass:'LoxClass', methods:list):
+    def __init__(self, name, superclass:'LoxClass', methods:dict):
+        # Shape of instances without fields, needed before the class can be
+        # an instance of itself
+        self.root_shape = Shape(self, {})
         super().__init__(self)
         self.name = name
         self.methods = methods
         self.superclass = superclass
+
+        # Own methods merged over the inherited ones, built once here so that
+        # a lookup is a single dict hit however deep the hierarchy is
+        self.method_table = {}
+        if superclass != None:
+            self.method_table.update(superclass.method_table)
+        self.method_table.update(methods)
+        self.initializer = self.method_table.get("init")
     
     def __str__(self):
         return self.name
@@ -16,21 +28,16 @@ class LoxClass(LoxCallable, LoxInstance):
     def call(self, interpreter, arguments: list):
         lox_instance = LoxInstance(self)
         
-        initializer = self.find_method("init")
+        initializer = self.initializer
         if initializer != None:
-            initializer.bind(lox_instance).call(interpreter, arguments)
+            initializer.call_method(interpreter, lox_instance, arguments)
 
         return lox_instance
 
     def arity(self):
-        initializer = self.find_method("init")
-        if initializer == None:
+        if self.initializer == None:
             return 0
-        return initializer.arity()
+        return self.initializer.arity()
     
     def find_method(self, name):
-        if name in self.methods:
-            return self.methods[name]
-        
-        if self.superclass != None:
-            return self.superclass.find_method(name)
+        return self.method_table.get(name)
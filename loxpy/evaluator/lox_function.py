@@ -1,47 +1,64 @@
 from loxpy.evaluator.lox_callable import LoxCallable
 from loxpy.parser import statements
-from loxpy.environment import Environment
+from loxpy.environment import Frame
 
-from loxpy.evaluator.runtime_error import LoxReturn
-
-from copy import deepcopy
+from loxpy.evaluator.completion import BREAK, RETURN, TAIL_CALL
+from loxpy.evaluator.runtime_error import LoxBreakException
+from loxpy.evaluator.memoization import MemoTable, memo_key, MISSING
 
 class LoxFunction(LoxCallable):
     def __init__(self, 
         declaration:statements.Function,
-        closure:Environment,
-        inside_class=False,
+        closure:Frame,
         is_initializer=False
     ):
         super().__init__()
         self.declaration = declaration
         self.is_initializer = is_initializer
-        if inside_class:
-            # Refer to parent closure
-            self.closure = closure
-        else:
-            self.closure = deepcopy(closure)
+        # Frame slots past the parameters hold the body's locals
+        self.locals_padding = [None] * (declaration.size - len(declaration.params))
+        # Captured by reference: the closure shares the defining frame, so
+        # later writes to captured locals are visible to every function
+        # closing over them and nothing is copied at definition time.
+        self.closure = closure
 
     def call(self, interpreter, arguments:list):
-        env = self.closure
+        return self.run(interpreter, Frame(arguments + self.locals_padding, self.closure))
+
+    def call_method(self, interpreter, instance, arguments:list):
+        '''
+        Same as `bind(instance).call(...)` without creating the bound
+        function.
+        '''
+        closure = Frame([instance], self.closure)
+        return self.run(interpreter, Frame(arguments + self.locals_padding, closure))
+
+    def frame(self, instance, arguments:list):
+        '''
+        Frame of a call with `arguments`, as a method of `instance` unless
+        it is None.
+        '''
+        closure = self.closure
+        if instance != None:
+            closure = Frame([instance], closure)
+        return Frame(arguments + self.locals_padding, closure)
 
-        for i in range(0, len(self.declaration.params), 1):
-            arg = self.declaration.params[i]
-            env.define(
-                arg.lexeme, arguments[i]
-            )
+    def run(self, interpreter, env:Frame):
+        function = self
+        status = interpreter.execute_block(function.declaration.body, env)
+        while status is TAIL_CALL:
+            function, env = interpreter.return_value
+            status = interpreter.execute_block(function.declaration.body, env)
 
-        try:
-            interpreter.execute_block(self.declaration.body, env)
-        except LoxReturn as return_obj:
-            if self.is_initializer:
-                return self.closure.get("this")
+        if status is BREAK:
+            # A break outside of any loop in the body ends the caller's loop
+            raise LoxBreakException(function.declaration.name)
 
-            return return_obj.value 
+        if function.is_initializer:
+            return env.enclosing.values[0]
 
-        if self.is_initializer:
-            return self.closure.get("this")
-        
+        if status is RETURN:
+            return interpreter.return_value
         return None
 
     def arity(self):
@@ -51,6 +68,37 @@ class LoxFunction(LoxCallable):
         return f"<fn {self.declaration.name.lexeme}>"
 
     def bind(self, instance):
-        env = Environment(self.closure)
-        env.define("this", instance)
-        return LoxFunction(self.declaration, env, True, self.is_initializer)
\ No newline at end of file
+        env = Frame([instance], self.closure)
+        return LoxFunction(self.declaration, env, self.is_initializer)
+
+
+class MemoizedFunction(LoxFunction):
+    '''
+    Function whose results are kept in `memo`, see memoization.py. Only
+    plain functions are memoized, never methods.
+    '''
+    def __init__(self, declaration:statements.Function, closure:Frame, memo:MemoTable):
+        super().__init__(declaration, closure)
+        self.memo = memo
+
+    def call(self, interpreter, arguments:list):
+        key = memo_key(arguments)
+        if key == None:
+            return LoxFunction.call(self, interpreter, arguments)
+
+        value = self.memo.lookup(key)
+        if value is MISSING:
+            value = LoxFunction.call(self, interpreter, arguments)
+            self.memo.store(key, value)
+        return value
+
+    def cached(self, arguments:list):
+        '''
+        Memoized result of a call with `arguments`, or MISSING. Tail calls
+        look their result up here, but on a miss run uncached so that they
+        still take no stack.
+        '''
+        key = memo_key(arguments)
+        if key == None:
+            return MISSING
+        return self.memo.lookup(key)
@@ -6,23 +6,42 @@ from loxpy.token import Token
 from loxpy.evaluator.runtime_error import LoxPyRuntimeError
 
 class LoxInstance:
-    
+    '''
+    Field values are kept in `values`, at the offsets given by the
+    instance's shape (see shape.py).
+    '''
+    __slots__ = ('kclass', 'shape', 'values')
+
     def __init__(self, klass):
         self.kclass = klass
-        self.fields = {}
+        self.shape = klass.root_shape
+        self.values = []
 
     def __str__(self):
         return self.kclass.name + " instance"
 
+    @property
+    def fields(self):
+        '''
+        Fields by name, in the order they were added.
+        '''
+        return dict(zip(self.shape.offsets, self.values))
+
     def get(self, name: Token):
-        if name.lexeme in self.fields:
-            return self.fields[name.lexeme]
+        offset = self.shape.offsets.get(name.lexeme)
+        if offset != None:
+            return self.values[offset]
 
         method = self.kclass.find_method(name.lexeme)
         if method != None:
             return method.bind(self)
 
         raise LoxPyRuntimeError(name, "Undefined property '" + name.lexeme + "'.")
-    
+
     def set(self, name: Token, value:object):
-        self.fields[name.lexeme] = value
+        offset = self.shape.offsets.get(name.lexeme)
+        if offset == None:
+            self.shape = self.shape.add_field(name.lexeme)
+            self.values.append(value)
+        else:
+            self.values[offset] = value
@@ -0,0 +1,127 @@
+'''
+Result caches of memoized functions.
+
+Functions the purity analysis marked pure (see loxpy/purity), and
+functions opted in by name, remember the results of their calls keyed by
+the argument values. Each function object has its own table of at most
+`size` results, the least recently used one is evicted first. Hits,
+misses and evictions are counted per declaration for the report.
+'''
+from math import copysign
+
+# Types of the argument values calls are memoized for. Anything else
+# (instances, functions, classes) may change or be told apart by identity
+KEY_TYPES = frozenset((float, str, bool, type(None)))
+
+# Lookup result of a key with no result yet
+MISSING = object()
+
+
+def memo_key(arguments:list):
+    '''
+    Key of a call with `arguments`, or None when the call can't be
+    memoized.
+    '''
+    for argument in arguments:
+        if type(argument) not in KEY_TYPES:
+            return None
+        if argument == 0 and type(argument) is float and copysign(1.0, argument) < 0:
+            # -0 equals 0 but is printed differently
+            return None
+    # True == 1.0 in Python, so the types are part of the key
+    return (*arguments, *map(type, arguments))
+
+
+class MemoStats:
+    '''
+    Counters of every table created for one declaration.
+    '''
+    __slots__ = ('name', 'line', 'hits', 'misses', 'evictions')
+
+    def __init__(self, name:str, line:int):
+        self.name = name
+        self.line = line
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+class MemoTable:
+    '''
+    Results of one function, least recently used first.
+    '''
+    __slots__ = ('results', 'size', 'stats')
+
+    def __init__(self, size:int, stats:MemoStats):
+        self.results = {}
+        self.size = size
+        self.stats = stats
+
+    def lookup(self, key:tuple):
+        '''
+        Result of the call with `key`, or MISSING.
+        '''
+        results = self.results
+        value = results.pop(key, MISSING)
+        if value is MISSING:
+            self.stats.misses += 1
+            return MISSING
+
+        # Reinserted to make it the most recently used
+        results[key] = value
+        self.stats.hits += 1
+        return value
+
+    def store(self, key:tuple, value:object):
+        results = self.results
+        results[key] = value
+        if len(results) > self.size:
+            del results[next(iter(results))]
+            self.stats.evictions += 1
+
+
+class Memoizer:
+    '''
+    Decides which functions are memoized and keeps their counters for
+    reporting.
+    '''
+    # Results kept per function
+    DEFAULT_SIZE = 1024
+
+    def __init__(self):
+        self.size = self.DEFAULT_SIZE
+        # Names of functions memoized whether pure or not, and never
+        self.include = set()
+        self.exclude = set()
+        # Declaration -> MemoStats
+        self.stats = {}
+
+    def memoizes(self, declaration):
+        '''
+        Whether functions created from `declaration` are memoized.
+        '''
+        name = declaration.name.lexeme
+        if self.size <= 0 or name in self.exclude:
+            return False
+        return declaration.pure == True or name in self.include
+
+    def table(self, declaration):
+        '''
+        New result table for a function created from `declaration`.
+        '''
+        stats = self.stats.get(declaration)
+        if stats == None:
+            stats = self.stats[declaration] = MemoStats(declaration.name.lexeme, declaration.name.line)
+        return MemoTable(self.size, stats)
+
+    def report(self):
+        stats = list(self.stats.values())
+        lines = [f"memoization: {len(stats)} functions, size {self.size}"]
+        for entry in stats:
+            calls = entry.hits + entry.misses
+            rate = 0.0 if calls == 0 else 100 * entry.hits / calls
+            lines.append(
+                f"  {entry.name} (line {entry.line}): {entry.hits} hits, "
+                f"{entry.misses} misses ({rate:.1f}% hits), {entry.evictions} evictions"
+            )
+        return "\n".join(lines)
@@ -1,5 +1,6 @@
 import time
 from loxpy.evaluator.lox_callable import LoxCallable
+from loxpy.evaluator.runtime_error import LoxNativeError
 
 class Clock(LoxCallable):
 
@@ -11,3 +12,193 @@ class Clock(LoxCallable):
 
     def __str__(self):
         return "<Native function 'clocl'>"
+
+
+class NativeMethod(LoxCallable):
+    '''
+    Method of a native object: a Python function taking the object and
+    the Lox arguments.
+    '''
+    def __init__(self, function):
+        super().__init__()
+        self.function = function
+        self.parameters = function.__code__.co_argcount - 1
+
+    def call_method(self, interpreter, instance, arguments:list):
+        return self.function(instance, *arguments)
+
+    def bind(self, instance):
+        return BoundNativeMethod(instance, self)
+
+    def arity(self):
+        return self.parameters
+
+    def __str__(self):
+        return f"<Native function '{self.function.__name__}'>"
+
+
+class BoundNativeMethod(LoxCallable):
+    def __init__(self, receiver, method:NativeMethod):
+        super().__init__()
+        self.receiver = receiver
+        self.method = method
+
+    def call(self, interpreter, arguments:list):
+        return self.method.function(self.receiver, *arguments)
+
+    def arity(self):
+        return self.method.parameters
+
+    def __str__(self):
+        return str(self.method)
+
+
+def native_methods(cls:type, *names:str):
+    return {name: NativeMethod(getattr(cls, name)) for name in names}
+
+
+class NativeObject:
+    '''
+    Value with methods implemented in Python, keyed by name in `methods`.
+    Native objects have no fields.
+    '''
+    __slots__ = ()
+
+    name = "native"
+    methods = {}
+
+    # Objects being printed, so that one containing itself prints once
+    printing = set()
+
+    def describe(self, opening:str, closing:str, entries):
+        from loxpy.evaluator import Interpreter
+
+        if id(self) in NativeObject.printing:
+            return opening + "..." + closing
+        NativeObject.printing.add(id(self))
+        try:
+            return opening + ", ".join(
+                ": ".join(Interpreter.stringify(value) for value in entry) for entry in entries
+            ) + closing
+        finally:
+            NativeObject.printing.discard(id(self))
+
+
+class LoxList(NativeObject):
+    '''
+    List backed by a Python list, indexed from 0.
+    '''
+    __slots__ = ('items',)
+
+    name = "List"
+
+    def __init__(self, items:list=None):
+        self.items = [] if items == None else items
+
+    def __str__(self):
+        return self.describe("[", "]", ((item,) for item in self.items))
+
+    def index(self, index):
+        if type(index) is not float or not index.is_integer():
+            raise LoxNativeError("List index must be an integer.")
+        if index < 0 or index >= len(self.items):
+            raise LoxNativeError("List index out of range.")
+        return int(index)
+
+    def append(self, value):
+        self.items.append(value)
+
+    def get(self, index):
+        return self.items[self.index(index)]
+
+    def set(self, index, value):
+        self.items[self.index(index)] = value
+        return value
+
+    def pop(self):
+        if len(self.items) == 0:
+            raise LoxNativeError("Cannot pop from an empty list.")
+        return self.items.pop()
+
+    def length(self):
+        return float(len(self.items))
+
+LoxList.methods = native_methods(LoxList, "append", "get", "set", "pop", "length")
+
+
+class LoxMap(NativeObject):
+    '''
+    Hash map backed by a Python dict. Keys are compared like `==` compares
+    them and kept in insertion order.
+    '''
+    __slots__ = ('entries',)
+
+    name = "Map"
+
+    def __init__(self):
+        self.entries = {}
+
+    def __str__(self):
+        return self.describe("{", "}", self.entries.items())
+
+    def get(self, key):
+        '''
+        Value of `key`, null when the map has none.
+        '''
+        return self.entries.get(key)
+
+    def set(self, key, value):
+        self.entries[key] = value
+        return value
+
+    def has(self, key):
+        return key in self.entries
+
+    def remove(self, key):
+        return self.entries.pop(key, None)
+
+    def length(self):
+        return float(len(self.entries))
+
+    def keys(self):
+        return LoxList(list(self.entries))
+
+    def values(self):
+        return LoxList(list(self.entries.values()))
+
+LoxMap.methods = native_methods(LoxMap, "get", "set", "has", "remove", "length", "keys", "values")
+
+
+class ListConstructor(LoxCallable):
+
+    def call(self, interpreter, arguments):
+        return LoxList()
+
+    def arity(self):
+        return 0
+
+    def __str__(self):
+        return "<Native function 'List'>"
+
+
+class MapConstructor(LoxCallable):
+
+    def call(self, interpreter, arguments):
+        return LoxMap()
+
+    def arity(self):
+        return 0
+
+    def __str__(self):
+        return "<Native function 'Map'>"
+
+
+def native_globals():
+    '''
+    Native globals every program starts with, by name.
+    '''
+    return {
+        "clock": Clock(),
+        "List": ListConstructor(),
+        "Map": MapConstructor(),
+    }
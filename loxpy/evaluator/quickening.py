@@ -0,0 +1,81 @@
+'''
+Quickened (self-specializing) binary expression nodes.
+
+The first time the Interpreter evaluates a Binary node it replaces the
+node's class with a subclass specialized for the operator and the operand
+types it saw, e.g. AddNumbers for `+` on two numbers. The subclasses add
+no slots, so only the node's class changes and every other visitor still
+sees a Binary. The Interpreter visits each subclass with its own method,
+which skips the operator dispatch and checks the operand types with a
+single guard. When the guard fails the node falls back to GenericBinary
+for good, so a node that sees mixed types is not respecialized.
+'''
+from loxpy.parser import expressions
+from loxpy.token.token_types import TokenType
+
+
+class GenericBinary(expressions.Binary):
+    __slots__ = ()
+
+class AddNumbers(expressions.Binary):
+    __slots__ = ()
+
+class AddStrings(expressions.Binary):
+    __slots__ = ()
+
+class SubtractNumbers(expressions.Binary):
+    __slots__ = ()
+
+class MultiplyNumbers(expressions.Binary):
+    __slots__ = ()
+
+class DivideNumbers(expressions.Binary):
+    __slots__ = ()
+
+class GreaterNumbers(expressions.Binary):
+    __slots__ = ()
+
+class GreaterEqualNumbers(expressions.Binary):
+    __slots__ = ()
+
+class LesserNumbers(expressions.Binary):
+    __slots__ = ()
+
+class LesserEqualNumbers(expressions.Binary):
+    __slots__ = ()
+
+class Equal(expressions.Binary):
+    __slots__ = ()
+
+class NotEqual(expressions.Binary):
+    __slots__ = ()
+
+
+# Keyed by (operator, left operand type, right operand type)
+SPECIALIZATIONS = {
+    (TokenType.PLUS, float, float): AddNumbers,
+    (TokenType.PLUS, str, str): AddStrings,
+    (TokenType.MINUS, float, float): SubtractNumbers,
+    (TokenType.MULTIPLY, float, float): MultiplyNumbers,
+    (TokenType.DIVIDE, float, float): DivideNumbers,
+    (TokenType.GREATER, float, float): GreaterNumbers,
+    (TokenType.GREATER_EQUAL, float, float): GreaterEqualNumbers,
+    (TokenType.LESSER, float, float): LesserNumbers,
+    (TokenType.LESSER_EQUAL, float, float): LesserEqualNumbers,
+}
+
+# Equality works on any operands, so it needs no guard
+EQUALITY = {
+    TokenType.EQUAL_EQUAL: Equal,
+    TokenType.NOT_EQUAL: NotEqual,
+}
+
+
+def specialize(operator_type:TokenType, left:object, right:object):
+    '''
+    Node class for a Binary `operator_type` that was evaluated with
+    operands `left` and `right`.
+    '''
+    if operator_type in EQUALITY:
+        return EQUALITY[operator_type]
+    return SPECIALIZATIONS.get((operator_type, type(left), type(right)), GenericBinary)
@@ -1,9 +1,4 @@
 
-class LoxReturn(RuntimeError):
-    def __init__(self, value:object):
-        super().__init__("Return statement triggered.")
-        self.value = value
-
 class LoxBreakException(RuntimeError):
     def __init__(self, token):
         self.token = token
@@ -16,4 +11,12 @@ class LoxPyRuntimeError(RuntimeError):
         
 class LoxPyDivisionByZeroError(LoxPyRuntimeError):
     def __init__(self, token):
-        super().__init__(token, "You cannot divide number by 0.")
\ No newline at end of file
+        super().__init__(token, "You cannot divide number by 0.")
+
+class LoxNativeError(LoxPyRuntimeError):
+    '''
+    Raised by native functions, which don't know where they were called
+    from: the engines report it at the line of the call.
+    '''
+    def __init__(self, message):
+        super().__init__(None, message)
@@ -0,0 +1,29 @@
+'''
+Hidden classes ("shapes") describing the field layout of instances.
+
+A shape maps each field name to its offset in the `values` list of the
+instances that have it. Adding a field moves an instance along a
+transition to a child shape, and transitions are remembered, so instances
+that get the same fields in the same order share one shape. Every class
+has its own root shape, so a shape also tells the class of its instances.
+'''
+
+
+class Shape:
+    __slots__ = ('klass', 'offsets', 'transitions')
+
+    def __init__(self, klass, offsets:dict):
+        self.klass = klass
+        self.offsets = offsets
+        self.transitions = {}
+
+    def add_field(self, name:str):
+        '''
+        Shape of an instance of this shape once field `name` is added.
+        '''
+        shape = self.transitions.get(name)
+        if shape == None:
+            offsets = dict(self.offsets)
+            offsets[name] = len(offsets)
+            shape = self.transitions[name] = Shape(self.klass, offsets)
+        return shape
@@ -1,54 +1,183 @@
 from . import __VERSION__
 
+import os
 import sys
+import py_compile
 
-from loxpy.scanner import Scanner
+from loxpy.scanner.bulk_scanner import BulkScanner
 from loxpy.parser import Parser
+from loxpy.parser.streaming_parser import StreamingParser
+from loxpy.optimizer import Optimizer
+from loxpy.resolver import Resolver
+from loxpy.purity import PurityAnalyzer
+from loxpy.cache import ProgramCache
 from loxpy.evaluator import Interpreter
+from loxpy.vm import VM
+from loxpy.closure_compiler import ClosureCompiler
+from loxpy.stack_interpreter import StackInterpreter
+from loxpy.transpiler import PythonEngine, Transpiler
+from loxpy.profiler import SamplingProfiler, ProfilingInterpreter
+from loxpy.stats import StatsInterpreter
 from loxpy.evaluator.runtime_error import LoxPyRuntimeError
 from loxpy.parser.ast_printer import AstPrinter
+from loxpy.output import OutputSink, BufferedOutput
+
+# Execution engines selectable with --engine
+ENGINES = {
+    "tree": Interpreter,
+    "vm": VM,
+    "closure": ClosureCompiler,
+    "python": PythonEngine,
+    "stack": StackInterpreter,
+}
 
 class Lox:
     hasError = False
     hasRuntimeError = False
 
-    def __init__(self):
-        self.interpreter = Interpreter(self)
+    def __init__(self, engine="tree", cache:ProgramCache=None, stream=False, optimize=True,
+        profiler:SamplingProfiler=None, stats=False, output:OutputSink=None
+    ):
+        # Where print statements write to, see loxpy/output
+        self.output = output if output != None else BufferedOutput()
+
+        if profiler != None:
+            # Profiling needs the shadow stack of the tree-walking interpreter
+            self.interpreter = ProfilingInterpreter(self, profiler)
+        elif stats:
+            # Counting interpreter, see loxpy/stats
+            self.interpreter = StatsInterpreter(self)
+        else:
+            self.interpreter = ENGINES[engine](self)
+        # Parsed programs of scripts run with run_file, None to disable
+        self.cache = cache
+        # Run scripts declaration by declaration while they are parsed
+        self.stream = stream
+        # Run the AST optimizer between parsing and resolving
+        self.optimize = optimize
     
-    @staticmethod
-    def error(line, message):
-        Lox.report(line, "", message)
+    def error(self, line, message):
+        self.report(line, "", message)
 
-    @staticmethod
-    def runtime_error(error:LoxPyRuntimeError):
-        Lox.report(error.token.line, "", str(error))
+    def runtime_error(self, error:LoxPyRuntimeError):
+        self.report(error.token.line, "", str(error))
 
-    @staticmethod
-    def report(line, where, message):
+    def report(self, line, where, message):
+        # Output printed before the error has to come out first
+        self.output.flush()
         sys.stderr.write(f"[line {line}] Error {where}: {message}\n")
-        sys.stderr.flush()
         Lox.hasError = True
 
-    def run(self, source):
-        scanner = Scanner(source, self)
+    def parse(self, source, whole_program=False):
+        '''
+        Scan, parse, optimize and resolve `source`. Returns None on static
+        errors. The purity of functions is only analyzed for a
+        `whole_program`, as later input could reassign their globals.
+        '''
+        scanner = BulkScanner(source, self)
         tokens = scanner.scan_tokens()
 
         parser = Parser(tokens, self)
         statements = parser.parse()
 
         if self.hasError:
-            return
-        
+            return None
+
+        if self.optimize:
+            statements = Optimizer().optimize(statements)
+
+        resolver = Resolver(self)
+        resolver.resolve(statements)
+
+        if self.hasError:
+            return None
+
+        if whole_program:
+            PurityAnalyzer().analyze(statements)
+
+        return statements
+
+    def run(self, source, script=None):
+        statements = None
+        if script != None and self.cache != None:
+            statements = self.cache.load(script, source, self.cache_variant())
+
+        if statements == None:
+            statements = self.parse(source, script != None)
+            if statements == None:
+                return
+            if script != None and self.cache != None:
+                self.cache.store(script, source, statements, self.cache_variant())
+
         self.interpreter.interpret(statements)
+        self.output.flush()
 
         # print(AstPrinter().print(expression))
+
+    def cache_variant(self):
+        # Optimized and plain ASTs of a script are cached separately
+        return "optimized" if self.optimize else "plain"
+
+    def run_stream(self, source):
+        '''
+        Scan, parse, resolve and run one top level declaration at a time,
+        so only the declaration being run is held in memory. Statements
+        before a syntax error have already run when it is found; later
+        declarations are still parsed to report their errors.
+        '''
+        tokens = BulkScanner(source, self).iter_tokens()
+        parser = StreamingParser(tokens, self)
+        resolver = Resolver(self)
+
+        for statement in parser.declarations():
+            if self.hasError:
+                continue
+
+            program = [statement]
+            if self.optimize:
+                program = Optimizer().optimize(program)
+
+            resolver.resolve(program)
+            if self.hasError:
+                continue
+
+            self.interpreter.interpret(program)
+
+        self.output.flush()
+
+    def compile_file(self, script, output=None):
+        '''
+        Transpile a script to a Python module next to it (or `output`)
+        and byte-compile it. The module runs without loxpy's front end:
+        `python script.py`.
+        '''
+        try:
+            fh = open(script, 'r')
+            script_data = fh.read()
+            fh.close()
+        except FileNotFoundError:
+            sys.exit(1)
+
+        statements = self.parse(script_data, True)
+        if statements == None:
+            sys.exit(65)
+
+        source, _, _ = Transpiler().transpile(statements, os.path.basename(script))
+        if output == None:
+            output = os.path.splitext(script)[0] + ".py"
+        with open(output, 'w') as fh:
+            fh.write(source)
+        py_compile.compile(output, doraise=True)
     
     def run_file(self, script):
         try:
             fh = open(script, 'r')
             script_data = fh.read()
             fh.close()
-            self.run(script_data)
+            if self.stream:
+                self.run_stream(script_data)
+            else:
+                self.run(script_data, script)
             if Lox.hasError:
                 sys.exit(65)
             if Lox.hasRuntimeError:
@@ -69,5 +198,23 @@ class Lox:
                 break   
 
 
+    def report_inline_caches(self):
+        self.output.flush()
+        caches = getattr(self.interpreter, "inline_caches", None)
+        if caches != None:
+            sys.stderr.write(caches.report() + "\n")
+
+    def report_stats(self):
+        self.output.flush()
+        stats = getattr(self.interpreter, "stats", None)
+        if stats != None:
+            sys.stderr.write(stats.report() + "\n")
+
+    def report_memoization(self):
+        self.output.flush()
+        memoizer = getattr(self.interpreter, "memoizer", None)
+        if memoizer != None:
+            sys.stderr.write(memoizer.report() + "\n")
+
     def error_code(self):
         pass
\ No newline at end of file
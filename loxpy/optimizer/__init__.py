@@ -0,0 +1,246 @@
+'''
+AST optimizer, run between the Parser and the Resolver.
+
+Rewrites the tree so that work the program would repeat on every
+execution happens once, here:
+
+    * arithmetic, comparisons, equality and string concatenation on
+      literals are folded into a single Literal
+    * `!`, `and` and `or` on literals are folded the same way
+    * `if` on a literal condition keeps only the branch that runs, and
+      `while (false)` loops are dropped
+    * blocks that declare nothing are spliced into the enclosing block,
+      and single-statement blocks are replaced by their statement
+    * groupings are dropped, parentheses only matter to the parser
+
+Only expressions that cannot fail are folded, so runtime errors (and the
+lines they are reported on) are unchanged.
+'''
+from loxpy.parser import expressions
+from loxpy.parser import statements
+from loxpy.token.token_types import TokenType
+
+NUMBER_OPERATIONS = {
+    TokenType.MINUS: lambda left, right: left - right,
+    TokenType.MULTIPLY: lambda left, right: left * right,
+    TokenType.DIVIDE: lambda left, right: left / right,
+    TokenType.GREATER: lambda left, right: left > right,
+    TokenType.GREATER_EQUAL: lambda left, right: left >= right,
+    TokenType.LESSER: lambda left, right: left < right,
+    TokenType.LESSER_EQUAL: lambda left, right: left <= right,
+}
+
+DECLARATIONS = (statements.Var, statements.Function, statements.Class)
+
+
+def constant(expr:expressions.Expr):
+    return type(expr) == expressions.Literal
+
+
+def breaks_out(stmt:statements.Stmt):
+    '''
+    Whether `stmt` contains a break that is not inside a loop. Such a
+    break ends the enclosing top level statement, so the block holding
+    it must stay a single statement.
+    '''
+    if type(stmt) == statements.Break:
+        return True
+    if type(stmt) == statements.Block:
+        return any(breaks_out(statement) for statement in stmt.statements)
+    if type(stmt) == statements.If:
+        return breaks_out(stmt.thenBranch) or (stmt.elseBranch != None and breaks_out(stmt.elseBranch))
+    return False
+
+
+class Optimizer(
+    expressions.ExprVisitor,
+    statements.StmtVisitor
+):
+    def optimize(self, program:list):
+        '''
+        Returns the optimized list of top level statements.
+        '''
+        return self.optimize_all(program)
+
+    def optimize_all(self, body:list):
+        optimized = []
+        for stmt in body:
+            stmt = self.statement(stmt)
+            if stmt == None:
+                continue
+            if (type(stmt) == statements.Block
+                and not any(isinstance(inner, DECLARATIONS) for inner in stmt.statements)
+                and not breaks_out(stmt)):
+                # Nothing is scoped to the block, so it can share ours
+                optimized.extend(stmt.statements)
+            else:
+                optimized.append(stmt)
+        return optimized
+
+    def statement(self, stmt:statements.Stmt):
+        '''
+        Optimized statement, or None when it does nothing.
+        '''
+        return stmt.accept(self)
+
+    def branch(self, stmt:statements.Stmt):
+        '''
+        Optimized statement in a position that needs one statement.
+        '''
+        stmt = self.statement(stmt)
+        if stmt == None:
+            return statements.Block([])
+        return stmt
+
+    def expr(self, expr:expressions.Expr):
+        return expr.accept(self)
+
+    # Statements
+
+    def visit_block_stmt(self, stmt: statements.Block):
+        stmt.statements = self.optimize_all(stmt.statements)
+        if len(stmt.statements) == 0:
+            return None
+        if len(stmt.statements) == 1 and not isinstance(stmt.statements[0], DECLARATIONS):
+            return stmt.statements[0]
+        return stmt
+
+    def visit_class_stmt(self, stmt: statements.Class):
+        for method in stmt.methods:
+            method.accept(self)
+        return stmt
+
+    def visit_break_stmt(self, stmt: statements.Break):
+        return stmt
+
+    def visit_expression_stmt(self, stmt: statements.Expression):
+        stmt.expression = self.expr(stmt.expression)
+        return stmt
+
+    def visit_function_stmt(self, stmt: statements.Function):
+        stmt.body = self.optimize_all(stmt.body)
+        return stmt
+
+    def visit_if_stmt(self, stmt: statements.If):
+        stmt.condition = self.expr(stmt.condition)
+
+        if constant(stmt.condition):
+            if bool(stmt.condition.value):
+                return self.statement(stmt.thenBranch)
+            if stmt.elseBranch != None:
+                return self.statement(stmt.elseBranch)
+            return None
+
+        stmt.thenBranch = self.branch(stmt.thenBranch)
+        if stmt.elseBranch != None:
+            stmt.elseBranch = self.statement(stmt.elseBranch)
+        return stmt
+
+    def visit_print_stmt(self, stmt: statements.Print):
+        stmt.expression = self.expr(stmt.expression)
+        return stmt
+
+    def visit_return_stmt(self, stmt: statements.Return):
+        if stmt.value != None:
+            stmt.value = self.expr(stmt.value)
+        return stmt
+
+    def visit_var_stmt(self, stmt: statements.Var):
+        if stmt.initializer != None:
+            stmt.initializer = self.expr(stmt.initializer)
+        return stmt
+
+    def visit_while_stmt(self, stmt: statements.While):
+        stmt.condition = self.expr(stmt.condition)
+        if constant(stmt.condition) and not bool(stmt.condition.value):
+            return None
+        stmt.body = self.branch(stmt.body)
+        return stmt
+
+    # Expressions
+
+    def visit_assign_expr(self, expr: expressions.Assign):
+        expr.value = self.expr(expr.value)
+        return expr
+
+    def visit_binary_expr(self, expr: expressions.Binary):
+        expr.left = self.expr(expr.left)
+        expr.right = self.expr(expr.right)
+
+        if not (constant(expr.left) and constant(expr.right)):
+            return expr
+
+        left, right = expr.left.value, expr.right.value
+        operator_type = expr.operator.type
+
+        if operator_type == TokenType.EQUAL_EQUAL:
+            return expressions.Literal(left == right)
+        if operator_type == TokenType.NOT_EQUAL:
+            return expressions.Literal(left != right)
+
+        if operator_type == TokenType.PLUS:
+            if type(left) == type(right) and type(left) in (float, str):
+                return expressions.Literal(left + right)
+            return expr
+
+        # Everything else needs two numbers, and division a non-zero divisor
+        if type(left) != float or type(right) != float:
+            return expr
+        if operator_type == TokenType.DIVIDE and right == 0:
+            return expr
+        return expressions.Literal(NUMBER_OPERATIONS[operator_type](left, right))
+
+    def visit_call_expr(self, expr: expressions.Call):
+        expr.callee = self.expr(expr.callee)
+        expr.arguments = [self.expr(argument) for argument in expr.arguments]
+        return expr
+
+    def visit_dot_expr(self, expr: expressions.Dot):
+        expr.object = self.expr(expr.object)
+        return expr
+
+    def visit_dotset_expr(self, expr: expressions.DotSet):
+        expr.object = self.expr(expr.object)
+        expr.value = self.expr(expr.value)
+        return expr
+
+    def visit_grouping_expr(self, expr: expressions.Grouping):
+        # Parentheses only matter to the parser
+        return self.expr(expr.expression)
+
+    def visit_literal_expr(self, expr: expressions.Literal):
+        return expr
+
+    def visit_logical_expr(self, expr: expressions.Logical):
+        expr.left = self.expr(expr.left)
+        expr.right = self.expr(expr.right)
+
+        if not constant(expr.left):
+            return expr
+
+        # `or` yields a truthy left operand, `and` a falsey one
+        if bool(expr.left.value) == (expr.operator.type == TokenType.OR):
+            return expr.left
+        return expr.right
+
+    def visit_super_expr(self, expr: expressions.Super):
+        return expr
+
+    def visit_this_expr(self, expr: expressions.This):
+        return expr
+
+    def visit_unary_expr(self, expr: expressions.Unary):
+        expr.right = self.expr(expr.right)
+
+        if not constant(expr.right):
+            return expr
+
+        value = expr.right.value
+        if expr.operator.type == TokenType.NOT:
+            return expressions.Literal(not bool(value))
+        if type(value) == float:
+            return expressions.Literal(-value)
+        return expr
+
+    def visit_variable_expr(self, expr: expressions.Variable):
+        return expr
@@ -0,0 +1,83 @@
+'''
+Output sinks for the Lox print statement.
+
+Every engine writes the text of its print statements to the sink of its
+Lox instance, `lox.output`, instead of calling Python's print:
+
+    * BufferedOutput, the default, joins the text in memory and writes it
+      to stdout in blocks, so a script printing millions of lines makes
+      one write per block rather than per line
+    * UnbufferedOutput writes and flushes every print, for interactive
+      use (`--unbuffered`)
+    * MemoryOutput keeps everything printed, for embedding loxpy and
+      capturing the output of a program
+
+Lox flushes the sink at the end of every run and before it writes an
+error to stderr, so stdout and stderr stay in order.
+'''
+import sys
+from abc import ABC, abstractmethod
+
+
+class OutputSink(ABC):
+    @abstractmethod
+    def write(self, text:str):
+        pass
+
+    def flush(self):
+        pass
+
+
+class BufferedOutput(OutputSink):
+    # Characters held before they are written out
+    BUFFER_SIZE = 1 << 16
+
+    def __init__(self, stream=None, size:int=BUFFER_SIZE):
+        # None writes to whatever sys.stdout is when flushing, so that
+        # redirecting it keeps working
+        self.stream = stream
+        self.size = size
+        self.parts = []
+        self.length = 0
+
+    def write(self, text:str):
+        self.parts.append(text)
+        self.length += len(text)
+        if self.length >= self.size:
+            self.flush()
+
+    def flush(self):
+        stream = self.stream if self.stream != None else sys.stdout
+        if len(self.parts) != 0:
+            text = "".join(self.parts)
+            self.parts = []
+            self.length = 0
+            stream.write(text)
+        stream.flush()
+
+
+class UnbufferedOutput(OutputSink):
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, text:str):
+        stream = self.stream if self.stream != None else sys.stdout
+        stream.write(text)
+        stream.flush()
+
+
+class MemoryOutput(OutputSink):
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text:str):
+        self.parts.append(text)
+
+    def getvalue(self):
+        '''
+        Everything printed so far.
+        '''
+        return "".join(self.parts)
+
+    def clear(self):
+        self.parts = []
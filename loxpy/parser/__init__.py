@@ -25,6 +25,16 @@ class Parser:
         except ParserError as parse_error:
             return None
 
+    def declarations(self):
+        '''
+        Yields top level declarations one at a time as they are parsed.
+        Declarations with syntax errors are reported and skipped.
+        '''
+        while not self.is_at_end():
+            declaration = self.declaration()
+            if declaration != None:
+                yield declaration
+
     def error(self, token, message):
         self.lox.error(token.line, message)
         return ParserError()
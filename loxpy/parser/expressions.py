@@ -52,23 +52,51 @@ class ExprVisitor(ABC):
      def visit_variable_expr(self, expr: 'Expr'):
           pass
 
+     def expr_dispatch_table(self):
+          '''
+          Bound visit methods keyed by node class, `table[type(node)](node)`
+          visits a node without going through accept.
+          '''
+          return {
+               Assign: self.visit_assign_expr,
+               Binary: self.visit_binary_expr,
+               Call: self.visit_call_expr,
+               Dot: self.visit_dot_expr,
+               DotSet: self.visit_dotset_expr,
+               Grouping: self.visit_grouping_expr,
+               Literal: self.visit_literal_expr,
+               Logical: self.visit_logical_expr,
+               Super: self.visit_super_expr,
+               This: self.visit_this_expr,
+               Unary: self.visit_unary_expr,
+               Variable: self.visit_variable_expr,
+          }
+
 
 class Expr(ABC):
+     __slots__ = ()
+
      @abstractmethod
      def accept(self, visitor: ExprVisitor):
           pass
 
 
 class Assign(Expr):
+     __slots__ = ('name', 'value', 'depth', 'slot',)
+
      def __init__(self, name: Token,value: Expr):
           self.name = name
           self.value = value
+          self.depth = None
+          self.slot = None
 
      def accept(self, visitor: ExprVisitor):
           return visitor.visit_assign_expr(self)
 
 
 class Binary(Expr):
+     __slots__ = ('left', 'operator', 'right',)
+
      def __init__(self, left: Expr,operator: Token,right: Expr):
           self.left = left
           self.operator = operator
@@ -79,6 +107,8 @@ class Binary(Expr):
 
 
 class Call(Expr):
+     __slots__ = ('callee', 'paren', 'arguments',)
+
      def __init__(self, callee: Expr,paren: Token,arguments: list):
           self.callee = callee
           self.paren = paren
@@ -89,25 +119,33 @@ class Call(Expr):
 
 
 class Dot(Expr):
+     __slots__ = ('object', 'name', 'cache',)
+
      def __init__(self, object: Expr,name: Token):
           self.object = object
           self.name = name
+          self.cache = None
 
      def accept(self, visitor: ExprVisitor):
           return visitor.visit_dot_expr(self)
 
 
 class DotSet(Expr):
+     __slots__ = ('object', 'name', 'value', 'cache',)
+
      def __init__(self, object: Expr,name: Token,value: Expr):
           self.object = object
           self.name = name
           self.value = value
+          self.cache = None
 
      def accept(self, visitor: ExprVisitor):
           return visitor.visit_dotset_expr(self)
 
 
 class Grouping(Expr):
+     __slots__ = ('expression',)
+
      def __init__(self, expression: Expr):
           self.expression = expression
 
@@ -116,6 +154,8 @@ class Grouping(Expr):
 
 
 class Literal(Expr):
+     __slots__ = ('value',)
+
      def __init__(self, value: object):
           self.value = value
 
@@ -124,6 +164,8 @@ class Literal(Expr):
 
 
 class Logical(Expr):
+     __slots__ = ('left', 'operator', 'right',)
+
      def __init__(self, left: Expr,operator: Token,right: Expr):
           self.left = left
           self.operator = operator
@@ -134,23 +176,33 @@ class Logical(Expr):
 
 
 class Super(Expr):
+     __slots__ = ('keyword', 'method', 'depth', 'slot',)
+
      def __init__(self, keyword: Token,method: Token):
           self.keyword = keyword
           self.method = method
+          self.depth = None
+          self.slot = None
 
      def accept(self, visitor: ExprVisitor):
           return visitor.visit_super_expr(self)
 
 
 class This(Expr):
+     __slots__ = ('keyword', 'depth', 'slot',)
+
      def __init__(self, keyword: Token):
           self.keyword = keyword
+          self.depth = None
+          self.slot = None
 
      def accept(self, visitor: ExprVisitor):
           return visitor.visit_this_expr(self)
 
 
 class Unary(Expr):
+     __slots__ = ('operator', 'right',)
+
      def __init__(self, operator: Token,right: Expr):
           self.operator = operator
           self.right = right
@@ -160,8 +212,12 @@ class Unary(Expr):
 
 
 class Variable(Expr):
+     __slots__ = ('name', 'depth', 'slot',)
+
      def __init__(self, name: Token):
           self.name = name
+          self.depth = None
+          self.slot = None
 
      def accept(self, visitor: ExprVisitor):
           return visitor.visit_variable_expr(self)
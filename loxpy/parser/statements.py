@@ -44,32 +44,60 @@ class StmtVisitor(ABC):
      def visit_while_stmt(self, expr: 'Stmt'):
           pass
 
+     def stmt_dispatch_table(self):
+          '''
+          Bound visit methods keyed by node class, `table[type(node)](node)`
+          visits a node without going through accept.
+          '''
+          return {
+               Block: self.visit_block_stmt,
+               Class: self.visit_class_stmt,
+               Break: self.visit_break_stmt,
+               Expression: self.visit_expression_stmt,
+               Function: self.visit_function_stmt,
+               If: self.visit_if_stmt,
+               Print: self.visit_print_stmt,
+               Return: self.visit_return_stmt,
+               Var: self.visit_var_stmt,
+               While: self.visit_while_stmt,
+          }
+
 
 class Stmt(ABC):
+     __slots__ = ()
+
      @abstractmethod
      def accept(self, visitor: StmtVisitor):
           pass
 
 
 class Block(Stmt):
+     __slots__ = ('statements', 'size',)
+
      def __init__(self, statements: list):
           self.statements = statements
+          self.size = None
 
      def accept(self, visitor: StmtVisitor):
           return visitor.visit_block_stmt(self)
 
 
 class Class(Stmt):
+     __slots__ = ('name', 'superclass', 'methods', 'slot',)
+
      def __init__(self, name: Token,superclass: Variable,methods: list):
           self.name = name
           self.superclass = superclass
           self.methods = methods
+          self.slot = None
 
      def accept(self, visitor: StmtVisitor):
           return visitor.visit_class_stmt(self)
 
 
 class Break(Stmt):
+     __slots__ = ('token',)
+
      def __init__(self, token: Token):
           self.token = token
 
@@ -78,6 +106,8 @@ class Break(Stmt):
 
 
 class Expression(Stmt):
+     __slots__ = ('expression',)
+
      def __init__(self, expression: Expr):
           self.expression = expression
 
@@ -86,16 +116,23 @@ class Expression(Stmt):
 
 
 class Function(Stmt):
+     __slots__ = ('name', 'params', 'body', 'slot', 'size', 'pure',)
+
      def __init__(self, name: Token,params: list,body: list):
           self.name = name
           self.params = params
           self.body = body
+          self.slot = None
+          self.size = None
+          self.pure = None
 
      def accept(self, visitor: StmtVisitor):
           return visitor.visit_function_stmt(self)
 
 
 class If(Stmt):
+     __slots__ = ('condition', 'thenBranch', 'elseBranch',)
+
      def __init__(self, condition: Expr,thenBranch: Stmt,elseBranch: Stmt):
           self.condition = condition
           self.thenBranch = thenBranch
@@ -106,6 +143,8 @@ class If(Stmt):
 
 
 class Print(Stmt):
+     __slots__ = ('expression',)
+
      def __init__(self, expression: Expr):
           self.expression = expression
 
@@ -114,6 +153,8 @@ class Print(Stmt):
 
 
 class Return(Stmt):
+     __slots__ = ('keyword', 'value',)
+
      def __init__(self, keyword: Token,value: Expr):
           self.keyword = keyword
           self.value = value
@@ -123,15 +164,20 @@ class Return(Stmt):
 
 
 class Var(Stmt):
+     __slots__ = ('name', 'initializer', 'slot',)
+
      def __init__(self, name: Token,initializer: Expr):
           self.name = name
           self.initializer = initializer
+          self.slot = None
 
      def accept(self, visitor: StmtVisitor):
           return visitor.visit_var_stmt(self)
 
 
 class While(Stmt):
+     __slots__ = ('condition', 'body',)
+
      def __init__(self, condition: Expr,body: Stmt):
           self.condition = condition
           self.body = body
@@ -0,0 +1,26 @@
+from loxpy.parser import Parser
+
+
+class StreamingParser(Parser):
+    '''
+    Parser reading from a token iterator instead of a list. The grammar
+    needs a single token of lookahead, so only the current and previous
+    tokens are kept alive.
+    '''
+    def __init__(self, tokens, lox_interpreter):
+        super().__init__(None, lox_interpreter)
+        self.stream = iter(tokens)
+        self.previous_token = None
+        self.current_token = next(self.stream)
+
+    def advance(self):
+        if not self.is_at_end():
+            self.previous_token = self.current_token
+            self.current_token = next(self.stream)
+        return self.previous_token
+
+    def peek(self):
+        return self.current_token
+
+    def previous(self):
+        return self.previous_token
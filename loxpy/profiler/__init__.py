@@ -0,0 +1,266 @@
+'''
+Sampling profiler for Lox programs.
+
+ProfilingInterpreter keeps a shadow stack of the Lox calls in progress,
+one (callee, instance, call expression, call frame) entry per call,
+pushed and popped by the call hooks of the Interpreter. Entries are only named when
+they are sampled. A timer thread wakes up every `interval` seconds and
+records the shadow stack together with the line the program is on,
+which it finds in the innermost Python frames of the interpreter: the
+line of the node they are visiting. Samples taken while a function is
+being entered or left go to the caller, at the line of the call, and
+those taken in native functions to the native function, at no line.
+Nothing is recorded between samples, so the cost of profiling is the
+push and pop of each call.
+
+Each sample stands for the time elapsed since the previous one. Samples
+are aggregated by stack as they are taken, which gives:
+
+    * self and total time per function, and per line of each function
+    * collapsed stacks (`main;f;g 12`) for flame graph tools
+'''
+import sys
+import time
+import threading
+
+from loxpy.parser import expressions
+from loxpy.parser import statements
+
+from loxpy.evaluator import Interpreter
+from loxpy.evaluator.lox_class import LoxClass
+from loxpy.evaluator.lox_callable import LoxCallable
+from loxpy.evaluator.lox_function import LoxFunction
+from loxpy.evaluator.lox_instance import LoxInstance
+from loxpy.evaluator.native_functions import NativeMethod
+from loxpy.evaluator.completion import TAIL_CALL
+
+# Name of the shadow stack entry of top level code
+MAIN = "<main>"
+
+# Locals of the interpreter's visit methods that hold the node they visit
+NODE_LOCALS = ("expr", "stmt", "statement")
+
+
+def line_of(node:object):
+    '''
+    Line of `node`, None for nodes without a token of their own.
+    '''
+    for field in ("name", "operator", "paren", "keyword", "token"):
+        token = getattr(node, field, None)
+        if token != None and hasattr(token, "line"):
+            return token.line
+
+    if type(node) in (statements.Expression, statements.Print):
+        return line_of(node.expression)
+    if type(node) in (statements.If, statements.While):
+        return line_of(node.condition)
+    return None
+
+
+def frame_name(callee:object, instance:LoxInstance):
+    '''
+    Name of the shadow stack entry of a call of `callee`.
+    '''
+    if type(callee) is str:
+        return callee
+    if type(callee) is NativeMethod:
+        return f"{instance.name}.{callee.function.__name__}"
+    if instance != None:
+        return f"{instance.kclass.name}.{callee.declaration.name.lexeme}"
+    if type(callee) is LoxClass:
+        return callee.name
+    if isinstance(callee, LoxFunction):
+        return callee.declaration.name.lexeme
+    return type(callee).__name__.lower()
+
+
+class Profile:
+    '''
+    Aggregated samples.
+    '''
+    def __init__(self):
+        # (stack names, innermost line) -> [samples, seconds]
+        self.stacks = {}
+        self.samples = 0
+        self.seconds = 0.0
+
+    def add(self, stack:tuple, line:int, seconds:float):
+        key = (stack, line)
+        entry = self.stacks.get(key)
+        if entry == None:
+            entry = self.stacks[key] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+        self.samples += 1
+        self.seconds += seconds
+
+    def times(self):
+        '''
+        Self and total seconds keyed by function name and by (function
+        name, line). A function or line that is on the stack several times
+        counts once towards its total.
+        '''
+        functions = {}
+        lines = {}
+        for (stack, line), (_, seconds) in self.stacks.items():
+            frames = [name for name, _ in stack]
+            # A frame is on the line its callee was called from
+            frame_lines = [(stack[i][0], stack[i + 1][1]) for i in range(len(stack) - 1)]
+            frame_lines.append((stack[-1][0], line))
+
+            for name in set(frames):
+                functions.setdefault(name, [0.0, 0.0])[1] += seconds
+            functions[frames[-1]][0] += seconds
+
+            for key in set(frame_lines):
+                lines.setdefault(key, [0.0, 0.0])[1] += seconds
+            lines[frame_lines[-1]][0] += seconds
+        return functions, lines
+
+    def collapsed(self):
+        '''
+        Stacks in the collapsed format of flame graph tools, one
+        `outer;inner count` line per stack.
+        '''
+        counts = {}
+        for (stack, _), (samples, _) in self.stacks.items():
+            key = ";".join(name for name, _ in stack)
+            counts[key] = counts.get(key, 0) + samples
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+    def report(self, limit:int=20):
+        total = self.seconds
+        lines = [f"profile: {self.samples} samples, {1000 * total:.1f} ms"]
+        if self.samples == 0:
+            return "\n".join(lines)
+
+        def row(label, times):
+            self_time, total_time = times
+            return (f"  {label:<32} {1000 * self_time:>10.1f} ms {100 * self_time / total:>5.1f}%"
+                f" {1000 * total_time:>10.1f} ms {100 * total_time / total:>5.1f}%")
+
+        functions, by_line = self.times()
+        lines.append(f"  {'function':<32} {'self':>16} {'total':>17}")
+        for name, times in sorted(functions.items(), key=lambda item: -item[1][0])[:limit]:
+            lines.append(row(name, times))
+
+        lines.append(f"  {'line':<32} {'self':>16} {'total':>17}")
+        for (name, line), times in sorted(by_line.items(), key=lambda item: -item[1][0])[:limit]:
+            lines.append(row(f"{name}:{'?' if line == None else line}", times))
+        return "\n".join(lines)
+
+
+class SamplingProfiler:
+    # Default seconds between samples
+    INTERVAL = 0.001
+
+    def __init__(self, interval:float=INTERVAL):
+        self.interval = interval
+        # Shadow stack of (callee, instance, call expression, Python frame
+        # of Interpreter.call) entries
+        self.stack = [(MAIN, None, None, None)]
+        self.profile = Profile()
+        self.thread = None
+        self.stopped = threading.Event()
+        self.target = None
+
+    def start(self):
+        '''
+        Starts sampling the calling thread.
+        '''
+        self.target = threading.get_ident()
+        self.stopped.clear()
+        # The sampler needs the GIL to take a sample, ask the interpreter
+        # to hand it over as often as samples are due
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.switch_interval, self.interval))
+        self.thread = threading.Thread(target=self.run, name="loxpy-profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread == None:
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.thread = None
+        sys.setswitchinterval(self.switch_interval)
+
+    def run(self):
+        last = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            now = time.perf_counter()
+            self.sample(now - last)
+            last = now
+
+    def sample(self, seconds:float):
+        frame = sys._current_frames().get(self.target)
+        if frame == None:
+            return
+        # Copied in one go, the sampled thread may run again while the
+        # entries are named
+        entries = list(self.stack)
+        line, call_frame = self.current_line(frame)
+        if call_frame != None and call_frame is entries[-1][3]:
+            # The callee's entry is pushed but its body isn't running
+            if isinstance(entries[-1][0], (LoxFunction, LoxClass)):
+                entries.pop()
+            else:
+                line = None
+        stack = tuple(
+            (frame_name(callee, instance), None if call == None else call.paren.line)
+            for callee, instance, call, _ in entries
+        )
+        self.profile.add(stack, line, seconds)
+
+    @staticmethod
+    def current_line(frame):
+        '''
+        Line of the innermost node the interpreter is visiting in `frame`
+        or the frames it was called from, up to the innermost Lox call.
+        When that is the Interpreter.call frame of the call, its line and
+        that frame, otherwise None for the frame.
+        '''
+        call_code = Interpreter.call.__code__
+        while frame != None:
+            if frame.f_code is call_code:
+                return frame.f_locals["expr"].paren.line, frame
+            if frame.f_code.co_name.startswith("visit_") or frame.f_code.co_name == "execute_block":
+                local_values = frame.f_locals
+                for name in NODE_LOCALS:
+                    node = local_values.get(name)
+                    if isinstance(node, (expressions.Expr, statements.Stmt)):
+                        line = line_of(node)
+                        if line != None:
+                            return line, None
+            frame = frame.f_back
+        return None, None
+
+
+class ProfilingInterpreter(Interpreter):
+    '''
+    Tree-walking Interpreter that keeps the shadow stack of `profiler`.
+    '''
+    def __init__(self, lox_main, profiler:SamplingProfiler):
+        super().__init__(lox_main)
+        self.profiler = profiler
+
+    tracing = True
+
+    def enter_call(self, expr: expressions.Call, callee:LoxCallable, instance:LoxInstance):
+        # Pushed once the arguments have been evaluated in the caller
+        self.profiler.stack.append((callee, instance, expr, sys._getframe(1)))
+
+    def exit_call(self):
+        self.profiler.stack.pop()
+
+    def tail_call(self, expr: expressions.Call):
+        status = super().tail_call(expr)
+        if status is TAIL_CALL:
+            # The callee runs in place of the returning function
+            function, env = self.return_value
+            instance = None
+            if env.enclosing is not function.closure:
+                instance = env.enclosing.values[0]
+            stack = self.profiler.stack
+            stack[-1] = (function, instance) + stack[-1][2:]
+        return status
@@ -0,0 +1,272 @@
+'''
+Purity analysis for loxpy, run after the Resolver on whole programs.
+
+Marks every function declaration (not methods) with `pure`: True when a
+call of the function only depends on its arguments and has no effect
+other than its result, so the engines may memoize it (see
+loxpy/evaluator/memoization.py). A pure function:
+
+    * only reads and assigns its own parameters and locals
+    * only calls functions that are pure themselves, by the name they
+      were declared with, as long as nothing ever assigns or redeclares
+      that name
+    * does not print, access properties or use `this` and `super`
+    * declares no functions or classes, whose closures would be shared
+      between memoized calls
+    * has no break outside of a loop, which would end the caller's loop
+
+Calls between functions are only known once the whole program has been
+walked, so every function starts out pure unless its own body rules it
+out and functions calling something that is not pure are then dropped
+until none is left. Mutually recursive functions stay pure.
+
+Globals of a program run in pieces (the prompt, streaming) may be
+reassigned by a later piece, so those programs are not analyzed and their
+functions are left with `pure = None`.
+'''
+from loxpy.parser import expressions
+from loxpy.parser import statements
+from loxpy.optimizer import breaks_out
+
+
+class Binding:
+    '''
+    A local variable declaration.
+    '''
+    __slots__ = ('owner', 'declaration', 'assigned')
+
+    def __init__(self, owner:statements.Function, declaration:statements.Stmt):
+        # Function whose frame holds the variable, None outside functions
+        self.owner = owner
+        # Function node for function declarations
+        self.declaration = declaration
+        self.assigned = False
+
+
+class Summary:
+    '''
+    What the body of one function does, as far as purity goes.
+    '''
+    __slots__ = ('impure', 'callees')
+
+    def __init__(self):
+        # Whether the body alone rules out purity
+        self.impure = False
+        # Called functions: a Binding, or a name for globals
+        self.callees = []
+
+
+class PurityAnalyzer(
+    expressions.ExprVisitor,
+    statements.StmtVisitor
+):
+    def __init__(self):
+        # Each scope maps a variable name to its Binding
+        self.scopes = []
+        # Global name -> declarations of it (Function nodes or None)
+        self.globals = {}
+        self.assigned_globals = set()
+        # Function node -> Summary, for functions that are not methods
+        self.summaries = {}
+        # Innermost function being walked and its summary
+        self.function = None
+        self.summary = None
+
+    def analyze(self, program:list):
+        self.walk(program)
+
+        pure = {function for function, summary in self.summaries.items() if not summary.impure}
+        changed = True
+        while changed:
+            changed = False
+            for function in list(pure):
+                for callee in self.summaries[function].callees:
+                    if self.callee_function(callee) not in pure:
+                        pure.discard(function)
+                        changed = True
+                        break
+
+        for function in self.summaries:
+            function.pure = function in pure
+
+    def callee_function(self, callee:object):
+        '''
+        Function declaration a call of `callee` always reaches, or None.
+        '''
+        if type(callee) is Binding:
+            if callee.assigned:
+                return None
+            return callee.declaration
+
+        declarations = self.globals.get(callee, ())
+        if len(declarations) != 1 or callee in self.assigned_globals:
+            return None
+        return declarations[0]
+
+    def walk(self, body:list):
+        for statement in body:
+            statement.accept(self)
+
+    def walk_expr(self, expr:expressions.Expr):
+        expr.accept(self)
+
+    def impure(self):
+        if self.summary != None:
+            self.summary.impure = True
+
+    def declare(self, name:str, declaration:statements.Function=None):
+        if len(self.scopes) == 0:
+            self.globals.setdefault(name, []).append(declaration)
+            return
+        self.scopes[-1][name] = Binding(self.function, declaration)
+
+    def lookup(self, name:str):
+        '''
+        Binding of local `name`, or None for globals.
+        '''
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def function_body(self, function:statements.Function, summary:Summary):
+        enclosing_function = self.function
+        enclosing_summary = self.summary
+        self.function = function
+        self.summary = summary
+
+        self.scopes.append({})
+        for param in function.params:
+            self.declare(param.lexeme)
+        self.walk(function.body)
+        self.scopes.pop()
+
+        if summary != None and any(breaks_out(statement) for statement in function.body):
+            summary.impure = True
+
+        self.function = enclosing_function
+        self.summary = enclosing_summary
+
+    # Statements
+
+    def visit_block_stmt(self, stmt: statements.Block):
+        self.scopes.append({})
+        self.walk(stmt.statements)
+        self.scopes.pop()
+
+    def visit_class_stmt(self, stmt: statements.Class):
+        self.impure()
+        self.declare(stmt.name.lexeme)
+        if stmt.superclass != None:
+            self.walk_expr(stmt.superclass)
+
+        self.scopes.append({"this": Binding(None, None), "super": Binding(None, None)})
+        for method in stmt.methods:
+            # Methods are not memoized, but still walked for what they assign
+            method.pure = False
+            self.function_body(method, None)
+        self.scopes.pop()
+
+    def visit_break_stmt(self, stmt: statements.Break):
+        pass
+
+    def visit_expression_stmt(self, stmt: statements.Expression):
+        self.walk_expr(stmt.expression)
+
+    def visit_function_stmt(self, stmt: statements.Function):
+        self.impure()
+        self.declare(stmt.name.lexeme, stmt)
+        summary = self.summaries[stmt] = Summary()
+        self.function_body(stmt, summary)
+
+    def visit_if_stmt(self, stmt: statements.If):
+        self.walk_expr(stmt.condition)
+        stmt.thenBranch.accept(self)
+        if stmt.elseBranch != None:
+            stmt.elseBranch.accept(self)
+
+    def visit_print_stmt(self, stmt: statements.Print):
+        self.impure()
+        self.walk_expr(stmt.expression)
+
+    def visit_return_stmt(self, stmt: statements.Return):
+        if stmt.value != None:
+            self.walk_expr(stmt.value)
+
+    def visit_var_stmt(self, stmt: statements.Var):
+        if stmt.initializer != None:
+            self.walk_expr(stmt.initializer)
+        self.declare(stmt.name.lexeme)
+
+    def visit_while_stmt(self, stmt: statements.While):
+        self.walk_expr(stmt.condition)
+        stmt.body.accept(self)
+
+    # Expressions
+
+    def visit_assign_expr(self, expr: expressions.Assign):
+        self.walk_expr(expr.value)
+
+        binding = self.lookup(expr.name.lexeme)
+        if binding == None:
+            self.assigned_globals.add(expr.name.lexeme)
+            self.impure()
+            return
+
+        binding.assigned = True
+        if binding.owner is not self.function:
+            self.impure()
+
+    def visit_binary_expr(self, expr: expressions.Binary):
+        self.walk_expr(expr.left)
+        self.walk_expr(expr.right)
+
+    def visit_call_expr(self, expr: expressions.Call):
+        for argument in expr.arguments:
+            self.walk_expr(argument)
+
+        if type(expr.callee) is not expressions.Variable:
+            self.impure()
+            self.walk_expr(expr.callee)
+            return
+
+        name = expr.callee.name.lexeme
+        binding = self.lookup(name)
+        if binding != None and binding.owner is self.function:
+            # Parameters and locals may hold any callable
+            self.impure()
+        elif self.summary != None:
+            self.summary.callees.append(binding if binding != None else name)
+
+    def visit_dot_expr(self, expr: expressions.Dot):
+        self.impure()
+        self.walk_expr(expr.object)
+
+    def visit_dotset_expr(self, expr: expressions.DotSet):
+        self.impure()
+        self.walk_expr(expr.object)
+        self.walk_expr(expr.value)
+
+    def visit_grouping_expr(self, expr: expressions.Grouping):
+        self.walk_expr(expr.expression)
+
+    def visit_literal_expr(self, expr: expressions.Literal):
+        pass
+
+    def visit_logical_expr(self, expr: expressions.Logical):
+        self.walk_expr(expr.left)
+        self.walk_expr(expr.right)
+
+    def visit_super_expr(self, expr: expressions.Super):
+        self.impure()
+
+    def visit_this_expr(self, expr: expressions.This):
+        self.impure()
+
+    def visit_unary_expr(self, expr: expressions.Unary):
+        self.walk_expr(expr.right)
+
+    def visit_variable_expr(self, expr: expressions.Variable):
+        binding = self.lookup(expr.name.lexeme)
+        if binding == None or binding.owner is not self.function:
+            self.impure()
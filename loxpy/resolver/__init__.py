@@ -0,0 +1,240 @@
+'''
+Static resolver pass for loxpy
+
+Walks the parsed program once before execution and records, on every
+Variable, Assign, This and Super node, how many scopes away its binding
+lives (`depth`) and its index inside that scope's frame (`slot`). Global
+references are left unresolved (`depth = None`) and are looked up
+dynamically in the global environment.
+
+Declarations (Var, Function, Class) get the `slot` they are stored in and
+every Block/Function gets the `size` of the frame it needs. A block that
+declares nothing gets size 0 and does not open a scope at all.
+'''
+from enum import Enum, auto
+
+from loxpy.parser import expressions
+from loxpy.parser import statements
+from loxpy.token import Token
+
+
+class FunctionType(Enum):
+    NONE = auto()
+    FUNCTION = auto()
+    INITIALIZER = auto()
+    METHOD = auto()
+
+
+class ClassType(Enum):
+    NONE = auto()
+    CLASS = auto()
+    SUBCLASS = auto()
+
+
+class Resolver(
+    expressions.ExprVisitor,
+    statements.StmtVisitor
+):
+    def __init__(self, lox_interpreter):
+        self.lox = lox_interpreter
+        # Each scope maps a variable name to its slot in the frame
+        self.scopes = []
+        # Name whose initializer is currently being resolved
+        self.pending = None
+        self.current_function = FunctionType.NONE
+        self.current_class = ClassType.NONE
+
+    def resolve(self, statements:list):
+        for statement in statements:
+            self.resolve_stmt(statement)
+
+    def resolve_stmt(self, statement:statements.Stmt):
+        statement.accept(self)
+
+    def resolve_expr(self, expr:expressions.Expr):
+        expr.accept(self)
+
+    def error(self, token:Token, message:str):
+        self.lox.error(token.line, message)
+
+    def begin_scope(self):
+        self.scopes.append({})
+
+    def end_scope(self):
+        self.scopes.pop()
+
+    def declare(self, name:Token):
+        if len(self.scopes) == 0:
+            return None
+
+        scope = self.scopes[-1]
+        if name.lexeme in scope:
+            self.error(name, "Already a variable with this name in this scope.")
+            return scope[name.lexeme]
+
+        slot = len(scope)
+        scope[name.lexeme] = slot
+        return slot
+
+    def resolve_local(self, expr:expressions.Expr, name:Token):
+        for i in range(len(self.scopes) - 1, -1, -1):
+            if name.lexeme in self.scopes[i]:
+                expr.depth = len(self.scopes) - 1 - i
+                expr.slot = self.scopes[i][name.lexeme]
+                return
+        # Not found in any local scope, assume it is global
+        expr.depth = None
+        expr.slot = None
+
+    def declares_variables(self, body:list):
+        for statement in body:
+            if isinstance(statement, (statements.Var, statements.Function, statements.Class)):
+                return True
+        return False
+
+    def resolve_function(self, function:statements.Function, function_type:FunctionType):
+        enclosing_function = self.current_function
+        self.current_function = function_type
+
+        self.begin_scope()
+        for param in function.params:
+            self.declare(param)
+        self.resolve(function.body)
+        function.size = len(self.scopes[-1])
+        self.end_scope()
+
+        self.current_function = enclosing_function
+
+    def visit_block_stmt(self, stmt: statements.Block):
+        if not self.declares_variables(stmt.statements):
+            # Nothing to store, so the block shares the enclosing frame
+            stmt.size = 0
+            self.resolve(stmt.statements)
+            return
+
+        self.begin_scope()
+        self.resolve(stmt.statements)
+        stmt.size = len(self.scopes[-1])
+        self.end_scope()
+
+    def visit_class_stmt(self, stmt: statements.Class):
+        enclosing_class = self.current_class
+        self.current_class = ClassType.CLASS
+
+        stmt.slot = self.declare(stmt.name)
+
+        if stmt.superclass != None:
+            self.current_class = ClassType.SUBCLASS
+            self.resolve_expr(stmt.superclass)
+
+            self.begin_scope()
+            self.scopes[-1]["super"] = 0
+
+        self.begin_scope()
+        self.scopes[-1]["this"] = 0
+
+        for method in stmt.methods:
+            function_type = FunctionType.METHOD
+            if method.name.lexeme == "init":
+                function_type = FunctionType.INITIALIZER
+            self.resolve_function(method, function_type)
+
+        self.end_scope()
+
+        if stmt.superclass != None:
+            self.end_scope()
+
+        self.current_class = enclosing_class
+
+    def visit_break_stmt(self, stmt: statements.Break):
+        pass
+
+    def visit_expression_stmt(self, stmt: statements.Expression):
+        self.resolve_expr(stmt.expression)
+
+    def visit_function_stmt(self, stmt: statements.Function):
+        stmt.slot = self.declare(stmt.name)
+        self.resolve_function(stmt, FunctionType.FUNCTION)
+
+    def visit_if_stmt(self, stmt: statements.If):
+        self.resolve_expr(stmt.condition)
+        self.resolve_stmt(stmt.thenBranch)
+        if stmt.elseBranch != None:
+            self.resolve_stmt(stmt.elseBranch)
+
+    def visit_print_stmt(self, stmt: statements.Print):
+        self.resolve_expr(stmt.expression)
+
+    def visit_return_stmt(self, stmt: statements.Return):
+        if self.current_function == FunctionType.NONE:
+            self.error(stmt.keyword, "Can't return from top-level code.")
+
+        if stmt.value != None:
+            if self.current_function == FunctionType.INITIALIZER:
+                self.error(stmt.keyword, "Can't return a value from an initializer.")
+            self.resolve_expr(stmt.value)
+
+    def visit_var_stmt(self, stmt: statements.Var):
+        stmt.slot = self.declare(stmt.name)
+        if stmt.initializer != None:
+            self.pending = stmt.name.lexeme
+            self.resolve_expr(stmt.initializer)
+            self.pending = None
+
+    def visit_while_stmt(self, stmt: statements.While):
+        self.resolve_expr(stmt.condition)
+        self.resolve_stmt(stmt.body)
+
+    def visit_assign_expr(self, expr: expressions.Assign):
+        self.resolve_expr(expr.value)
+        self.resolve_local(expr, expr.name)
+
+    def visit_binary_expr(self, expr: expressions.Binary):
+        self.resolve_expr(expr.left)
+        self.resolve_expr(expr.right)
+
+    def visit_call_expr(self, expr: expressions.Call):
+        self.resolve_expr(expr.callee)
+        for argument in expr.arguments:
+            self.resolve_expr(argument)
+
+    def visit_dot_expr(self, expr: expressions.Dot):
+        self.resolve_expr(expr.object)
+
+    def visit_dotset_expr(self, expr: expressions.DotSet):
+        self.resolve_expr(expr.value)
+        self.resolve_expr(expr.object)
+
+    def visit_grouping_expr(self, expr: expressions.Grouping):
+        self.resolve_expr(expr.expression)
+
+    def visit_literal_expr(self, expr: expressions.Literal):
+        pass
+
+    def visit_logical_expr(self, expr: expressions.Logical):
+        self.resolve_expr(expr.left)
+        self.resolve_expr(expr.right)
+
+    def visit_super_expr(self, expr: expressions.Super):
+        if self.current_class == ClassType.NONE:
+            self.error(expr.keyword, "Can't use 'super' outside of a class.")
+        elif self.current_class != ClassType.SUBCLASS:
+            self.error(expr.keyword, "Can't use 'super' in a class with no superclass.")
+
+        self.resolve_local(expr, expr.keyword)
+
+    def visit_this_expr(self, expr: expressions.This):
+        if self.current_class == ClassType.NONE:
+            self.error(expr.keyword, "Can't use 'this' outside of a class.")
+            return
+
+        self.resolve_local(expr, expr.keyword)
+
+    def visit_unary_expr(self, expr: expressions.Unary):
+        self.resolve_expr(expr.right)
+
+    def visit_variable_expr(self, expr: expressions.Variable):
+        if len(self.scopes) != 0 and expr.name.lexeme == self.pending and expr.name.lexeme in self.scopes[-1]:
+            self.error(expr.name, "Can't read local variable in its own initializer.")
+
+        self.resolve_local(expr, expr.name)
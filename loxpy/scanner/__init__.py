@@ -1,3 +1,5 @@
+import sys
+
 from loxpy.token.token_types import TokenType, KEYWORD_MAP
 from loxpy.token import Token
 
@@ -176,12 +178,12 @@ class Scanner:
         while self.is_alphanumeric(self.peek()):
             self.advance()
 
-        text = self.source[self.start:self.current]
+        text = sys.intern(self.source[self.start:self.current])
         token_type = TokenType.IDENTIFIER
         if text in KEYWORD_MAP:
             token_type = KEYWORD_MAP[text]
 
-        self.add_token(token_type)
+        self.add_token(token_type, lexeme=text)
 
     def skip_multiline_comment(self):
         # consume *
@@ -202,8 +204,8 @@ class Scanner:
                 self.skip_multiline_comment()
 
 
-    def add_token(self, token_type, literal=None):
-        text = self.source[self.start:self.current]
+    def add_token(self, token_type, literal=None, lexeme=None):
+        text = lexeme if lexeme != None else self.source[self.start:self.current]
         self.tokens.append(Token(
             token_type,
             text,
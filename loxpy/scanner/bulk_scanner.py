@@ -0,0 +1,147 @@
+import re
+import sys
+
+from loxpy.token.token_types import TokenType, KEYWORD_MAP
+from loxpy.token import Token
+
+OPERATORS = {
+    "(": TokenType.LEFT_PARAN,
+    ")": TokenType.RIGHT_PAREN,
+    "{": TokenType.LEFT_BRACE,
+    "}": TokenType.RIGHT_BRACE,
+    ",": TokenType.COMMA,
+    ".": TokenType.DOT,
+    "-": TokenType.MINUS,
+    "+": TokenType.PLUS,
+    ";": TokenType.SEMICOLON,
+    "*": TokenType.MULTIPLY,
+    "/": TokenType.DIVIDE,
+    "!": TokenType.NOT,
+    "!=": TokenType.NOT_EQUAL,
+    "=": TokenType.EQUAL,
+    "==": TokenType.EQUAL_EQUAL,
+    "<": TokenType.LESSER,
+    "<=": TokenType.LESSER_EQUAL,
+    ">": TokenType.GREATER,
+    ">=": TokenType.GREATER_EQUAL,
+}
+
+# One alternative per kind of lexeme, tried in this order. Group numbers
+# are used for dispatch in iter_tokens.
+(
+    WHITESPACE, COMMENT, BLOCK_COMMENT, NUMBER, NAME, STRING,
+    UNTERMINATED_STRING, OPERATOR, UNEXPECTED,
+) = range(1, 10)
+
+TOKEN_PATTERN = re.compile(r'''
+    ([ \t\r\n]+)                    # whitespace
+  | (//[^\n]*)                      # single line comment
+  | (/\*)                           # multi-line comment, skipped by hand
+  | ([0-9]+(?:\.[0-9]+)?)           # number
+  | ([A-Za-z_][A-Za-z0-9_]*)        # identifier or keyword
+  | ("[^"]*")                       # string
+  | (")                             # unterminated string
+  | (!=|==|<=|>=|[(){},.\-+;*/!=<>])
+  | (.)                             # anything else is an error
+''', re.VERBOSE | re.DOTALL)
+
+
+class BulkScanner:
+    '''
+    Drop-in replacement for Scanner that matches whole lexemes with a
+    single compiled regex instead of stepping through the source one
+    character at a time. Produces the same tokens, lines and errors.
+    '''
+    def __init__(self, source, lox_interpreter):
+        self.lox = lox_interpreter
+        self.source = source
+        self.tokens = []
+        self.line = 1
+
+    def scan_tokens(self):
+        self.tokens.extend(self.iter_tokens())
+        return self.tokens
+
+    def iter_tokens(self):
+        '''
+        Yields tokens as they are scanned, ending with EOF. Errors are
+        reported when the scanner reaches them.
+        '''
+        source = self.source
+        operators = OPERATORS
+        keywords = KEYWORD_MAP
+        identifier = TokenType.IDENTIFIER
+        number = TokenType.NUMBER
+        string = TokenType.STRING
+        intern = sys.intern
+        line = self.line
+        position = 0
+
+        while position < len(source):
+            # Restarted only after a multi-line comment
+            for match in TOKEN_PATTERN.finditer(source, position):
+                kind = match.lastindex
+                text = match.group()
+
+                if kind == NAME:
+                    # Interned so name lookups compare by identity
+                    yield Token(keywords.get(text, identifier), intern(text), None, line)
+                elif kind == OPERATOR:
+                    yield Token(operators[text], intern(text), None, line)
+                elif kind == WHITESPACE:
+                    line += text.count("\n")
+                elif kind == NUMBER:
+                    yield Token(number, text, float(text), line)
+                elif kind == STRING:
+                    line += text.count("\n")
+                    yield Token(string, text, text[1:-1], line)
+                elif kind == COMMENT:
+                    pass
+                elif kind == BLOCK_COMMENT:
+                    position, line = self.skip_multiline_comment(match.end(), line)
+                    break
+                elif kind == UNTERMINATED_STRING:
+                    line += source.count("\n", match.end())
+                    self.lox.error(line, "Unterminated end of string.")
+                    position = len(source)
+                    break
+                else:
+                    self.lox.error(line, "Unexpected character '" + text + "' found.")
+            else:
+                position = len(source)
+
+        self.line = line
+        yield Token(TokenType.EOF, "", None, line)
+
+    def skip_multiline_comment(self, position, line):
+        '''
+        Returns the position and line after the comment starting just
+        before `position`, following Scanner.skip_multiline_comment: the
+        character right after the opening `/*` is skipped unconditionally
+        and nested comments have to be closed too.
+        '''
+        source = self.source
+        end = len(source)
+        position = min(position + 1, end)
+        depth = 1
+
+        while True:
+            if position >= end:
+                # Every open comment reports itself
+                for _ in range(depth):
+                    self.lox.error(line, "Unterminated end of multi-line comment.")
+                return end, line
+
+            c = source[position]
+            position += 1
+
+            if c == "\n":
+                line += 1
+            elif c == "*" and position < end and source[position] == "/":
+                position += 1
+                depth -= 1
+                if depth == 0:
+                    return position, line
+            elif c == "/" and position < end and source[position] == "*":
+                position += 1
+                depth += 1
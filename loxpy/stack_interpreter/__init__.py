@@ -0,0 +1,316 @@
+'''
+Explicit-stack evaluation engine for loxpy.
+
+Walks the same resolved AST as the tree-walking Interpreter, but nothing
+a Lox program does makes the Python stack grow. Every node with children
+is evaluated by a generator: it yields the evaluation of each child (the
+generator returned by `evaluate`/`execute`, or directly the value of a
+node without children) and is resumed with its result. `run` keeps the
+suspended generators in a list, the continuation stack, so the depth of
+Lox recursion is bounded by `max_stack` (a memory budget counted in
+suspended evaluations) and not by sys.getrecursionlimit().
+'''
+from types import GeneratorType
+
+from loxpy.parser import expressions
+from loxpy.parser import statements
+from loxpy.token.token_types import TokenType
+
+from loxpy.environment import Frame
+
+from loxpy.evaluator import Interpreter
+from loxpy.evaluator.lox_class import LoxClass
+from loxpy.evaluator.lox_callable import LoxCallable
+from loxpy.evaluator.lox_function import LoxFunction, MemoizedFunction
+from loxpy.evaluator.memoization import memo_key, MISSING
+from loxpy.evaluator.lox_instance import LoxInstance
+from loxpy.evaluator.completion import BREAK, RETURN, TAIL_CALL
+from loxpy.evaluator.runtime_error import (
+    LoxPyRuntimeError,
+    LoxBreakException,
+    LoxNativeError
+)
+
+
+class StackInterpreter(Interpreter):
+    # Default continuation stack budget, a Lox call takes about 6 entries
+    MAX_STACK = 1000000
+
+    def __init__(self, lox_main):
+        super().__init__(lox_main)
+        self.max_stack = self.MAX_STACK
+        # Suspended evaluations, innermost last
+        self.stack = []
+
+    def interpret(self, statements):
+        try:
+            for statement in statements:
+                try:
+                    self.run(self.execute(statement))
+                except LoxBreakException:
+                    pass
+        except LoxPyRuntimeError as error:
+            self.lox.runtime_error(error)
+
+    def run(self, task):
+        '''
+        Runs `task`, as returned by evaluate or execute, to completion and
+        returns its value. Exceptions are thrown into the suspended
+        evaluations one by one, so their handlers and finally blocks run
+        as they would on the Python stack.
+        '''
+        if type(task) is not GeneratorType:
+            return task
+
+        stack = self.stack = [task]
+        value = None
+        error = None
+        while True:
+            try:
+                if error == None:
+                    task = stack[-1].send(value)
+                else:
+                    raised, error = error, None
+                    task = stack[-1].throw(raised)
+            except StopIteration as finished:
+                stack.pop()
+                value = finished.value
+                if len(stack) == 0:
+                    return value
+                continue
+            except Exception as raised:
+                stack.pop()
+                if len(stack) == 0:
+                    raise
+                error = raised
+                continue
+
+            if type(task) is GeneratorType:
+                stack.append(task)
+                value = None
+            else:
+                # Nodes without children are evaluated right away
+                value = task
+
+    # Calls
+
+    def call_parts(self, expr: expressions.Call):
+        '''
+        Evaluates the callee and the arguments of a call. Returns the
+        callee, the instance to call it as a method of (None for anything
+        else) and the arguments.
+        '''
+        if type(expr.callee) is expressions.Dot:
+            obj = yield self.evaluate(expr.callee.object)
+            callee, instance = self.method_of(expr.callee, obj)
+        else:
+            callee = yield self.evaluate(expr.callee)
+            instance = None
+
+        if not isinstance(callee, LoxCallable):
+            raise LoxPyRuntimeError(expr.paren, "Can only call function and classes.")
+
+        arguments = []
+        for argument in expr.arguments:
+            arguments.append((yield self.evaluate(argument)))
+
+        if len(arguments) != callee.arity():
+            raise LoxPyRuntimeError(expr.paren, "Expected " +
+                str(callee.arity()) + " arguments but got " +
+                str(len(arguments)) + "."
+            )
+        return callee, instance, arguments
+
+    def call_task(self, expr: expressions.Call, callee:LoxCallable, instance:LoxInstance, arguments:list):
+        '''
+        Evaluation of a call of `callee`, or its result for native
+        functions.
+        '''
+        if len(self.stack) >= self.max_stack:
+            raise LoxPyRuntimeError(expr.paren, "Stack overflow.")
+
+        if type(callee) is LoxFunction:
+            return self.run_function(callee, callee.frame(instance, arguments))
+        if type(callee) is MemoizedFunction:
+            return self.run_memoized(callee, arguments)
+        if type(callee) is LoxClass:
+            return self.construct(callee, arguments)
+        try:
+            if instance != None:
+                # Method of a native object
+                return callee.call_method(self, instance, arguments)
+            return callee.call(self, arguments)
+        except LoxNativeError as error:
+            raise LoxPyRuntimeError(expr.paren, str(error)) from None
+
+    def run_function(self, function:LoxFunction, env:Frame):
+        '''
+        Same as LoxFunction.run.
+        '''
+        status = yield self.execute_block(function.declaration.body, env)
+        while status is TAIL_CALL:
+            function, env = self.return_value
+            status = yield self.execute_block(function.declaration.body, env)
+
+        if status is BREAK:
+            # A break outside of any loop in the body ends the caller's loop
+            raise LoxBreakException(function.declaration.name)
+
+        if function.is_initializer:
+            return env.enclosing.values[0]
+
+        if status is RETURN:
+            return self.return_value
+        return None
+
+    def run_memoized(self, function:MemoizedFunction, arguments:list):
+        '''
+        Same as MemoizedFunction.call.
+        '''
+        key = memo_key(arguments)
+        if key == None:
+            return (yield self.run_function(function, function.frame(None, arguments)))
+
+        value = function.memo.lookup(key)
+        if value is MISSING:
+            value = yield self.run_function(function, function.frame(None, arguments))
+            function.memo.store(key, value)
+        return value
+
+    def construct(self, klass:LoxClass, arguments:list):
+        '''
+        Same as LoxClass.call.
+        '''
+        instance = LoxInstance(klass)
+        initializer = klass.initializer
+        if initializer != None:
+            yield self.run_function(initializer, initializer.frame(instance, arguments))
+        return instance
+
+    # Statements
+
+    def execute_block(self, statements, environment:Frame):
+        previous = self.env
+        try:
+            self.env = environment
+            for statement in statements:
+                status = yield self.execute(statement)
+                if status != None:
+                    return status
+            return None
+        finally:
+            self.env = previous
+
+    def visit_block_stmt(self, expr: statements.Block):
+        if expr.size == 0:
+            for statement in expr.statements:
+                status = yield self.execute(statement)
+                if status != None:
+                    return status
+            return None
+        return (yield self.execute_block(expr.statements, Frame([None] * expr.size, self.env)))
+
+    def visit_class_stmt(self, expr: statements.Class):
+        superclass = None
+        if expr.superclass != None:
+            superclass = yield self.evaluate(expr.superclass)
+        self.define_class(expr, superclass)
+
+    def visit_expression_stmt(self, expr: statements.Expression):
+        yield self.evaluate(expr.expression)
+        return None
+
+    def visit_if_stmt(self, expr: statements.If):
+        if (yield self.evaluate(expr.condition)):
+            return (yield self.execute(expr.thenBranch))
+        elif expr.elseBranch != None:
+            return (yield self.execute(expr.elseBranch))
+
+    def visit_print_stmt(self, expr: statements.Print):
+        value = yield self.evaluate(expr.expression)
+        self.output.write(self.stringify(value) + "\n")
+        return None
+
+    def visit_return_stmt(self, expr: statements.Return):
+        value = None
+        if type(expr.value) is expressions.Call:
+            # Tail call, see Interpreter.tail_call
+            callee, instance, arguments = yield from self.call_parts(expr.value)
+            if type(callee) is LoxFunction and not callee.is_initializer:
+                self.return_value = (callee, callee.frame(instance, arguments))
+                return TAIL_CALL
+            if type(callee) is MemoizedFunction:
+                value = callee.cached(arguments)
+                if value is MISSING:
+                    self.return_value = (callee, callee.frame(instance, arguments))
+                    return TAIL_CALL
+                self.return_value = value
+                return RETURN
+            value = yield self.call_task(expr.value, callee, instance, arguments)
+        elif expr.value != None:
+            value = yield self.evaluate(expr.value)
+        self.return_value = value
+        return RETURN
+
+    def visit_var_stmt(self, stmt: statements.Var):
+        value = None
+        if stmt.initializer != None:
+            value = yield self.evaluate(stmt.initializer)
+        self.define(stmt.slot, stmt.name, value)
+
+    def visit_while_stmt(self, expr: statements.While):
+        while (yield self.evaluate(expr.condition)):
+            try:
+                status = yield self.execute(expr.body)
+            except LoxBreakException:
+                # Break of a function called from the body, see run_function
+                return None
+
+            if status != None:
+                if status is BREAK:
+                    return None
+                return status
+
+    # Expressions
+
+    def visit_assign_expr(self, expr: expressions.Assign):
+        value = yield self.evaluate(expr.value)
+        return self.assign(expr, value)
+
+    def visit_binary_expr(self, expr: expressions.Binary):
+        left = yield self.evaluate(expr.left)
+        right = yield self.evaluate(expr.right)
+        return self.binary(expr, left, right)
+
+    def visit_call_expr(self, expr: expressions.Call):
+        callee, instance, arguments = yield from self.call_parts(expr)
+        return (yield self.call_task(expr, callee, instance, arguments))
+
+    def visit_dot_expr(self, expr: expressions.Dot):
+        obj = yield self.evaluate(expr.object)
+        return self.get_property(expr, obj)
+
+    def visit_dotset_expr(self, expr: expressions.DotSet):
+        obj = yield self.evaluate(expr.object)
+
+        if not isinstance(obj, LoxInstance):
+            raise LoxPyRuntimeError(expr.name, "Only instances have fields.")
+
+        value = yield self.evaluate(expr.value)
+        return self.store_field(expr, obj, value)
+
+    def visit_grouping_expr(self, expr: expressions.Grouping):
+        return (yield self.evaluate(expr.expression))
+
+    def visit_logical_expr(self, expr: expressions.Logical):
+        left = yield self.evaluate(expr.left)
+        if expr.operator.type == TokenType.OR:
+            if self.is_truthy(left):
+                return left
+        elif not self.is_truthy(left):
+            return left
+        return (yield self.evaluate(expr.right))
+
+    def visit_unary_expr(self, expr: expressions.Unary):
+        right = yield self.evaluate(expr.right)
+        return self.unary_operators[expr.operator.type](expr.operator, right)
@@ -0,0 +1,121 @@
+'''
+Execution statistics for loxpy.
+
+StatsInterpreter is the tree-walking Interpreter with counters: it
+counts every node it visits by node class, the calls it makes by kind of
+callee, the frames created, the longest chain of enclosing frames a
+variable access walks, and the exceptions used for control flow (a break
+that ends the loop of a caller). The plain Interpreter has none of these
+counters, so they cost nothing unless `--stats` picks this engine.
+'''
+from loxpy.parser import expressions
+from loxpy.environment import Frame
+
+from loxpy.evaluator import Interpreter
+from loxpy.evaluator.lox_class import LoxClass
+from loxpy.evaluator.lox_callable import LoxCallable
+from loxpy.evaluator.lox_function import LoxFunction
+from loxpy.evaluator.completion import TAIL_CALL
+from loxpy.evaluator.runtime_error import LoxBreakException
+
+# Nodes that read or write a variable `depth` frames up the chain
+RESOLVED_NODES = (expressions.Variable, expressions.Assign, expressions.This, expressions.Super)
+
+
+class ExecutionStats:
+    def __init__(self):
+        # Node class -> number of visits
+        self.nodes = {}
+        self.function_calls = 0
+        self.tail_calls = 0
+        self.class_calls = 0
+        self.native_calls = 0
+        self.frames = 0
+        # Longest enclosing chain walked by a resolved variable access
+        self.max_depth = 0
+        self.control_exceptions = 0
+
+    def report(self):
+        lines = [f"execution stats: {sum(self.nodes.values())} nodes executed"]
+        for node_class, count in sorted(self.nodes.items(), key=lambda item: -item[1]):
+            if count != 0:
+                lines.append(f"  {node_class.__name__:<24} {count:>12}")
+        lines.append(f"  {'function calls':<24} {self.function_calls:>12} ({self.tail_calls} tail calls)")
+        lines.append(f"  {'class calls':<24} {self.class_calls:>12}")
+        lines.append(f"  {'native calls':<24} {self.native_calls:>12}")
+        lines.append(f"  {'frames created':<24} {self.frames:>12}")
+        lines.append(f"  {'max frame chain walked':<24} {self.max_depth:>12}")
+        lines.append(f"  {'control flow exceptions':<24} {self.control_exceptions:>12}")
+        return "\n".join(lines)
+
+
+class StatsInterpreter(Interpreter):
+    def __init__(self, lox_main):
+        super().__init__(lox_main)
+        self.stats = ExecutionStats()
+        self.last_break = None
+
+        # Every visit goes through the dispatch tables, count it there.
+        # The tables are updated in place as the visit methods keep them
+        for table in (self.expr_table, self.stmt_table):
+            for node_class, visit in table.items():
+                table[node_class] = self.counting(node_class, visit)
+
+    def counting(self, node_class:type, visit):
+        stats = self.stats
+        counts = stats.nodes
+        counts[node_class] = 0
+
+        if node_class in RESOLVED_NODES:
+            def visit_resolved(node):
+                counts[node_class] += 1
+                depth = node.depth
+                if depth != None and depth > stats.max_depth:
+                    stats.max_depth = depth
+                return visit(node)
+            return visit_resolved
+
+        def visit_counted(node):
+            counts[node_class] += 1
+            return visit(node)
+        return visit_counted
+
+    def interpret(self, statements):
+        # Frames are created all over the engine, so their constructor is
+        # wrapped for the duration of the run
+        stats = self.stats
+        init = Frame.__init__
+        def counting_init(frame, values:list, enclosing=None):
+            stats.frames += 1
+            init(frame, values, enclosing)
+
+        Frame.__init__ = counting_init
+        try:
+            super().interpret(statements)
+        finally:
+            Frame.__init__ = init
+
+    def call(self, expr: expressions.Call, callee:object, instance=None):
+        stats = self.stats
+        if isinstance(callee, LoxFunction):
+            stats.function_calls += 1
+        elif type(callee) is LoxClass:
+            stats.class_calls += 1
+        elif isinstance(callee, LoxCallable):
+            stats.native_calls += 1
+
+        try:
+            return super().call(expr, callee, instance)
+        except LoxBreakException as error:
+            # Counted once, not at every call it propagates through
+            if error is not self.last_break:
+                stats.control_exceptions += 1
+                self.last_break = error
+            raise
+
+    def tail_call(self, expr: expressions.Call):
+        status = super().tail_call(expr)
+        if status is TAIL_CALL:
+            self.stats.function_calls += 1
+            self.stats.tail_calls += 1
+        return status
@@ -1,6 +1,10 @@
 from .token_types import TokenType
 
 class Token:
+    # Tokens live as long as the AST that references them, so they skip
+    # the per-instance __dict__
+    __slots__ = ('type', 'lexeme', 'literal', 'line')
+
     def __init__(
         self,
         type:TokenType,
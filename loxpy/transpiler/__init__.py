@@ -0,0 +1,605 @@
+'''
+Ahead-of-time transpiler from Lox to Python source.
+
+The generated module leans on CPython for the heavy lifting: Lox locals
+become Python locals, Lox functions become Python functions (created by
+module level factories that receive their captured variables) and
+arithmetic is emitted inline behind cheap type guards. Everything Lox
+specific lives in loxpy.transpiler.runtime.
+
+Runtime errors report Lox source lines: the runtime helpers that raise
+them are passed the line of the failing token, and every generated line
+is mapped back to the Lox statement it came from (`LINE_MAP`) for the
+errors raised elsewhere.
+'''
+from loxpy.parser import expressions
+from loxpy.parser import statements
+from loxpy.token import Token
+from loxpy.token.token_types import TokenType
+
+from loxpy.evaluator.runtime_error import LoxPyRuntimeError
+from loxpy.transpiler import runtime
+from loxpy.transpiler.analyzer import ScopeAnalyzer
+
+INDENTATION = '    '
+
+NUMBER_OPERATORS = {
+    TokenType.MINUS: '-',
+    TokenType.MULTIPLY: '*',
+    TokenType.GREATER: '>',
+    TokenType.GREATER_EQUAL: '>=',
+    TokenType.LESSER: '<',
+    TokenType.LESSER_EQUAL: '<=',
+}
+
+COMPARISON_OPERATORS = (
+    TokenType.GREATER, TokenType.GREATER_EQUAL,
+    TokenType.LESSER, TokenType.LESSER_EQUAL,
+    TokenType.EQUAL_EQUAL, TokenType.NOT_EQUAL,
+)
+
+# Fields that may hold a token or a child node, checked in source order
+TOKEN_FIELDS = ('name', 'keyword', 'token', 'paren', 'operator', 'method')
+CHILD_FIELDS = ('expression', 'callee', 'object', 'left', 'right', 'value', 'condition', 'initializer')
+
+
+def node_line(node:object):
+    '''
+    Line of the first token that can be found in `node`.
+    '''
+    for field in TOKEN_FIELDS:
+        token = getattr(node, field, None)
+        if isinstance(token, Token):
+            return token.line
+    for field in CHILD_FIELDS:
+        child = getattr(node, field, None)
+        if isinstance(child, (expressions.Expr, statements.Stmt)):
+            line = node_line(child)
+            if line != None:
+                return line
+    return None
+
+
+def static_type(expr:expressions.Expr):
+    '''
+    Type an expression is guaranteed to have if it evaluates without
+    error: float, str, bool or None when unknown.
+    '''
+    if isinstance(expr, expressions.Literal):
+        return type(expr.value) if type(expr.value) in (float, str, bool) else None
+    if isinstance(expr, expressions.Grouping):
+        return static_type(expr.expression)
+    if isinstance(expr, expressions.Unary):
+        return float if expr.operator.type == TokenType.MINUS else bool
+    if isinstance(expr, expressions.Binary):
+        if expr.operator.type in COMPARISON_OPERATORS:
+            return bool
+        if expr.operator.type == TokenType.PLUS:
+            left, right = static_type(expr.left), static_type(expr.right)
+            return left if left in (float, str) else (right if right in (float, str) else None)
+        return float
+    return None
+
+
+def is_literal(expr:expressions.Expr, value_type:type):
+    while isinstance(expr, expressions.Grouping):
+        expr = expr.expression
+    return isinstance(expr, expressions.Literal) and type(expr.value) is value_type
+
+
+class FunctionWriter:
+    '''
+    Lines of one generated module level function.
+    '''
+    def __init__(self):
+        # (indent, text, lox_line)
+        self.lines = []
+        self.indent = 0
+
+
+class Transpiler(
+    expressions.ExprVisitor,
+    statements.StmtVisitor
+):
+    def __init__(self):
+        self.analysis = None
+        self.writer:FunctionWriter = None
+        self.definitions = []
+        self.line = 0
+        self.counter = 0
+
+        # State of the Lox function being generated
+        self.scope = None
+        self.this_name = None
+        self.is_initializer = False
+        # Python name of the function and its parameters, for self tail calls
+        self.def_name = None
+        self.params = None
+        self.loop_depth = 0
+        self.has_tail_call = False
+
+        # (statement line, global or method name) -> line of the first read
+        # or call, see runtime.run
+        self.name_lines = {}
+
+        # Globals assigned directly from __lox_main__ and those already defined there
+        self.main_globals = set()
+        self.defined_globals = set()
+
+    def transpile(self, program:list, source_name:str="<lox>"):
+        '''
+        Returns the generated Python source, its line map and the lines
+        of global reads and method calls.
+        '''
+        self.analysis = ScopeAnalyzer().analyze(program)
+
+        main = FunctionWriter()
+        self.writer = main
+        self.writer.indent = 1
+        for statement in program:
+            self.line = node_line(statement) or self.line
+            if statement in self.analysis.calling:
+                # The break of a called function just ends the statement
+                self.emit("try:")
+                self.writer.indent += 1
+            if statement in self.analysis.stray_breaks:
+                self.emit("for _ in (0,):")
+                self.writer.indent += 1
+                self.statement(statement)
+                self.writer.indent -= 1
+            else:
+                self.statement(statement)
+            if statement in self.analysis.calling:
+                self.writer.indent -= 1
+                self.emit("except rt.LoxBreakException:")
+                self.writer.indent += 1
+                self.emit("pass")
+                self.writer.indent -= 1
+        if len(main.lines) == 0:
+            self.emit("pass")
+
+        globals_line = []
+        if len(self.main_globals) != 0:
+            globals_line = [(1, "global " + ", ".join(sorted(self.main_globals)), 0)]
+        main.lines = [(0, "def __lox_main__():", 0)] + globals_line + main.lines
+
+        lines = [
+            (0, f"# Generated by loxpy from {source_name}, do not edit.", 0),
+            (0, "from types import FunctionType as _function, MethodType as _method", 0),
+            (0, "from loxpy.transpiler import runtime as rt", 0),
+            (0, "", 0),
+            (0, "_G = globals()", 0),
+            (0, "rt.install_builtins(_G)", 0),
+            (0, "_print = rt.lox_print", 0),
+        ]
+        for writer in self.definitions + [main]:
+            lines.append((0, "", 0))
+            lines.extend(writer.lines)
+
+        line_map = [lox_line for _, _, lox_line in lines]
+        line_map += [0] * 7
+        lines += [
+            (0, "", 0),
+            (0, "LINE_MAP = " + repr(tuple(line_map)), 0),
+            (0, "NAME_LINES = " + repr(self.name_lines), 0),
+            (0, "", 0),
+            (0, 'if __name__ == "__main__":', 0),
+            (1, "rt.run_module(__lox_main__, LINE_MAP, NAME_LINES)", 0),
+            (0, "", 0),
+        ]
+
+        source = "\n".join(INDENTATION * indent + text for indent, text, _ in lines)
+        return source, tuple(line_map), self.name_lines
+
+    # Emission helpers
+
+    def emit(self, text:str):
+        self.writer.lines.append((self.writer.indent, text, self.line))
+
+    def temp(self, prefix:str="_t"):
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def statement(self, stmt:statements.Stmt):
+        line = node_line(stmt)
+        if line != None:
+            self.line = line
+        stmt.accept(self)
+
+    def body(self, body:list):
+        start = len(self.writer.lines)
+        self.writer.indent += 1
+        for stmt in body:
+            self.statement(stmt)
+        if len(self.writer.lines) == start:
+            self.emit("pass")
+        self.writer.indent -= 1
+
+    def expr(self, expr:expressions.Expr):
+        return expr.accept(self)
+
+    def load(self, node:object, name:str):
+        binding = self.analysis.references.get(node)
+        if binding == None:
+            # An undefined global is only found by the NameError of its line
+            self.name_lines.setdefault((self.line, "g_" + name), node_line(node))
+            return "g_" + name
+        if binding.is_cell:
+            return binding.py_name + "[0]"
+        return binding.py_name
+
+    def store(self, node:object, name:str, value:str):
+        binding = self.analysis.references.get(node)
+        if binding == None:
+            global_name = "g_" + name
+            if self.scope == None and global_name in self.defined_globals:
+                self.main_globals.add(global_name)
+                return f"({global_name} := {value})"
+            return f"rt.set_global(_G, {global_name!r}, {value}, {node_line(node)})"
+        if binding.is_cell:
+            return f"rt.store({binding.py_name}, {value})"
+        return f"({binding.py_name} := {value})"
+
+    def define(self, declaration:object, name:str, value:str):
+        binding = self.analysis.declarations.get(declaration)
+        if binding == None:
+            global_name = "g_" + name
+            self.main_globals.add(global_name)
+            self.defined_globals.add(global_name)
+            self.emit(f"{global_name} = {value}")
+        elif binding.is_cell:
+            self.emit(f"{binding.py_name} = [{value}]")
+        else:
+            self.emit(f"{binding.py_name} = {value}")
+
+    def define_recursive(self, declaration:object, name:str, make:str):
+        '''
+        Define a function or class, which may refer to itself.
+        '''
+        binding = self.analysis.declarations.get(declaration)
+        if binding != None and binding.is_cell:
+            self.emit(f"{binding.py_name} = [None]")
+            self.emit(f"{binding.py_name}[0] = {make}")
+        else:
+            self.define(declaration, name, make)
+
+    def free_arguments(self, scope):
+        return ", ".join(binding.py_name for binding in scope.free)
+
+    def function(self, declaration:statements.Function, is_method:bool=False):
+        '''
+        Emit a Python def for a Lox function into the current writer.
+        '''
+        scope = self.analysis.scopes[declaration]
+        enclosing = (
+            self.scope, self.this_name, self.is_initializer,
+            self.def_name, self.params, self.loop_depth, self.has_tail_call
+        )
+        self.scope = scope
+        self.is_initializer = is_method and declaration.name.lexeme == "init"
+
+        params = [self.analysis.declarations[param] for param in declaration.params]
+        names = [param.py_name for param in params]
+        if is_method:
+            self.this_name = self.analysis.declarations[declaration.name].py_name
+            names.insert(0, self.this_name)
+
+        self.line = declaration.name.line
+        def_name = "lox_" + declaration.name.lexeme
+        self.def_name = None if is_method else def_name
+        self.params = params
+        self.loop_depth = 0
+        self.has_tail_call = False
+        self.emit(f"def {def_name}({', '.join(names)}):")
+        self.writer.indent += 1
+        for param in params:
+            if param.is_cell:
+                self.emit(f"{param.py_name} = [{param.py_name}]")
+
+        start = len(self.writer.lines)
+        self.writer.indent -= 1
+        self.body(declaration.body)
+        self.writer.indent += 1
+
+        if self.has_tail_call:
+            # Self tail calls rebind the parameters and run the body again
+            lines = self.writer.lines
+            lines[start:] = [(indent + 1, text, line) for indent, text, line in lines[start:]]
+            lines.insert(start, (self.writer.indent, "while True:", declaration.name.line))
+            self.writer.indent += 1
+            self.emit("return None")
+            self.writer.indent -= 1
+
+        if self.is_initializer:
+            self.emit(f"return {self.this_name}")
+        self.writer.indent -= 1
+        self.emit(f"{def_name}.__name__ = {declaration.name.lexeme!r}")
+
+        (self.scope, self.this_name, self.is_initializer,
+            self.def_name, self.params, self.loop_depth, self.has_tail_call) = enclosing
+        return def_name
+
+    def factory(self, name:str, scope, params:list):
+        '''
+        Start a module level factory function, returns the writer to restore.
+        '''
+        enclosing = self.writer
+        self.writer = FunctionWriter()
+        self.emit(f"def {name}({', '.join(params)}):")
+        self.writer.indent += 1
+        return enclosing
+
+    # Statements
+
+    def visit_block_stmt(self, stmt: statements.Block):
+        for statement in stmt.statements:
+            self.statement(statement)
+
+    def visit_class_stmt(self, stmt: statements.Class):
+        scope = self.analysis.scopes[stmt]
+        factory_name = self.temp(f"_class_{stmt.name.lexeme}_")
+        params = [binding.py_name for binding in scope.free]
+
+        superclass = "None"
+        super_name = "None"
+        if stmt.superclass != None:
+            super_name = self.analysis.declarations[stmt.superclass].py_name
+            params.append(super_name)
+            superclass = f"rt.check_superclass({self.expr(stmt.superclass)}, {stmt.superclass.name.line})"
+
+        line = self.line
+        enclosing = self.factory(factory_name, scope, params)
+        enclosing_scope = self.scope
+        self.scope = scope
+        methods = []
+        for method in stmt.methods:
+            methods.append(f"{method.name.lexeme!r}: {self.function(method, True)}")
+        self.line = line
+        self.emit(f"return rt.LoxClass({stmt.name.lexeme!r}, {super_name}, {{{', '.join(methods)}}})")
+        self.scope = enclosing_scope
+        self.definitions.append(self.writer)
+        self.writer = enclosing
+
+        arguments = [binding.py_name for binding in scope.free]
+        if stmt.superclass != None:
+            arguments.append(superclass)
+        self.define_recursive(stmt, stmt.name.lexeme, f"{factory_name}({', '.join(arguments)})")
+
+    def visit_break_stmt(self, stmt: statements.Break):
+        if stmt in self.analysis.function_breaks:
+            # Ends the loop of the caller, see visit_while_stmt
+            self.emit(f"raise rt.break_error({stmt.token.line})")
+        else:
+            self.emit("break")
+
+    def visit_expression_stmt(self, stmt: statements.Expression):
+        self.emit(self.expr(stmt.expression))
+
+    def visit_function_stmt(self, stmt: statements.Function):
+        scope = self.analysis.scopes[stmt]
+        factory_name = self.temp(f"_function_{stmt.name.lexeme}_")
+        params = [binding.py_name for binding in scope.free]
+
+        line = self.line
+        enclosing = self.factory(factory_name, scope, params)
+        def_name = self.function(stmt)
+        self.line = line
+        self.emit(f"return {def_name}")
+        self.definitions.append(self.writer)
+        self.writer = enclosing
+
+        self.define_recursive(stmt, stmt.name.lexeme, f"{factory_name}({self.free_arguments(scope)})")
+
+    def visit_if_stmt(self, stmt: statements.If):
+        self.emit(f"if {self.expr(stmt.condition)}:")
+        self.body([stmt.thenBranch])
+        if stmt.elseBranch != None:
+            self.emit("else:")
+            self.body([stmt.elseBranch])
+
+    def visit_print_stmt(self, stmt: statements.Print):
+        self.emit(f"_print({self.expr(stmt.expression)})")
+
+    def visit_return_stmt(self, stmt: statements.Return):
+        if self.is_initializer:
+            self.emit(f"return {self.this_name}")
+        elif stmt.value == None:
+            self.emit("return None")
+        elif not self.self_tail_call(stmt.value):
+            self.emit(f"return {self.expr(stmt.value)}")
+
+    def self_tail_call(self, expr: expressions.Expr):
+        '''
+        Emits `return f(...)` in function f, outside of any loop, as a jump
+        back to the start of the body with the parameters rebound, so that
+        tail recursion takes no Python stack. Whether the callee is still f
+        is only known at runtime, anything else is called as usual. Returns
+        False when `expr` is not such a call.
+        '''
+        if (self.def_name == None or self.loop_depth != 0 or type(expr) is not expressions.Call
+                or type(expr.callee) is not expressions.Variable
+                or len(expr.arguments) != len(self.params)):
+            return False
+
+        f = self.temp("_f")
+        self.emit(f"if ({f} := {self.expr(expr.callee)}) is {self.def_name}:")
+        self.writer.indent += 1
+        if len(self.params) != 0:
+            names = [param.py_name for param in self.params]
+            # Captured parameters get a new cell, closures keep the old one
+            values = [
+                f"[{self.expr(argument)}]" if param.is_cell else self.expr(argument)
+                for param, argument in zip(self.params, expr.arguments)
+            ]
+            self.emit(f"{', '.join(names)} = {', '.join(values)}")
+        self.emit("continue")
+        self.writer.indent -= 1
+
+        arguments = ", ".join(self.expr(argument) for argument in expr.arguments)
+        self.emit(f"return {self.function_call(f, len(expr.arguments), arguments, expr.paren.line)}")
+        self.has_tail_call = True
+        return True
+
+    def visit_var_stmt(self, stmt: statements.Var):
+        value = "None"
+        if stmt.initializer != None:
+            value = self.expr(stmt.initializer)
+        self.define(stmt, stmt.name.lexeme, value)
+
+    def visit_while_stmt(self, stmt: statements.While):
+        self.emit(f"while {self.expr(stmt.condition)}:")
+        self.loop_depth += 1
+        if stmt not in self.analysis.calling:
+            self.body([stmt.body])
+        else:
+            # The break of a function called from the body ends the loop, as
+            # LoxBreakException does in the tree-walker
+            self.writer.indent += 1
+            self.emit("try:")
+            self.body([stmt.body])
+            self.emit("except rt.LoxBreakException:")
+            self.writer.indent += 1
+            self.emit("break")
+            self.writer.indent -= 2
+        self.loop_depth -= 1
+
+    # Expressions
+
+    def visit_assign_expr(self, expr: expressions.Assign):
+        return self.store(expr, expr.name.lexeme, self.expr(expr.value))
+
+    def visit_binary_expr(self, expr: expressions.Binary):
+        left = self.expr(expr.left)
+        right = self.expr(expr.right)
+        operator_type = expr.operator.type
+        line = expr.operator.line
+
+        if operator_type == TokenType.EQUAL_EQUAL:
+            return f"({left} == {right})"
+        if operator_type == TokenType.NOT_EQUAL:
+            return f"({left} != {right})"
+
+        left_type = static_type(expr.left)
+        right_type = static_type(expr.right)
+
+        if operator_type == TokenType.PLUS:
+            if left_type == right_type and left_type in (float, str):
+                return f"({left} + {right})"
+            if is_literal(expr.left, float) or is_literal(expr.left, str):
+                b = self.temp()
+                return f"({left} + {b} if type({b} := {right}) is {left_type.__name__} else rt.add_error({line}))"
+            if is_literal(expr.right, float) or is_literal(expr.right, str):
+                a = self.temp()
+                return f"({a} + {right} if type({a} := {left}) is {right_type.__name__} else rt.add_error({line}))"
+            a, b = self.temp(), self.temp()
+            return (f"({a} + {b} if type({a} := {left}) is type({b} := {right}) "
+                f"and (type({a}) is float or type({a}) is str) else rt.add_error({line}))")
+
+        if operator_type == TokenType.DIVIDE:
+            if left_type == float and is_literal(expr.right, float) and expr.right.value != 0:
+                return f"({left} / {right})"
+            a, b = self.temp(), self.temp()
+            return (f"({a} / {b} if (type({a} := {left}) is float) & (type({b} := {right}) is float) "
+                f"and {b} != 0 else rt.divide_error({a}, {b}, {line}))")
+
+        symbol = NUMBER_OPERATORS[operator_type]
+        if left_type == float and right_type == float:
+            return f"({left} {symbol} {right})"
+        if is_literal(expr.left, float):
+            b = self.temp()
+            return f"({left} {symbol} {b} if type({b} := {right}) is float else rt.number_error({line}))"
+        if is_literal(expr.right, float):
+            a = self.temp()
+            return f"({a} {symbol} {right} if type({a} := {left}) is float else rt.number_error({line}))"
+        a, b = self.temp(), self.temp()
+        return (f"({a} {symbol} {b} if (type({a} := {left}) is float) & (type({b} := {right}) is float) "
+            f"else rt.number_error({line}))")
+
+    def visit_call_expr(self, expr: expressions.Call):
+        arguments = ", ".join(self.expr(argument) for argument in expr.arguments)
+        count = len(expr.arguments)
+        f = self.temp("_f")
+
+        # The callee is checked (and picked) before the arguments are evaluated
+        if isinstance(expr.callee, expressions.Dot):
+            # Errors of native methods are only found by the method's name
+            self.name_lines.setdefault((self.line, expr.callee.name.lexeme), expr.paren.line)
+            callee = self.expr(expr.callee)
+            return (f"({f} if type({f} := {callee}) is _method and {f}.__func__.__code__.co_argcount == {count + 1} "
+                f"else rt.callee({f}, {count}, {expr.paren.line}))({arguments})")
+
+        return self.function_call(f"({f} := {self.expr(expr.callee)})", count, arguments, expr.paren.line, f)
+
+    def function_call(self, callee:str, count:int, arguments:str, line:int, f:str=None):
+        '''
+        Call of a function value, `callee` is stored in `f` if it is given.
+        '''
+        if f == None:
+            f = callee
+        return (f"({f} if type({callee}) is _function and {f}.__code__.co_argcount == {count} "
+            f"else rt.callee({f}, {count}, {line}))({arguments})")
+
+    def visit_dot_expr(self, expr: expressions.Dot):
+        return f"rt.get({self.expr(expr.object)}, {expr.name.lexeme!r}, {expr.name.line})"
+
+    def visit_dotset_expr(self, expr: expressions.DotSet):
+        return (f"rt.set_field(rt.fields_of({self.expr(expr.object)}, {expr.name.line}), "
+            f"{expr.name.lexeme!r}, {self.expr(expr.value)})")
+
+    def visit_grouping_expr(self, expr: expressions.Grouping):
+        return self.expr(expr.expression)
+
+    def visit_literal_expr(self, expr: expressions.Literal):
+        return repr(expr.value)
+
+    def visit_logical_expr(self, expr: expressions.Logical):
+        operator = "or" if expr.operator.type == TokenType.OR else "and"
+        return f"({self.expr(expr.left)} {operator} {self.expr(expr.right)})"
+
+    def visit_super_expr(self, expr: expressions.Super):
+        superclass = self.load(expr, "super")
+        instance = self.load(expr.keyword, "this")
+        return f"rt.super_get({superclass}, {instance}, {expr.method.lexeme!r}, {expr.method.line})"
+
+    def visit_this_expr(self, expr: expressions.This):
+        return self.load(expr, "this")
+
+    def visit_unary_expr(self, expr: expressions.Unary):
+        right = self.expr(expr.right)
+        if expr.operator.type == TokenType.NOT:
+            return f"(not {right})"
+        if static_type(expr.right) == float:
+            return f"(-{right})"
+        a = self.temp()
+        return f"(-{a} if type({a} := {right}) is float else rt.negate_error({expr.operator.line}))"
+
+    def visit_variable_expr(self, expr: expressions.Variable):
+        return self.load(expr, expr.name.lexeme)
+
+
+class PythonEngine:
+    '''
+    Execution engine that transpiles the program to Python and lets
+    CPython compile and run it.
+    '''
+    def __init__(self, lox_main):
+        self.lox = lox_main
+        # Sink of print statements, see loxpy/output
+        self.output = lox_main.output
+        # Shared by every chunk so globals survive between REPL lines
+        self.namespace = {"__name__": "__lox__"}
+
+    def interpret(self, statements):
+        source, line_map, name_lines = Transpiler().transpile(statements)
+        code = compile(source, "<lox>", "exec")
+        exec(code, self.namespace)
+        # Print statements write to the sink, not with Python's print
+        self.namespace["_print"] = self.print_value
+
+        try:
+            runtime.run(self.namespace["__lox_main__"], line_map, name_lines)
+        except LoxPyRuntimeError as error:
+            self.lox.runtime_error(error)
+
+    def print_value(self, value):
+        self.output.write(runtime.stringify(value) + "\n")
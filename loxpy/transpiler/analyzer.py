@@ -0,0 +1,255 @@
+'''
+Scope analysis for the Python transpiler.
+
+Mirrors the Resolver's scoping rules, but instead of frame slots it
+works out which Python name every Lox variable gets, which locals are
+captured by nested functions and what each function has to receive from
+its enclosing scope when it is created.
+'''
+from loxpy.parser import expressions
+from loxpy.parser import statements
+
+
+class Binding:
+    '''
+    A single local variable declaration.
+    '''
+    def __init__(self, name:str, py_name:str, owner:'Scope', kind:str):
+        self.name = name
+        self.py_name = py_name
+        self.owner = owner
+        # "var", "param", "function", "class", "this" or "super"
+        self.kind = kind
+        self.captured = False
+        self.assigned = False
+
+    @property
+    def is_cell(self):
+        '''
+        Captured variables that can change after they are captured are
+        boxed in a one-item list shared by every closure. Functions and
+        classes may capture themselves before they exist, so they are
+        boxed too.
+        '''
+        return self.captured and (self.assigned or self.kind in ("function", "class"))
+
+
+class Scope:
+    '''
+    Python function the generated code for a Lox function, method or
+    class body lives in.
+    '''
+    def __init__(self, enclosing:'Scope'):
+        self.enclosing = enclosing
+        # Bindings of enclosing scopes used here, in order of first use
+        self.free = []
+
+
+class Analysis:
+    def __init__(self):
+        # Reference node -> Binding (missing for globals)
+        self.references = {}
+        # Declaration node (or param token) -> Binding
+        self.declarations = {}
+        # Function/Class node -> Scope
+        self.scopes = {}
+        # Top level statements that contain a stray break
+        self.stray_breaks = set()
+        # Breaks outside of any loop in a function body, which end the
+        # loop of the caller
+        self.function_breaks = set()
+        # Loops whose body and top level statements that make calls, and
+        # so may be ended by the break of a called function
+        self.calling = set()
+
+
+class ScopeAnalyzer(
+    expressions.ExprVisitor,
+    statements.StmtVisitor
+):
+    def __init__(self):
+        self.analysis = Analysis()
+        self.blocks = []
+        self.scope:Scope = None
+        self.loop_depth = 0
+        self.counter = 0
+        # Calls seen so far
+        self.calls = 0
+
+    def analyze(self, program:list):
+        for statement in program:
+            self.loop_depth = 0
+            self.stray_break = False
+            calls = self.calls
+            statement.accept(self)
+            if self.stray_break:
+                self.analysis.stray_breaks.add(statement)
+            if self.calls != calls:
+                self.analysis.calling.add(statement)
+        return self.analysis
+
+    def analyze_all(self, body:list):
+        for statement in body:
+            statement.accept(self)
+
+    def declare(self, node:object, name:str, kind:str):
+        if len(self.blocks) == 0:
+            # Globals are looked up by name at runtime
+            return None
+
+        self.counter += 1
+        binding = Binding(name, f"{name}_{self.counter}", self.scope, kind)
+        self.blocks[-1][name] = binding
+        self.analysis.declarations[node] = binding
+        return binding
+
+    def reference(self, node:expressions.Expr, name:str, assigned=False):
+        for block in reversed(self.blocks):
+            if name in block:
+                binding = block[name]
+                break
+        else:
+            return
+
+        self.analysis.references[node] = binding
+        if assigned:
+            binding.assigned = True
+
+        scope = self.scope
+        while scope != binding.owner:
+            binding.captured = True
+            if binding not in scope.free:
+                scope.free.append(binding)
+            scope = scope.enclosing
+
+    def function(self, declaration:statements.Function, receiver:str=None):
+        enclosing_scope = self.scope
+        enclosing_loop_depth = self.loop_depth
+        self.scope = Scope(enclosing_scope)
+        self.analysis.scopes[declaration] = self.scope
+        self.loop_depth = 0
+
+        self.blocks.append({})
+        if receiver != None:
+            self.declare(declaration.name, receiver, "this")
+        for param in declaration.params:
+            self.declare(param, param.lexeme, "param")
+        self.analyze_all(declaration.body)
+        self.blocks.pop()
+
+        self.scope = enclosing_scope
+        self.loop_depth = enclosing_loop_depth
+
+    # Statements
+
+    def visit_block_stmt(self, stmt: statements.Block):
+        self.blocks.append({})
+        self.analyze_all(stmt.statements)
+        self.blocks.pop()
+
+    def visit_class_stmt(self, stmt: statements.Class):
+        self.declare(stmt, stmt.name.lexeme, "class")
+
+        if stmt.superclass != None:
+            stmt.superclass.accept(self)
+
+        enclosing_scope = self.scope
+        self.scope = Scope(enclosing_scope)
+        self.analysis.scopes[stmt] = self.scope
+
+        self.blocks.append({})
+        if stmt.superclass != None:
+            self.declare(stmt.superclass, "super", "super")
+        for method in stmt.methods:
+            self.function(method, "this")
+        self.blocks.pop()
+
+        self.scope = enclosing_scope
+
+    def visit_break_stmt(self, stmt: statements.Break):
+        if self.loop_depth == 0:
+            if self.scope != None:
+                self.analysis.function_breaks.add(stmt)
+            else:
+                self.stray_break = True
+
+    def visit_expression_stmt(self, stmt: statements.Expression):
+        stmt.expression.accept(self)
+
+    def visit_function_stmt(self, stmt: statements.Function):
+        self.declare(stmt, stmt.name.lexeme, "function")
+        self.function(stmt)
+
+    def visit_if_stmt(self, stmt: statements.If):
+        stmt.condition.accept(self)
+        stmt.thenBranch.accept(self)
+        if stmt.elseBranch != None:
+            stmt.elseBranch.accept(self)
+
+    def visit_print_stmt(self, stmt: statements.Print):
+        stmt.expression.accept(self)
+
+    def visit_return_stmt(self, stmt: statements.Return):
+        if stmt.value != None:
+            stmt.value.accept(self)
+
+    def visit_var_stmt(self, stmt: statements.Var):
+        if stmt.initializer != None:
+            stmt.initializer.accept(self)
+        self.declare(stmt, stmt.name.lexeme, "var")
+
+    def visit_while_stmt(self, stmt: statements.While):
+        stmt.condition.accept(self)
+        self.loop_depth += 1
+        calls = self.calls
+        stmt.body.accept(self)
+        if self.calls != calls:
+            self.analysis.calling.add(stmt)
+        self.loop_depth -= 1
+
+    # Expressions
+
+    def visit_assign_expr(self, expr: expressions.Assign):
+        expr.value.accept(self)
+        self.reference(expr, expr.name.lexeme, assigned=True)
+
+    def visit_binary_expr(self, expr: expressions.Binary):
+        expr.left.accept(self)
+        expr.right.accept(self)
+
+    def visit_call_expr(self, expr: expressions.Call):
+        self.calls += 1
+        expr.callee.accept(self)
+        for argument in expr.arguments:
+            argument.accept(self)
+
+    def visit_dot_expr(self, expr: expressions.Dot):
+        expr.object.accept(self)
+
+    def visit_dotset_expr(self, expr: expressions.DotSet):
+        expr.object.accept(self)
+        expr.value.accept(self)
+
+    def visit_grouping_expr(self, expr: expressions.Grouping):
+        expr.expression.accept(self)
+
+    def visit_literal_expr(self, expr: expressions.Literal):
+        pass
+
+    def visit_logical_expr(self, expr: expressions.Logical):
+        expr.left.accept(self)
+        expr.right.accept(self)
+
+    def visit_super_expr(self, expr: expressions.Super):
+        self.reference(expr, "super")
+        # The receiver is needed to bind the method
+        self.reference(expr.keyword, "this")
+
+    def visit_this_expr(self, expr: expressions.This):
+        self.reference(expr, "this")
+
+    def visit_unary_expr(self, expr: expressions.Unary):
+        expr.right.accept(self)
+
+    def visit_variable_expr(self, expr: expressions.Variable):
+        self.reference(expr, expr.name.lexeme)
@@ -0,0 +1,279 @@
+'''
+Runtime library for Lox programs transpiled to Python.
+
+Generated modules import this as `rt`. It implements the parts of Lox
+semantics that don't map directly onto Python: callable and arity
+checks, class/instance objects, property access, printing and turning
+Python exceptions back into Lox runtime errors with source lines.
+'''
+import sys
+from types import FunctionType, MethodType
+
+from loxpy.token import Token
+from loxpy.evaluator import Interpreter
+from loxpy.evaluator.lox_callable import LoxCallable
+from loxpy.evaluator.native_functions import NativeObject, native_globals
+from loxpy.evaluator.runtime_error import LoxPyRuntimeError, LoxPyDivisionByZeroError, LoxBreakException, LoxNativeError
+
+
+class LoxInstance:
+    __slots__ = ('klass', 'fields')
+
+    def __init__(self, klass:'LoxClass'):
+        self.klass = klass
+        self.fields = {}
+
+    def __str__(self):
+        return self.klass.name + " instance"
+
+
+class LoxClass(LoxInstance):
+    __slots__ = ('name', 'methods')
+
+    def __init__(self, name:str, superclass:'LoxClass', methods:dict):
+        # Classes are instances of themselves so that methods can be
+        # called on them directly, e.g. `Math.square(2)`
+        super().__init__(self)
+        self.name = name
+        # Inherited methods are copied down so lookup is a single dict hit
+        self.methods = dict(superclass.methods) if superclass != None else {}
+        self.methods.update(methods)
+
+    def __str__(self):
+        return self.name
+
+
+def error(message:str, line:int=None):
+    # Without a line, it is filled in from the traceback by `run`
+    return LoxPyRuntimeError(None if line == None else Token(None, "", None, line), message)
+
+
+def break_error(line:int):
+    '''
+    Break outside of any loop in a function, caught by the loop of the
+    caller.
+    '''
+    return LoxBreakException(Token(None, "", None, line))
+
+
+def number_error(line:int):
+    raise error("Operand must be a numbers.", line)
+
+
+def negate_error(line:int):
+    raise error("Operand must be a number.", line)
+
+
+def add_error(line:int):
+    raise error("Operands must be either number or string type but not both.", line)
+
+
+def divide_error(left, right, line:int):
+    if type(left) is not float or type(right) is not float:
+        number_error(line)
+    raise LoxPyDivisionByZeroError(Token(None, "", None, line))
+
+
+def arity(function):
+    if type(function) is FunctionType:
+        return function.__code__.co_argcount
+    if type(function) is MethodType:
+        return function.__func__.__code__.co_argcount - 1
+    if type(function) is LoxClass:
+        initializer = function.methods.get("init")
+        if initializer == None:
+            return 0
+        return initializer.__code__.co_argcount - 1
+    return function.arity()
+
+
+def check_callable(function, line:int):
+    if type(function) in (FunctionType, MethodType, LoxClass) or isinstance(function, LoxCallable):
+        return function
+    raise error("Can only call function and classes.", line)
+
+
+def construct(klass:LoxClass, *arguments):
+    instance = LoxInstance(klass)
+    initializer = klass.methods.get("init")
+    if initializer != None:
+        initializer(instance, *arguments)
+    return instance
+
+
+def callee(function, argument_count:int, line:int):
+    '''
+    Slow path of a call site: returns a Python callable that takes the
+    Lox arguments. Arity errors are raised once the arguments have been
+    evaluated, like the other engines do.
+    '''
+    check_callable(function, line)
+
+    expected = arity(function)
+    if argument_count != expected:
+        def arity_error(*arguments):
+            raise error("Expected " + str(expected) + " arguments but got " + str(argument_count) + ".", line)
+        return arity_error
+
+    if type(function) is LoxClass:
+        return lambda *arguments: construct(function, *arguments)
+    if isinstance(function, LoxCallable):
+        return lambda *arguments: native_call(function, list(arguments), line)
+    return function
+
+
+def native_call(function:LoxCallable, arguments:list, line:int):
+    try:
+        return function.call(None, arguments)
+    except LoxNativeError as native_error:
+        raise error(str(native_error), line) from None
+
+
+def get(obj, name:str, line:int):
+    if not isinstance(obj, LoxInstance):
+        return native_method(obj, name, line)
+
+    fields = obj.fields
+    if name in fields:
+        return fields[name]
+
+    method = obj.klass.methods.get(name)
+    if method == None:
+        raise error("Undefined property '" + name + "'.", line)
+    return MethodType(method, obj)
+
+
+def native_method(obj, name:str, line:int):
+    '''
+    Method `name` of a native object such as a List, as a bound Python
+    method so that call sites call it directly.
+    '''
+    if not isinstance(obj, NativeObject):
+        raise error("Only instances have properties.", line)
+    method = obj.methods.get(name)
+    if method == None:
+        raise error("Undefined property '" + name + "'.", line)
+    return MethodType(method.function, obj)
+
+
+def fields_of(obj, line:int):
+    if not isinstance(obj, LoxInstance):
+        raise error("Only instances have fields.", line)
+    return obj.fields
+
+
+def set_field(fields:dict, name:str, value):
+    fields[name] = value
+    return value
+
+
+def super_get(superclass:LoxClass, instance:LoxInstance, name:str, line:int):
+    method = superclass.methods.get(name)
+    if method == None:
+        raise error("Undefined property '" + name + "'.", line)
+    return MethodType(method, instance)
+
+
+def check_superclass(superclass, line:int):
+    if type(superclass) is not LoxClass:
+        raise error("Superclass must be a class.", line)
+    return superclass
+
+
+def store(cell:list, value):
+    cell[0] = value
+    return value
+
+
+def set_global(namespace:dict, name:str, value, line:int):
+    if name not in namespace:
+        raise error("Undefined variable " + name[2:] + ".", line)
+    namespace[name] = value
+    return value
+
+
+def stringify(value):
+    if type(value) is FunctionType:
+        return f"<fn {value.__name__}>"
+    if type(value) is MethodType:
+        if isinstance(value.__self__, NativeObject):
+            return str(value.__self__.methods[value.__func__.__name__])
+        return f"<fn {value.__func__.__name__}>"
+    return Interpreter.stringify(value)
+
+
+def lox_print(value):
+    print(stringify(value))
+
+
+def install_builtins(namespace:dict):
+    '''
+    Native globals every program starts with.
+    '''
+    for name, value in native_globals().items():
+        namespace.setdefault("g_" + name, value)
+
+
+def source_line(traceback, filename:str, line_map:tuple):
+    '''
+    Lox line of the innermost generated frame in `traceback`.
+    '''
+    line = 0
+    while traceback != None:
+        if traceback.tb_frame.f_code.co_filename == filename:
+            line = line_map[traceback.tb_lineno - 1]
+        traceback = traceback.tb_next
+    return line
+
+
+def called_name(traceback, filename:str):
+    '''
+    Name of the function called by the innermost generated frame in
+    `traceback`.
+    '''
+    name = None
+    while traceback != None:
+        if traceback.tb_frame.f_code.co_filename == filename and traceback.tb_next != None:
+            name = traceback.tb_next.tb_frame.f_code.co_name
+        traceback = traceback.tb_next
+    return name
+
+
+def run(main, line_map:tuple, name_lines:dict):
+    '''
+    Run a generated program. Lox runtime errors are re-raised as a
+    LoxPyRuntimeError carrying the Lox source line. `name_lines` holds
+    the line of the first read of each global and of the first call of
+    each method in a statement, keyed by the statement's line and the
+    name.
+    '''
+    filename = main.__code__.co_filename
+    try:
+        main()
+    except LoxPyRuntimeError as lox_error:
+        if lox_error.token != None:
+            raise
+        # Raised by a native method, called directly by the generated code
+        line = source_line(lox_error.__traceback__, filename, line_map)
+        line = name_lines.get((line, called_name(lox_error.__traceback__, filename)), line)
+        raise LoxPyRuntimeError(Token(None, "", None, line), str(lox_error)) from None
+    except NameError as name_error:
+        # Lox globals are prefixed with g_ in the generated code
+        line = source_line(name_error.__traceback__, filename, line_map)
+        line = name_lines.get((line, name_error.name), line)
+        raise LoxPyRuntimeError(Token(None, "", None, line), "Undefined variable " + name_error.name[2:] + ".") from None
+    except RecursionError as recursion_error:
+        line = source_line(recursion_error.__traceback__, filename, line_map)
+        raise LoxPyRuntimeError(Token(None, "", None, line), "Stack overflow.") from None
+
+
+def run_module(main, line_map:tuple, name_lines:dict):
+    '''
+    Entry point of a compiled script executed with `python script.py`.
+    '''
+    try:
+        run(main, line_map, name_lines)
+    except LoxPyRuntimeError as lox_error:
+        sys.stdout.flush()
+        sys.stderr.write(f"[line {lox_error.token.line}] Error : {lox_error}\n")
+        sys.exit(65)
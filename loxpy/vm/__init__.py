@@ -0,0 +1,527 @@
+'''
+Stack based virtual machine for loxpy.
+
+An alternative execution engine to the tree-walking Interpreter: the
+program is compiled once into bytecode (see loxpy.vm.compiler) which is
+then run by a single dispatch loop. Lox function calls push a CallFrame
+instead of recursing in Python.
+'''
+from loxpy.token import Token
+
+from loxpy.evaluator import Interpreter
+from loxpy.evaluator.lox_callable import LoxCallable
+from loxpy.evaluator.runtime_error import LoxPyRuntimeError, LoxPyDivisionByZeroError, LoxNativeError
+from loxpy.evaluator.native_functions import NativeObject, native_globals
+
+from loxpy.vm.compiler import Compiler
+from loxpy.vm.objects import Closure, Upvalue, VMInstance, VMClass, BoundMethod
+from loxpy.vm.opcodes import (
+    OP_CONSTANT, OP_NIL, OP_TRUE, OP_FALSE, OP_POP, OP_POP_N,
+    OP_GET_LOCAL, OP_SET_LOCAL, OP_GET_GLOBAL, OP_DEFINE_GLOBAL, OP_SET_GLOBAL,
+    OP_GET_UPVALUE, OP_SET_UPVALUE, OP_CLOSE_UPVALUE,
+    OP_GET_PROPERTY, OP_SET_PROPERTY, OP_GET_SUPER,
+    OP_EQUAL, OP_NOT_EQUAL, OP_GREATER, OP_GREATER_EQUAL, OP_LESS, OP_LESS_EQUAL,
+    OP_ADD, OP_SUBTRACT, OP_MULTIPLY, OP_DIVIDE, OP_NOT, OP_NEGATE,
+    OP_PRINT, OP_JUMP, OP_JUMP_IF_FALSE, OP_POP_JUMP_IF_FALSE,
+    OP_CALL, OP_INVOKE, OP_SUPER_INVOKE, OP_CLOSURE, OP_RETURN,
+    OP_CLASS, OP_INHERIT, OP_METHOD, OP_BREAK,
+)
+
+FRAMES_MAX = 10000
+
+
+class CallFrame:
+    __slots__ = ('closure', 'ip', 'base')
+
+    def __init__(self, closure:Closure, base:int):
+        self.closure = closure
+        self.ip = 0
+        self.base = base
+
+
+class VM:
+    def __init__(self, lox_main):
+        self.lox = lox_main
+        # Sink of print statements, see loxpy/output
+        self.output = lox_main.output
+        self.globals = native_globals()
+        self.stack = []
+        self.frames = []
+        # Upvalues still pointing into the stack, keyed by stack index
+        self.open_upvalues = {}
+
+    def interpret(self, statements):
+        function = Compiler().compile(statements)
+        closure = Closure(function, [])
+        self.stack.append(closure)
+        self.frames.append(CallFrame(closure, 0))
+
+        try:
+            self.run()
+        except LoxPyRuntimeError as error:
+            self.lox.runtime_error(error)
+            self.reset_stack()
+
+    def reset_stack(self):
+        self.stack.clear()
+        self.frames.clear()
+        self.open_upvalues.clear()
+
+    def error(self, message:str):
+        frame = self.frames[-1]
+        line = frame.closure.function.chunk.lines[frame.ip - 1]
+        return LoxPyRuntimeError(Token(None, "", None, line), message)
+
+    def capture_upvalue(self, index:int):
+        upvalue = self.open_upvalues.get(index)
+        if upvalue == None:
+            upvalue = Upvalue(self.stack, index)
+            self.open_upvalues[index] = upvalue
+        return upvalue
+
+    def close_upvalues(self, last:int):
+        for index in [index for index in self.open_upvalues if index >= last]:
+            self.open_upvalues.pop(index).close()
+
+    def call_closure(self, closure:Closure, arg_count:int):
+        if arg_count != closure.function.arity:
+            raise self.error("Expected " + str(closure.function.arity) +
+                " arguments but got " + str(arg_count) + "."
+            )
+        if len(self.frames) == FRAMES_MAX:
+            raise self.error("Stack overflow.")
+
+        self.frames.append(CallFrame(closure, len(self.stack) - arg_count - 1))
+
+    def call_value(self, callee:object, arg_count:int):
+        '''
+        Call anything that isn't a plain closure. Either pushes a new frame
+        or leaves the result of a native call on the stack.
+        '''
+        stack = self.stack
+
+        if type(callee) is BoundMethod:
+            stack[-1 - arg_count] = callee.receiver
+            return self.call_closure(callee.method, arg_count)
+
+        if type(callee) is VMClass:
+            stack[-1 - arg_count] = VMInstance(callee)
+            initializer = callee.methods.get("init")
+            if initializer != None:
+                return self.call_closure(initializer, arg_count)
+            if arg_count != 0:
+                raise self.error("Expected 0 arguments but got " + str(arg_count) + ".")
+            return
+
+        if type(callee) is Closure:
+            return self.call_closure(callee, arg_count)
+
+        if isinstance(callee, LoxCallable):
+            return self.call_native(callee, arg_count)
+
+        raise self.error("Can only call function and classes.")
+
+    def call_native(self, callee:LoxCallable, arg_count:int, receiver:object=None):
+        '''
+        Calls a native function, as a method of `receiver` unless it is
+        None, and leaves its result on the stack.
+        '''
+        if arg_count != callee.arity():
+            raise self.error("Expected " + str(callee.arity()) +
+                " arguments but got " + str(arg_count) + "."
+            )
+        stack = self.stack
+        arguments = stack[len(stack) - arg_count:]
+        try:
+            if receiver == None:
+                result = callee.call(self, arguments)
+            else:
+                result = callee.call_method(self, receiver, arguments)
+        except LoxNativeError as error:
+            raise self.error(str(error)) from None
+        del stack[len(stack) - arg_count - 1:]
+        stack.append(result)
+
+    def invoke(self, name:str, arg_count:int):
+        receiver = self.stack[-1 - arg_count]
+        if not isinstance(receiver, VMInstance):
+            return self.call_native(self.native_method(receiver, name), arg_count, receiver)
+
+        if name in receiver.fields:
+            value = receiver.fields[name]
+            self.stack[-1 - arg_count] = value
+            return self.call_value(value, arg_count)
+
+        method = receiver.klass.methods.get(name)
+        if method == None:
+            raise self.error("Undefined property '" + name + "'.")
+        return self.call_closure(method, arg_count)
+
+    def native_method(self, receiver:object, name:str):
+        '''
+        Method `name` of a native object such as a List.
+        '''
+        if not isinstance(receiver, NativeObject):
+            raise self.error("Only instances have properties.")
+        method = receiver.methods.get(name)
+        if method == None:
+            raise self.error("Undefined property '" + name + "'.")
+        return method
+
+    def unwind_break(self):
+        '''
+        Break outside of any loop in the body of the running function. As
+        in the tree-walker it ends the innermost loop its callers are
+        running, or the top-level statement if none is: the frames above
+        that caller are dropped and the caller jumps to the loop's exit.
+        '''
+        frames = self.frames
+        frames.pop()
+        while True:
+            frame = frames[-1]
+            ip = frame.ip
+            for start, end, target, size in frame.closure.function.chunk.break_handlers:
+                if start < ip <= end:
+                    top = frame.base + size
+                    if self.open_upvalues:
+                        self.close_upvalues(top)
+                    del self.stack[top:]
+                    frame.ip = target
+                    return
+            frames.pop()
+
+    def run(self):
+        stack = self.stack
+        frames = self.frames
+        push = stack.append
+        pop = stack.pop
+        globals = self.globals
+
+        frame = frames[-1]
+        closure = frame.closure
+        code = closure.function.chunk.code
+        constants = closure.function.chunk.constants
+        ip = frame.ip
+        base = frame.base
+
+        while True:
+            op = code[ip]
+            ip += 1
+
+            if op == OP_GET_LOCAL:
+                push(stack[base + code[ip]])
+                ip += 1
+
+            elif op == OP_CONSTANT:
+                push(constants[code[ip]])
+                ip += 1
+
+            elif op == OP_GET_PROPERTY:
+                name = constants[code[ip]]
+                ip += 1
+                instance = stack[-1]
+                if not isinstance(instance, VMInstance):
+                    frame.ip = ip
+                    stack[-1] = self.native_method(instance, name).bind(instance)
+                elif name in instance.fields:
+                    stack[-1] = instance.fields[name]
+                else:
+                    method = instance.klass.methods.get(name)
+                    if method == None:
+                        frame.ip = ip
+                        raise self.error("Undefined property '" + name + "'.")
+                    stack[-1] = BoundMethod(instance, method)
+
+            elif op == OP_POP_JUMP_IF_FALSE:
+                if pop():
+                    ip += 1
+                else:
+                    ip = code[ip]
+
+            elif op == OP_GET_GLOBAL:
+                name = constants[code[ip]]
+                ip += 1
+                if name in globals:
+                    push(globals[name])
+                else:
+                    frame.ip = ip
+                    raise self.error("Undefined variable " + name + ".")
+
+            elif op == OP_ADD:
+                right = pop()
+                left = stack[-1]
+                if (type(left) is float and type(right) is float) or (type(left) is str and type(right) is str):
+                    stack[-1] = left + right
+                else:
+                    frame.ip = ip
+                    raise self.error("Operands must be either number or string type but not both.")
+
+            elif op == OP_SUBTRACT:
+                right = pop()
+                left = stack[-1]
+                if type(left) is float and type(right) is float:
+                    stack[-1] = left - right
+                else:
+                    frame.ip = ip
+                    raise self.error("Operand must be a numbers.")
+
+            elif op == OP_LESS:
+                right = pop()
+                left = stack[-1]
+                if type(left) is float and type(right) is float:
+                    stack[-1] = left < right
+                else:
+                    frame.ip = ip
+                    raise self.error("Operand must be a numbers.")
+
+            elif op == OP_EQUAL:
+                right = pop()
+                stack[-1] = stack[-1] == right
+
+            elif op == OP_SET_PROPERTY:
+                name = constants[code[ip]]
+                ip += 1
+                value = pop()
+                instance = stack[-1]
+                if not isinstance(instance, VMInstance):
+                    frame.ip = ip
+                    raise self.error("Only instances have fields.")
+                instance.fields[name] = value
+                stack[-1] = value
+
+            elif op == OP_INVOKE:
+                name = constants[code[ip]]
+                arg_count = code[ip + 1]
+                ip += 2
+                frame.ip = ip
+                self.invoke(name, arg_count)
+                frame = frames[-1]
+                closure = frame.closure
+                code = closure.function.chunk.code
+                constants = closure.function.chunk.constants
+                ip = frame.ip
+                base = frame.base
+
+            elif op == OP_SET_LOCAL:
+                stack[base + code[ip]] = stack[-1]
+                ip += 1
+
+            elif op == OP_POP:
+                pop()
+
+            elif op == OP_JUMP:
+                ip = code[ip]
+
+            elif op == OP_CALL:
+                arg_count = code[ip]
+                ip += 1
+                frame.ip = ip
+                callee = stack[-1 - arg_count]
+                if type(callee) is Closure:
+                    self.call_closure(callee, arg_count)
+                else:
+                    self.call_value(callee, arg_count)
+                frame = frames[-1]
+                closure = frame.closure
+                code = closure.function.chunk.code
+                constants = closure.function.chunk.constants
+                ip = frame.ip
+                base = frame.base
+
+            elif op == OP_RETURN:
+                result = pop()
+                if self.open_upvalues:
+                    self.close_upvalues(base)
+                frames.pop()
+                del stack[base:]
+                if not frames:
+                    return
+                push(result)
+
+                frame = frames[-1]
+                closure = frame.closure
+                code = closure.function.chunk.code
+                constants = closure.function.chunk.constants
+                ip = frame.ip
+                base = frame.base
+
+            elif op == OP_GET_UPVALUE:
+                upvalue = closure.upvalues[code[ip]]
+                push(upvalue.cell[upvalue.index])
+                ip += 1
+
+            elif op == OP_SET_UPVALUE:
+                upvalue = closure.upvalues[code[ip]]
+                upvalue.cell[upvalue.index] = stack[-1]
+                ip += 1
+
+            elif op == OP_GREATER:
+                right = pop()
+                left = stack[-1]
+                if type(left) is float and type(right) is float:
+                    stack[-1] = left > right
+                else:
+                    frame.ip = ip
+                    raise self.error("Operand must be a numbers.")
+
+            elif op == OP_LESS_EQUAL:
+                right = pop()
+                left = stack[-1]
+                if type(left) is float and type(right) is float:
+                    stack[-1] = left <= right
+                else:
+                    frame.ip = ip
+                    raise self.error("Operand must be a numbers.")
+
+            elif op == OP_GREATER_EQUAL:
+                right = pop()
+                left = stack[-1]
+                if type(left) is float and type(right) is float:
+                    stack[-1] = left >= right
+                else:
+                    frame.ip = ip
+                    raise self.error("Operand must be a numbers.")
+
+            elif op == OP_MULTIPLY:
+                right = pop()
+                left = stack[-1]
+                if type(left) is float and type(right) is float:
+                    stack[-1] = left * right
+                else:
+                    frame.ip = ip
+                    raise self.error("Operand must be a numbers.")
+
+            elif op == OP_DIVIDE:
+                right = pop()
+                left = stack[-1]
+                if type(left) is not float or type(right) is not float:
+                    frame.ip = ip
+                    raise self.error("Operand must be a numbers.")
+                if right == 0:
+                    frame.ip = ip
+                    error = self.error("")
+                    raise LoxPyDivisionByZeroError(error.token)
+                stack[-1] = left / right
+
+            elif op == OP_NOT_EQUAL:
+                right = pop()
+                stack[-1] = not (stack[-1] == right)
+
+            elif op == OP_NOT:
+                stack[-1] = not stack[-1]
+
+            elif op == OP_NEGATE:
+                if type(stack[-1]) is not float:
+                    frame.ip = ip
+                    raise self.error("Operand must be a number.")
+                stack[-1] = -stack[-1]
+
+            elif op == OP_JUMP_IF_FALSE:
+                if stack[-1]:
+                    ip += 1
+                else:
+                    ip = code[ip]
+
+            elif op == OP_PRINT:
+                self.output.write(Interpreter.stringify(pop()) + "\n")
+
+            elif op == OP_NIL:
+                push(None)
+
+            elif op == OP_TRUE:
+                push(True)
+
+            elif op == OP_FALSE:
+                push(False)
+
+            elif op == OP_POP_N:
+                del stack[len(stack) - code[ip]:]
+                ip += 1
+
+            elif op == OP_DEFINE_GLOBAL:
+                globals[constants[code[ip]]] = pop()
+                ip += 1
+
+            elif op == OP_SET_GLOBAL:
+                name = constants[code[ip]]
+                ip += 1
+                if name not in globals:
+                    frame.ip = ip
+                    raise self.error("Undefined variable " + name + ".")
+                globals[name] = stack[-1]
+
+            elif op == OP_CLOSE_UPVALUE:
+                self.close_upvalues(len(stack) - 1)
+                pop()
+
+            elif op == OP_CLOSURE:
+                function = constants[code[ip]]
+                ip += 1
+                upvalues = []
+                for _ in range(function.upvalue_count):
+                    is_local = code[ip]
+                    index = code[ip + 1]
+                    ip += 2
+                    if is_local:
+                        upvalues.append(self.capture_upvalue(base + index))
+                    else:
+                        upvalues.append(closure.upvalues[index])
+                push(Closure(function, upvalues))
+
+            elif op == OP_GET_SUPER:
+                name = constants[code[ip]]
+                ip += 1
+                superclass = pop()
+                method = superclass.methods.get(name)
+                if method == None:
+                    frame.ip = ip
+                    raise self.error("Undefined property '" + name + "'.")
+                stack[-1] = BoundMethod(stack[-1], method)
+
+            elif op == OP_SUPER_INVOKE:
+                name = constants[code[ip]]
+                arg_count = code[ip + 1]
+                ip += 2
+                frame.ip = ip
+                superclass = pop()
+                method = superclass.methods.get(name)
+                if method == None:
+                    raise self.error("Undefined property '" + name + "'.")
+                self.call_closure(method, arg_count)
+                frame = frames[-1]
+                closure = frame.closure
+                code = closure.function.chunk.code
+                constants = closure.function.chunk.constants
+                ip = frame.ip
+                base = frame.base
+
+            elif op == OP_CLASS:
+                push(VMClass(constants[code[ip]]))
+                ip += 1
+
+            elif op == OP_INHERIT:
+                superclass = stack[-2]
+                if not isinstance(superclass, VMClass):
+                    frame.ip = ip
+                    raise self.error("Superclass must be a class.")
+                # Copy-down inheritance, subclass methods are added later
+                stack[-1].methods.update(superclass.methods)
+                pop()
+
+            elif op == OP_METHOD:
+                method = pop()
+                stack[-1].methods[constants[code[ip]]] = method
+                ip += 1
+
+            elif op == OP_BREAK:
+                self.unwind_break()
+                frame = frames[-1]
+                closure = frame.closure
+                code = closure.function.chunk.code
+                constants = closure.function.chunk.constants
+                ip = frame.ip
+                base = frame.base
+
+            else:
+                frame.ip = ip
+                raise self.error(f"Unknown opcode {op}.")
@@ -0,0 +1,47 @@
+'''
+Compiled bytecode of a single function
+'''
+from loxpy.vm.opcodes import OPCODE_NAMES, OPERAND_COUNT, OP_CLOSURE
+
+
+class Chunk:
+    def __init__(self):
+        self.code = []
+        # Source line of every entry in `code`, used for runtime errors
+        self.lines = []
+        self.constants = []
+        self.constant_index = {}
+        # (start, end, target, stack size) of the loop bodies and top-level
+        # statements that a break of a called function ends, innermost first
+        self.break_handlers = []
+
+    def write(self, byte:int, line:int):
+        self.code.append(byte)
+        self.lines.append(line)
+
+    def add_constant(self, value:object):
+        # Keyed by type too, so that 1.0 and true don't share a slot
+        key = (type(value), value) if isinstance(value, (str, float, bool)) else (type(value), id(value))
+        if key in self.constant_index:
+            return self.constant_index[key]
+
+        self.constants.append(value)
+        self.constant_index[key] = len(self.constants) - 1
+        return len(self.constants) - 1
+
+    def disassemble(self, name:str):
+        lines = [f"== {name} =="]
+        offset = 0
+        while offset < len(self.code):
+            op = self.code[offset]
+            count = OPERAND_COUNT.get(op, 0)
+            operands = self.code[offset + 1: offset + 1 + count]
+            if op == OP_CLOSURE:
+                function = self.constants[operands[0]]
+                count += 2 * function.upvalue_count
+                operands = self.code[offset + 1: offset + 1 + count]
+
+            text = f"{offset:04d} {self.lines[offset]:4d} {OPCODE_NAMES[op]:<20} {' '.join(map(str, operands))}"
+            lines.append(text.rstrip())
+            offset += 1 + count
+        return "\n".join(lines)
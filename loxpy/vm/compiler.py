@@ -0,0 +1,491 @@
+'''
+Compiles the loxpy AST into bytecode for the virtual machine.
+
+Static errors have already been reported by the Resolver, so the
+compiler assumes it is given a valid program.
+'''
+from enum import Enum, auto
+
+from loxpy.parser import expressions
+from loxpy.parser import statements
+from loxpy.token import Token
+from loxpy.token.token_types import TokenType
+
+from loxpy.vm.objects import Function
+from loxpy.vm.opcodes import (
+    OP_CONSTANT, OP_NIL, OP_TRUE, OP_FALSE, OP_POP, OP_POP_N,
+    OP_GET_LOCAL, OP_SET_LOCAL, OP_GET_GLOBAL, OP_DEFINE_GLOBAL, OP_SET_GLOBAL,
+    OP_GET_UPVALUE, OP_SET_UPVALUE, OP_CLOSE_UPVALUE,
+    OP_GET_PROPERTY, OP_SET_PROPERTY, OP_GET_SUPER,
+    OP_EQUAL, OP_NOT_EQUAL, OP_GREATER, OP_GREATER_EQUAL, OP_LESS, OP_LESS_EQUAL,
+    OP_ADD, OP_SUBTRACT, OP_MULTIPLY, OP_DIVIDE, OP_NOT, OP_NEGATE,
+    OP_PRINT, OP_JUMP, OP_JUMP_IF_FALSE, OP_POP_JUMP_IF_FALSE,
+    OP_CALL, OP_INVOKE, OP_SUPER_INVOKE, OP_CLOSURE, OP_RETURN,
+    OP_CLASS, OP_INHERIT, OP_METHOD, OP_BREAK,
+)
+
+
+class FunctionType(Enum):
+    SCRIPT = auto()
+    FUNCTION = auto()
+    METHOD = auto()
+    INITIALIZER = auto()
+
+
+BINARY_OPCODES = {
+    TokenType.EQUAL_EQUAL: OP_EQUAL,
+    TokenType.NOT_EQUAL: OP_NOT_EQUAL,
+    TokenType.GREATER: OP_GREATER,
+    TokenType.GREATER_EQUAL: OP_GREATER_EQUAL,
+    TokenType.LESSER: OP_LESS,
+    TokenType.LESSER_EQUAL: OP_LESS_EQUAL,
+    TokenType.PLUS: OP_ADD,
+    TokenType.MINUS: OP_SUBTRACT,
+    TokenType.MULTIPLY: OP_MULTIPLY,
+    TokenType.DIVIDE: OP_DIVIDE,
+}
+
+
+class Local:
+    __slots__ = ('name', 'depth', 'is_captured')
+
+    def __init__(self, name:str, depth:int):
+        self.name = name
+        self.depth = depth
+        self.is_captured = False
+
+
+class BreakTarget:
+    '''
+    Where a `break` jumps to. Loops are break targets, and so is each
+    top-level statement, which a stray break just ends. A break outside
+    of any loop in a function body has no target: like in the tree-walker
+    it ends the loop the function was called from, see VM.unwind_break.
+    '''
+    def __init__(self, scope_depth:int):
+        self.scope_depth = scope_depth
+        self.jumps = []
+
+
+class FunctionState:
+    def __init__(self, enclosing:'FunctionState', function:Function, function_type:FunctionType):
+        self.enclosing = enclosing
+        self.function = function
+        self.function_type = function_type
+        self.upvalues = []
+        self.scope_depth = 0
+        self.break_targets = []
+
+        # Slot 0 holds the callee, or the receiver for methods
+        receiver = "this" if function_type in (FunctionType.METHOD, FunctionType.INITIALIZER) else ""
+        self.locals = [Local(receiver, 0)]
+
+
+class Compiler(
+    expressions.ExprVisitor,
+    statements.StmtVisitor
+):
+    def __init__(self):
+        self.current:FunctionState = None
+        self.line = 0
+
+    def compile(self, statements:list):
+        '''
+        Compile a whole program into the top-level script function.
+        '''
+        self.current = FunctionState(None, Function(None), FunctionType.SCRIPT)
+
+        for statement in statements:
+            start = len(self.chunk().code)
+            target = BreakTarget(0)
+            self.current.break_targets.append(target)
+            self.compile_stmt(statement)
+            self.current.break_targets.pop()
+            self.patch_breaks(target)
+
+            end = len(self.chunk().code)
+            self.add_break_handler(start, end, end)
+
+        self.emit_return()
+        return self.current.function
+
+    # Emission helpers
+
+    def chunk(self):
+        return self.current.function.chunk
+
+    def emit(self, *code:int):
+        chunk = self.chunk()
+        for byte in code:
+            chunk.write(byte, self.line)
+
+    def emit_jump(self, op:int):
+        self.emit(op, -1)
+        return len(self.chunk().code) - 1
+
+    def patch_jump(self, offset:int):
+        self.chunk().code[offset] = len(self.chunk().code)
+
+    def emit_constant(self, value:object):
+        self.emit(OP_CONSTANT, self.chunk().add_constant(value))
+
+    def identifier_constant(self, name:Token):
+        return self.chunk().add_constant(name.lexeme)
+
+    def emit_return(self):
+        if self.current.function_type == FunctionType.INITIALIZER:
+            self.emit(OP_GET_LOCAL, 0)
+        else:
+            self.emit(OP_NIL)
+        self.emit(OP_RETURN)
+
+    def compile_stmt(self, statement:statements.Stmt):
+        statement.accept(self)
+
+    def compile_expr(self, expr:expressions.Expr):
+        expr.accept(self)
+
+    # Scopes & variables
+
+    def begin_scope(self):
+        self.current.scope_depth += 1
+
+    def end_scope(self):
+        state = self.current
+        state.scope_depth -= 1
+
+        count = 0
+        while len(state.locals) > 0 and state.locals[-1].depth > state.scope_depth:
+            local = state.locals.pop()
+            if local.is_captured:
+                self.emit_pops(count)
+                count = 0
+                self.emit(OP_CLOSE_UPVALUE)
+            else:
+                count += 1
+        self.emit_pops(count)
+
+    def emit_pops(self, count:int):
+        if count == 1:
+            self.emit(OP_POP)
+        elif count > 1:
+            self.emit(OP_POP_N, count)
+
+    def add_local(self, name:Token):
+        self.current.locals.append(Local(name.lexeme, self.current.scope_depth))
+
+    def declare_variable(self, name:Token):
+        '''
+        Declare `name` in the current scope. Returns the constant index of
+        the name for globals and None for locals.
+        '''
+        if self.current.scope_depth == 0:
+            return self.identifier_constant(name)
+        self.add_local(name)
+        return None
+
+    def define_variable(self, global_index:int):
+        if global_index != None:
+            self.emit(OP_DEFINE_GLOBAL, global_index)
+
+    def resolve_local(self, state:FunctionState, name:str):
+        for i in range(len(state.locals) - 1, -1, -1):
+            if state.locals[i].name == name:
+                return i
+        return -1
+
+    def add_upvalue(self, state:FunctionState, index:int, is_local:bool):
+        for i, upvalue in enumerate(state.upvalues):
+            if upvalue == (is_local, index):
+                return i
+        state.upvalues.append((is_local, index))
+        state.function.upvalue_count = len(state.upvalues)
+        return len(state.upvalues) - 1
+
+    def resolve_upvalue(self, state:FunctionState, name:str):
+        if state.enclosing == None:
+            return -1
+
+        local = self.resolve_local(state.enclosing, name)
+        if local != -1:
+            state.enclosing.locals[local].is_captured = True
+            return self.add_upvalue(state, local, True)
+
+        upvalue = self.resolve_upvalue(state.enclosing, name)
+        if upvalue != -1:
+            return self.add_upvalue(state, upvalue, False)
+
+        return -1
+
+    def named_variable(self, name:Token, assign_value:expressions.Expr=None):
+        slot = self.resolve_local(self.current, name.lexeme)
+        if slot != -1:
+            get_op, set_op = OP_GET_LOCAL, OP_SET_LOCAL
+        else:
+            slot = self.resolve_upvalue(self.current, name.lexeme)
+            if slot != -1:
+                get_op, set_op = OP_GET_UPVALUE, OP_SET_UPVALUE
+            else:
+                slot = self.identifier_constant(name)
+                get_op, set_op = OP_GET_GLOBAL, OP_SET_GLOBAL
+
+        if assign_value != None:
+            self.compile_expr(assign_value)
+            self.line = name.line
+            self.emit(set_op, slot)
+        else:
+            self.line = name.line
+            self.emit(get_op, slot)
+
+    def function(self, declaration:statements.Function, function_type:FunctionType):
+        self.line = declaration.name.line
+        function = Function(declaration.name.lexeme, len(declaration.params))
+        state = FunctionState(self.current, function, function_type)
+        self.current = state
+
+        self.begin_scope()
+        for param in declaration.params:
+            self.add_local(param)
+
+        for statement in declaration.body:
+            self.compile_stmt(statement)
+        self.emit_return()
+
+        self.current = state.enclosing
+        self.line = declaration.name.line
+        self.emit(OP_CLOSURE, self.chunk().add_constant(function))
+        for is_local, index in state.upvalues:
+            self.emit(1 if is_local else 0, index)
+
+    def patch_breaks(self, target:BreakTarget):
+        for offset in target.jumps:
+            self.patch_jump(offset)
+
+    def add_break_handler(self, start:int, end:int, target:int):
+        '''
+        A break of a function called from the code between `start` and
+        `end` jumps to `target`, with only the current locals left on the
+        stack.
+        '''
+        self.chunk().break_handlers.append((start, end, target, len(self.current.locals)))
+
+    # Statements
+
+    def visit_block_stmt(self, stmt: statements.Block):
+        self.begin_scope()
+        for statement in stmt.statements:
+            self.compile_stmt(statement)
+        self.end_scope()
+
+    def visit_class_stmt(self, stmt: statements.Class):
+        self.line = stmt.name.line
+        name_index = self.identifier_constant(stmt.name)
+        global_index = self.declare_variable(stmt.name)
+
+        self.emit(OP_CLASS, name_index)
+        self.define_variable(global_index)
+
+        if stmt.superclass != None:
+            self.named_variable(stmt.superclass.name)
+
+            self.begin_scope()
+            self.current.locals.append(Local("super", self.current.scope_depth))
+
+            self.named_variable(stmt.name)
+            self.line = stmt.superclass.name.line
+            self.emit(OP_INHERIT)
+
+        self.named_variable(stmt.name)
+        for method in stmt.methods:
+            function_type = FunctionType.METHOD
+            if method.name.lexeme == "init":
+                function_type = FunctionType.INITIALIZER
+            self.function(method, function_type)
+            self.emit(OP_METHOD, self.identifier_constant(method.name))
+        self.emit(OP_POP)
+
+        if stmt.superclass != None:
+            self.end_scope()
+
+    def visit_break_stmt(self, stmt: statements.Break):
+        self.line = stmt.token.line
+        if len(self.current.break_targets) == 0:
+            self.emit(OP_BREAK)
+            return
+        target = self.current.break_targets[-1]
+
+        # Discard the locals of the scopes being jumped out of
+        count = 0
+        for local in reversed(self.current.locals):
+            if local.depth <= target.scope_depth:
+                break
+            if local.is_captured:
+                self.emit_pops(count)
+                count = 0
+                self.emit(OP_CLOSE_UPVALUE)
+            else:
+                count += 1
+        self.emit_pops(count)
+
+        target.jumps.append(self.emit_jump(OP_JUMP))
+
+    def visit_expression_stmt(self, stmt: statements.Expression):
+        self.compile_expr(stmt.expression)
+        self.emit(OP_POP)
+
+    def visit_function_stmt(self, stmt: statements.Function):
+        global_index = self.declare_variable(stmt.name)
+        self.function(stmt, FunctionType.FUNCTION)
+        self.define_variable(global_index)
+
+    def visit_if_stmt(self, stmt: statements.If):
+        self.compile_expr(stmt.condition)
+        then_jump = self.emit_jump(OP_POP_JUMP_IF_FALSE)
+        self.compile_stmt(stmt.thenBranch)
+
+        if stmt.elseBranch != None:
+            else_jump = self.emit_jump(OP_JUMP)
+            self.patch_jump(then_jump)
+            self.compile_stmt(stmt.elseBranch)
+            self.patch_jump(else_jump)
+        else:
+            self.patch_jump(then_jump)
+
+    def visit_print_stmt(self, stmt: statements.Print):
+        self.compile_expr(stmt.expression)
+        self.emit(OP_PRINT)
+
+    def visit_return_stmt(self, stmt: statements.Return):
+        self.line = stmt.keyword.line
+        if stmt.value == None:
+            self.emit_return()
+            return
+
+        self.compile_expr(stmt.value)
+        self.emit(OP_RETURN)
+
+    def visit_var_stmt(self, stmt: statements.Var):
+        if stmt.initializer != None:
+            self.compile_expr(stmt.initializer)
+        else:
+            self.emit(OP_NIL)
+
+        # Declared after the initializer so it can't refer to itself
+        self.line = stmt.name.line
+        global_index = self.declare_variable(stmt.name)
+        self.define_variable(global_index)
+
+    def visit_while_stmt(self, stmt: statements.While):
+        loop_start = len(self.chunk().code)
+        self.compile_expr(stmt.condition)
+        exit_jump = self.emit_jump(OP_POP_JUMP_IF_FALSE)
+
+        body_start = len(self.chunk().code)
+        target = BreakTarget(self.current.scope_depth)
+        self.current.break_targets.append(target)
+        self.compile_stmt(stmt.body)
+        self.current.break_targets.pop()
+        body_end = len(self.chunk().code)
+
+        self.emit(OP_JUMP, loop_start)
+        self.patch_jump(exit_jump)
+        self.patch_breaks(target)
+        self.add_break_handler(body_start, body_end, len(self.chunk().code))
+
+    # Expressions
+
+    def visit_assign_expr(self, expr: expressions.Assign):
+        self.named_variable(expr.name, expr.value)
+
+    def visit_binary_expr(self, expr: expressions.Binary):
+        self.compile_expr(expr.left)
+        self.compile_expr(expr.right)
+        self.line = expr.operator.line
+        self.emit(BINARY_OPCODES[expr.operator.type])
+
+    def visit_call_expr(self, expr: expressions.Call):
+        callee = expr.callee
+
+        if isinstance(callee, expressions.Dot):
+            # obj.method(args) skips creating a bound method
+            self.compile_expr(callee.object)
+            for argument in expr.arguments:
+                self.compile_expr(argument)
+            self.line = expr.paren.line
+            self.emit(OP_INVOKE, self.identifier_constant(callee.name), len(expr.arguments))
+            return
+
+        if isinstance(callee, expressions.Super):
+            self.named_variable(Token(TokenType.THIS, "this", None, callee.keyword.line))
+            for argument in expr.arguments:
+                self.compile_expr(argument)
+            self.named_variable(Token(TokenType.SUPER, "super", None, callee.keyword.line))
+            self.line = expr.paren.line
+            self.emit(OP_SUPER_INVOKE, self.identifier_constant(callee.method), len(expr.arguments))
+            return
+
+        self.compile_expr(callee)
+        for argument in expr.arguments:
+            self.compile_expr(argument)
+        self.line = expr.paren.line
+        self.emit(OP_CALL, len(expr.arguments))
+
+    def visit_dot_expr(self, expr: expressions.Dot):
+        self.compile_expr(expr.object)
+        self.line = expr.name.line
+        self.emit(OP_GET_PROPERTY, self.identifier_constant(expr.name))
+
+    def visit_dotset_expr(self, expr: expressions.DotSet):
+        self.compile_expr(expr.object)
+        self.compile_expr(expr.value)
+        self.line = expr.name.line
+        self.emit(OP_SET_PROPERTY, self.identifier_constant(expr.name))
+
+    def visit_grouping_expr(self, expr: expressions.Grouping):
+        self.compile_expr(expr.expression)
+
+    def visit_literal_expr(self, expr: expressions.Literal):
+        if expr.value is None:
+            self.emit(OP_NIL)
+        elif expr.value is True:
+            self.emit(OP_TRUE)
+        elif expr.value is False:
+            self.emit(OP_FALSE)
+        else:
+            self.emit_constant(expr.value)
+
+    def visit_logical_expr(self, expr: expressions.Logical):
+        self.compile_expr(expr.left)
+
+        if expr.operator.type == TokenType.AND:
+            end_jump = self.emit_jump(OP_JUMP_IF_FALSE)
+            self.emit(OP_POP)
+            self.compile_expr(expr.right)
+            self.patch_jump(end_jump)
+        else:
+            else_jump = self.emit_jump(OP_JUMP_IF_FALSE)
+            end_jump = self.emit_jump(OP_JUMP)
+            self.patch_jump(else_jump)
+            self.emit(OP_POP)
+            self.compile_expr(expr.right)
+            self.patch_jump(end_jump)
+
+    def visit_super_expr(self, expr: expressions.Super):
+        self.named_variable(Token(TokenType.THIS, "this", None, expr.keyword.line))
+        self.named_variable(Token(TokenType.SUPER, "super", None, expr.keyword.line))
+        self.line = expr.method.line
+        self.emit(OP_GET_SUPER, self.identifier_constant(expr.method))
+
+    def visit_this_expr(self, expr: expressions.This):
+        self.named_variable(expr.keyword)
+
+    def visit_unary_expr(self, expr: expressions.Unary):
+        self.compile_expr(expr.right)
+        self.line = expr.operator.line
+        if expr.operator.type == TokenType.NOT:
+            self.emit(OP_NOT)
+        else:
+            self.emit(OP_NEGATE)
+
+    def visit_variable_expr(self, expr: expressions.Variable):
+        self.named_variable(expr.name)
@@ -0,0 +1,83 @@
+'''
+Runtime objects of the loxpy virtual machine
+'''
+from loxpy.vm.chunk import Chunk
+
+
+class Function:
+    __slots__ = ('name', 'arity', 'upvalue_count', 'chunk')
+
+    def __init__(self, name:str, arity:int=0):
+        self.name = name
+        self.arity = arity
+        self.upvalue_count = 0
+        self.chunk = Chunk()
+
+    def __str__(self):
+        if self.name == None:
+            return "<script>"
+        return f"<fn {self.name}>"
+
+
+class Upvalue:
+    '''
+    Reference to a captured variable. While the variable is still on the
+    stack `cell` is the VM stack itself and `index` its position; once the
+    variable goes out of scope it is moved into a private one-item list.
+    '''
+    __slots__ = ('cell', 'index')
+
+    def __init__(self, stack:list, index:int):
+        self.cell = stack
+        self.index = index
+
+    def close(self):
+        self.cell = [self.cell[self.index]]
+        self.index = 0
+
+
+class Closure:
+    __slots__ = ('function', 'upvalues')
+
+    def __init__(self, function:Function, upvalues:list):
+        self.function = function
+        self.upvalues = upvalues
+
+    def __str__(self):
+        return str(self.function)
+
+
+class VMInstance:
+    __slots__ = ('klass', 'fields')
+
+    def __init__(self, klass:'VMClass'):
+        self.klass = klass
+        self.fields = {}
+
+    def __str__(self):
+        return self.klass.name + " instance"
+
+
+class VMClass(VMInstance):
+    __slots__ = ('name', 'methods')
+
+    def __init__(self, name:str):
+        # Classes are instances of themselves so that methods can be
+        # called on them directly, e.g. `Math.square(2)`
+        super().__init__(self)
+        self.name = name
+        self.methods = {}
+
+    def __str__(self):
+        return self.name
+
+
+class BoundMethod:
+    __slots__ = ('receiver', 'method')
+
+    def __init__(self, receiver:object, method:Closure):
+        self.receiver = receiver
+        self.method = method
+
+    def __str__(self):
+        return str(self.method)
@@ -0,0 +1,80 @@
+'''
+Instruction set of the loxpy virtual machine.
+
+Every instruction is an opcode followed by its integer operands. Jump
+operands are absolute offsets into the chunk's code.
+'''
+
+# Stack & constants
+OP_CONSTANT = 0         # const_index
+OP_NIL = 1
+OP_TRUE = 2
+OP_FALSE = 3
+OP_POP = 4
+OP_POP_N = 5            # count
+
+# Variables
+OP_GET_LOCAL = 6        # slot
+OP_SET_LOCAL = 7        # slot
+OP_GET_GLOBAL = 8       # name_index
+OP_DEFINE_GLOBAL = 9    # name_index
+OP_SET_GLOBAL = 10      # name_index
+OP_GET_UPVALUE = 11     # upvalue_index
+OP_SET_UPVALUE = 12     # upvalue_index
+OP_CLOSE_UPVALUE = 13
+
+# Properties
+OP_GET_PROPERTY = 14    # name_index
+OP_SET_PROPERTY = 15    # name_index
+OP_GET_SUPER = 16       # name_index
+
+# Operators
+OP_EQUAL = 17
+OP_NOT_EQUAL = 18
+OP_GREATER = 19
+OP_GREATER_EQUAL = 20
+OP_LESS = 21
+OP_LESS_EQUAL = 22
+OP_ADD = 23
+OP_SUBTRACT = 24
+OP_MULTIPLY = 25
+OP_DIVIDE = 26
+OP_NOT = 27
+OP_NEGATE = 28
+
+# Statements & control flow
+OP_PRINT = 29
+OP_JUMP = 30                # target
+OP_JUMP_IF_FALSE = 31       # target, condition stays on the stack
+OP_POP_JUMP_IF_FALSE = 32   # target, condition is popped
+
+# Functions & classes
+OP_CALL = 33            # arg_count
+OP_INVOKE = 34          # name_index, arg_count
+OP_SUPER_INVOKE = 35    # name_index, arg_count
+OP_CLOSURE = 36         # const_index, then (is_local, index) per upvalue
+OP_RETURN = 37
+OP_CLASS = 38           # name_index
+OP_INHERIT = 39
+OP_METHOD = 40          # name_index
+
+# Break outside of any loop in a function body, see VM.unwind_break
+OP_BREAK = 41
+
+
+OPCODE_NAMES = {
+    value: name for name, value in list(globals().items())
+    if name.startswith("OP_")
+}
+
+# Number of operands following each opcode (OP_CLOSURE has a variable tail)
+OPERAND_COUNT = {
+    OP_CONSTANT: 1, OP_POP_N: 1,
+    OP_GET_LOCAL: 1, OP_SET_LOCAL: 1,
+    OP_GET_GLOBAL: 1, OP_DEFINE_GLOBAL: 1, OP_SET_GLOBAL: 1,
+    OP_GET_UPVALUE: 1, OP_SET_UPVALUE: 1,
+    OP_GET_PROPERTY: 1, OP_SET_PROPERTY: 1, OP_GET_SUPER: 1,
+    OP_JUMP: 1, OP_JUMP_IF_FALSE: 1, OP_POP_JUMP_IF_FALSE: 1,
+    OP_CALL: 1, OP_INVOKE: 2, OP_SUPER_INVOKE: 2,
+    OP_CLOSURE: 1, OP_CLASS: 1, OP_METHOD: 1,
+}
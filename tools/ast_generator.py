@@ -61,6 +61,24 @@ STATEMENTS = {
 }
 
 
+# Fields filled in after parsing: scope information by the Resolver (see
+# loxpy/resolver), purity of functions by the PurityAnalyzer (see
+# loxpy/purity) and the inline cache of property sites by the Interpreter
+
+ANNOTATIONS = {
+    "Assign": ("depth", "slot"),
+    "Dot": ("cache",),
+    "DotSet": ("cache",),
+    "Super": ("depth", "slot"),
+    "This": ("depth", "slot"),
+    "Variable": ("depth", "slot"),
+    "Block": ("size",),
+    "Class": ("slot",),
+    "Function": ("slot", "size", "pure"),
+    "Var": ("slot",),
+}
+
+
 def define_imports(file, lines):
     file.write('\n'.join(lines))
 
@@ -77,13 +95,31 @@ def define_visitor(file, base_name, types):
         file.write(f"{INDENTATION}def visit_{typ.lower()}_{name}(self, expr: '{base_name}'):\n")
         file.write(f"{INDENTATION * 2}pass\n")
 
+    file.write('\n')
+    file.write(f"{INDENTATION}def {name}_dispatch_table(self):\n")
+    file.write(f"{INDENTATION * 2}'''\n")
+    file.write(f"{INDENTATION * 2}Bound visit methods keyed by node class, `table[type(node)](node)`\n")
+    file.write(f"{INDENTATION * 2}visits a node without going through accept.\n")
+    file.write(f"{INDENTATION * 2}'''\n")
+    file.write(f"{INDENTATION * 2}return {{\n")
+    for typ in types:
+        file.write(f"{INDENTATION * 3}{typ}: self.visit_{typ.lower()}_{name},\n")
+    file.write(f"{INDENTATION * 2}}}\n")
+
 def define_type(file, base_name, class_name, fields):
+    attrs = [field.split(":")[0] for field in fields]
+    annotations = ANNOTATIONS.get(class_name, ())
+    slots = ", ".join(repr(attr) for attr in attrs + list(annotations))
+
     file.write(f'class {class_name}({base_name}):\n')
+    file.write(f'{INDENTATION}__slots__ = ({slots},)\n')
+    file.write("\n")
     file.write(f'{INDENTATION}def __init__(self, {",".join(fields)}):\n')
-    
-    for field in fields:
-        attr = field.split(":")[0]
+
+    for attr in attrs:
         file.write(f"{INDENTATION * 2}self.{attr} = {attr}\n")
+    for attr in annotations:
+        file.write(f"{INDENTATION * 2}self.{attr} = None\n")
 
     file.write("\n")
     file.write(f"{INDENTATION}def accept(self, visitor: {base_name}Visitor):\n")
@@ -100,7 +136,10 @@ def define_ast(path:Path, base_name:str, types, imports):
 
         file.write('\n\n')
         
+        # Slotted classes: nodes are numerous and long lived, so they
+        # carry no __dict__ (ABC has empty slots too)
         file.write(f'class {name}(ABC):\n')
+        file.write(f'{INDENTATION}__slots__ = ()\n\n')
         file.write(f'{INDENTATION}@abstractmethod\n')
         file.write(f'{INDENTATION}def accept(self, visitor: {visitor}):\n')
         file.write(f"{INDENTATION * 2}pass\n\n")
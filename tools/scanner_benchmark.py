@@ -0,0 +1,78 @@
+'''
+Throughput of the character-at-a-time Scanner against the regex driven
+BulkScanner, in tokens per second.
+
+    python tools/scanner_benchmark.py [script.lxp ...] [--size MB]
+
+Without scripts the examples directory is repeated up to --size
+megabytes. Both scanners must produce identical token streams and
+errors, otherwise the benchmark fails.
+'''
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from loxpy.scanner import Scanner
+from loxpy.scanner.bulk_scanner import BulkScanner
+
+EXAMPLES = Path(__file__).resolve().parent.parent / 'examples'
+
+
+class ErrorLog:
+    '''
+    Stands in for Lox, collecting scanner errors instead of printing them.
+    '''
+    def __init__(self):
+        self.errors = []
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+
+def scan(scanner_class, source):
+    log = ErrorLog()
+    start = time.perf_counter()
+    tokens = scanner_class(source, log).scan_tokens()
+    elapsed = time.perf_counter() - start
+    stream = [(token.type, token.lexeme, token.literal, token.line) for token in tokens]
+    return stream, log.errors, elapsed
+
+
+def main():
+    arg_parser = ArgumentParser(usage='scanner_benchmark.py [script.lxp ...] [--size MB]')
+    arg_parser.add_argument('scripts', nargs='*', help='Lox sources to scan')
+    arg_parser.add_argument('--size', type=float, default=2.0,
+                            help='Megabytes of generated source when no scripts are given')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='Runs per scanner, best is reported')
+    args = arg_parser.parse_args()
+
+    if args.scripts:
+        source = '\n'.join(Path(script).read_text() for script in args.scripts)
+    else:
+        sample = '\n'.join(path.read_text() for path in sorted(EXAMPLES.glob('*.lxp')))
+        source = sample * max(1, int(args.size * 1024 * 1024 / len(sample)))
+
+    print(f'source: {len(source) / 1024 / 1024:.2f} MB, {source.count(chr(10)) + 1} lines')
+
+    results = {}
+    for scanner_class in (Scanner, BulkScanner):
+        runs = [scan(scanner_class, source) for _ in range(args.repeat)]
+        stream, errors, _ = runs[0]
+        best = min(elapsed for _, _, elapsed in runs)
+        results[scanner_class.__name__] = (stream, errors, best)
+        print(f'{scanner_class.__name__:12} {len(stream) / best:14,.0f} tokens/s  ({best:.3f}s, {len(stream)} tokens)')
+
+    expected, actual = results['Scanner'], results['BulkScanner']
+    if expected[:2] != actual[:2]:
+        print('error: token streams differ')
+        return 1
+
+    print(f'speedup: {expected[2] / actual[2]:.1f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+'''
+Memory held per token for a large generated script.
+
+    python tools/token_memory_benchmark.py [--statements N]
+
+Compares the slotted Token with interned lexemes against the previous
+layout: a plain object with a __dict__ and a freshly sliced lexeme
+string per token.
+'''
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from loxpy.scanner.bulk_scanner import BulkScanner
+
+TEMPLATE = '''
+class Point{i} {{
+    fn init(x, y) {{ this.x = x; this.y = y; }}
+    fn length() {{ return this.x * this.x + this.y * this.y; }}
+}}
+fn area{i}(width, height) {{
+    var result = width * height;
+    if (result > {i}) {{ print "large"; }} else {{ print "small"; }}
+    return result;
+}}
+var value{i} = area{i}(Point{i}(1, 2).length(), {i}.5);
+'''
+
+
+class LegacyToken:
+    '''
+    Token layout before __slots__ and interning.
+    '''
+    def __init__(self, type, lexeme, literal, line):
+        self.type = type
+        self.lexeme = lexeme
+        self.literal = literal
+        self.line = line
+
+
+class ErrorLog:
+    def error(self, line, message):
+        raise SystemExit(f'unexpected scanner error at line {line}: {message}')
+
+
+def measure(build):
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    tokens = build()
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return tokens, used
+
+
+def copy(text):
+    # A new string object, as slicing the source used to produce
+    return text if len(text) < 2 else text[:1] + text[1:]
+
+
+def main():
+    arg_parser = ArgumentParser(usage='token_memory_benchmark.py [--statements N]')
+    arg_parser.add_argument('--statements', type=int, default=5000,
+                            help='Number of generated class/function groups')
+    args = arg_parser.parse_args()
+
+    source = ''.join(TEMPLATE.format(i=i) for i in range(args.statements))
+    print(f'source: {len(source) / 1024 / 1024:.2f} MB')
+
+    tokens, compact = measure(lambda: list(BulkScanner(source, ErrorLog()).iter_tokens()))
+    count = len(tokens)
+
+    # Literals are shared with the tokens above, so only the token
+    # objects and lexemes are counted for the legacy layout
+    _, legacy = measure(lambda: [
+        LegacyToken(token.type, copy(token.lexeme), token.literal, token.line) for token in tokens
+    ])
+
+    print(f'tokens: {count}')
+    print(f'legacy layout   {legacy / count:8.1f} bytes/token  ({legacy / 1024 / 1024:.1f} MB)')
+    print(f'compact layout  {compact / count:8.1f} bytes/token  ({compact / 1024 / 1024:.1f} MB)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())